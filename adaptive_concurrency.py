@@ -0,0 +1,153 @@
+"""
+AIMD concurrency control for Anthropic requests under rate limits.
+
+The controller keeps a window of allowed in-flight requests. Every success grows
+the window additively (about +1 per window's worth of completions); a 429 rate
+limit or 529 overloaded response cuts it multiplicatively and the request is
+retried after a jittered exponential backoff that honours retry-after. The
+anthropic-ratelimit-* headers of successful responses also cap the window, so it
+never admits more requests than the remaining request or token budget allows.
+"""
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Any, Optional, Tuple, TypeVar
+
+import anthropic
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = (429, 529)
+
+
+class AdaptiveConcurrencyController:
+    def __init__(self, initial_window: float = 4.0, min_window: float = 1.0, max_window: float = 64.0,
+                 increase: float = 1.0, decrease_factor: float = 0.5, decrease_cooldown: float = 1.0,
+                 max_retries: int = 8, base_backoff: float = 0.5, max_backoff: float = 30.0):
+        self.window = initial_window
+        self.min_window = min_window
+        self.max_window = max_window
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.in_flight = 0
+        self.num_retries = 0
+        self.num_throttled = 0
+        self.avg_request_tokens: Optional[float] = None
+        self.window_history: List[Tuple[float, float]] = []
+
+        self._start_time = time.perf_counter()
+        self._last_decrease = float("-inf")
+        self._condition = threading.Condition()
+        self._record_window()
+
+    def _record_window(self):
+        self.window_history.append(
+            (time.perf_counter() - self._start_time, self.window))
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= max(1, int(self.window)):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, headers: Any, request_tokens: int = 0):
+        """Additive increase, then cap by the remaining budget reported in the headers."""
+        with self._condition:
+            if request_tokens:
+                self.avg_request_tokens = request_tokens if self.avg_request_tokens is None else \
+                    0.8 * self.avg_request_tokens + 0.2 * request_tokens
+
+            window = self.window + self.increase / max(1.0, self.window)
+
+            requests_remaining = _header_int(
+                headers, "anthropic-ratelimit-requests-remaining")
+            if requests_remaining is not None:
+                window = min(window, self.in_flight + requests_remaining)
+
+            tokens_remaining = _header_int(headers, "anthropic-ratelimit-input-tokens-remaining")
+            if tokens_remaining is None:
+                tokens_remaining = _header_int(
+                    headers, "anthropic-ratelimit-tokens-remaining")
+            if tokens_remaining is not None and self.avg_request_tokens:
+                window = min(window, self.in_flight +
+                             tokens_remaining / self.avg_request_tokens)
+
+            self.window = max(self.min_window, min(self.max_window, window))
+            self._record_window()
+            self._condition.notify_all()
+
+    def on_throttled(self):
+        """Multiplicative decrease, at most once per cooldown so one burst of 429s counts once."""
+        with self._condition:
+            self.num_throttled += 1
+            now = time.perf_counter()
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self.window = max(self.min_window,
+                                  self.window * self.decrease_factor)
+                self._last_decrease = now
+                self._record_window()
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's retry-after."""
+        delay = random.uniform(0, min(self.max_backoff,
+                               self.base_backoff * (2 ** attempt)))
+        return max(delay, retry_after or 0.0)
+
+    def call(self, send: Callable[[], Tuple[T, Any, int]]) -> T:
+        """
+        Run send() inside the window, retrying 429/529 responses.
+        send() must return (result, response headers, request tokens).
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                result, headers, request_tokens = send()
+            except anthropic.APIStatusError as e:
+                if e.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    raise
+                self.on_throttled()
+                retry_after = _header_float(e.response.headers, "retry-after")
+            else:
+                self.on_success(headers, request_tokens)
+                return result
+            finally:
+                self.release()
+
+            self.num_retries += 1
+            time.sleep(self.backoff_delay(attempt, retry_after))
+            attempt += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        windows = [w for _, w in self.window_history]
+        return {
+            "concurrency_window": self.window,
+            "min_concurrency_window": min(windows),
+            "max_concurrency_window": max(windows),
+            "num_retries": self.num_retries,
+            "num_throttled": self.num_throttled,
+            "window_history": list(self.window_history)
+        }
+
+
+def _header_float(headers: Any, name: str) -> Optional[float]:
+    value = headers.get(name) if headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _header_int(headers: Any, name: str) -> Optional[int]:
+    value = _header_float(headers, name)
+    return int(value) if value is not None else None
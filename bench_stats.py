@@ -0,0 +1,65 @@
+"""
+Small statistics helpers shared by the benchmark scripts.
+"""
+import random
+import statistics
+from typing import Dict, List, Optional, Tuple
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Return the pct-th percentile (0-100) of values using linear interpolation."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def latency_percentiles(values: List[Optional[float]]) -> Optional[Dict[str, float]]:
+    """
+    Return p50/p90/p99 of the non-None values, or None when there are none
+    (e.g. TTFT of a non-streaming request, which cannot be observed).
+    """
+    observed = [v for v in values if v is not None]
+    if not observed:
+        return None
+    return {
+        "p50": percentile(observed, 50),
+        "p90": percentile(observed, 90),
+        "p99": percentile(observed, 99)
+    }
+
+
+def quartiles(values: List[float]) -> Tuple[float, float, float]:
+    """(q1, median, q3) with the same interpolation as percentile()."""
+    return percentile(values, 25), percentile(values, 50), percentile(values, 75)
+
+
+def bootstrap_ci(values: List[float], confidence: float = 0.95, resamples: int = 2000,
+                 rng: Optional[random.Random] = None) -> Tuple[float, float]:
+    """Percentile bootstrap confidence interval of the median."""
+    rng = rng or random.Random()
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return value, value
+    medians = [statistics.median(rng.choices(values, k=len(values))) for _ in range(resamples)]
+    tail = (1 - confidence) / 2 * 100
+    return percentile(medians, tail), percentile(medians, 100 - tail)
+
+
+def bootstrap_difference_ci(a: List[float], b: List[float], confidence: float = 0.95,
+                            resamples: int = 2000, rng: Optional[random.Random] = None) -> Tuple[float, float]:
+    """
+    Percentile bootstrap confidence interval of median(b) - median(a), resampling
+    the two samples independently. An interval that excludes 0 means the
+    difference is significant at that confidence.
+    """
+    rng = rng or random.Random()
+    if not a or not b:
+        return 0.0, 0.0
+    differences = [statistics.median(rng.choices(b, k=len(b))) - statistics.median(rng.choices(a, k=len(a)))
+                   for _ in range(resamples)]
+    tail = (1 - confidence) / 2 * 100
+    return percentile(differences, tail), percentile(differences, 100 - tail)
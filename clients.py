@@ -0,0 +1,166 @@
+"""
+Shared, lazily constructed API clients and context for the demo scripts.
+
+Nothing here touches the network or the disk at import time: clients are built
+on first use, with an httpx connection pool sized for the concurrency the demos
+run at (keep-alive on, HTTP/2 when the optional `h2` package is installed) and
+the tracing hooks from tracing.py, and the Shakespeare context is read the first
+time it is needed.
+
+Environment:
+    ANTHROPIC_API_KEY, ANTHROPIC_BASE_URL
+    DEEPSEEK_API_KEY, DEEPSEEK_API_BASE
+    OPENAI_API_KEY, OPENAI_BASE_URL   (provider_benchmark.py only)
+    MEM0_API_KEY, MEM0_API_HOST
+    LLM_MAX_CONNECTIONS   connection pool size (default 100)
+"""
+import importlib.util
+import os
+import time
+from functools import lru_cache
+from typing import Any, Optional, Tuple, Type
+
+import anthropic
+import httpx
+
+from tracing import httpx_event_hooks, request_span
+
+ANTHROPIC_BASE_URL = os.environ.get("ANTHROPIC_BASE_URL")
+DEEPSEEK_API_BASE = os.environ.get(
+    "DEEPSEEK_API_BASE", "https://api.deepseek.com")
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL")  # None -> api.openai.com
+MEM0_API_HOST = os.environ.get("MEM0_API_HOST")  # None -> hosted Mem0 API
+MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "100"))
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+CONTEXT_PATH = os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "large_shakespearean_text_dump")
+
+
+def _require_env(name: str) -> str:
+    value = os.environ.get(name)
+    if not value:
+        raise ValueError(
+            f"{name} environment variable not set. "
+            f"Please export it: export {name}='your-key-here'"
+        )
+    return value
+
+
+def connection_limits(max_connections: Optional[int] = None) -> httpx.Limits:
+    """Keep as many idle connections alive as may be in flight at once."""
+    size = max_connections or MAX_CONNECTIONS
+    return httpx.Limits(max_connections=size, max_keepalive_connections=size,
+                        keepalive_expiry=60.0)
+
+
+@lru_cache(maxsize=None)
+def load_large_context() -> str:
+    with open(CONTEXT_PATH, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+@lru_cache(maxsize=None)
+def get_anthropic_client(max_connections: Optional[int] = None) -> anthropic.Anthropic:
+    return anthropic.Anthropic(
+        api_key=_require_env("ANTHROPIC_API_KEY"),
+        base_url=ANTHROPIC_BASE_URL,
+        http_client=anthropic.DefaultHttpxClient(
+            limits=connection_limits(max_connections), http2=HTTP2_AVAILABLE,
+            event_hooks=httpx_event_hooks())
+    )
+
+
+def make_async_anthropic_client(max_connections: Optional[int] = None) -> anthropic.AsyncAnthropic:
+    """
+    Async clients are bound to the event loop they are first used on, so this
+    returns a new one per call; use it as `async with` inside the running loop,
+    and warm it with warm_up_async_connection() before timing starts.
+    """
+    return anthropic.AsyncAnthropic(
+        api_key=_require_env("ANTHROPIC_API_KEY"),
+        base_url=ANTHROPIC_BASE_URL,
+        http_client=anthropic.DefaultAsyncHttpxClient(
+            limits=connection_limits(max_connections), http2=HTTP2_AVAILABLE,
+            event_hooks=httpx_event_hooks(async_client=True))
+    )
+
+
+@lru_cache(maxsize=None)
+def get_deepseek_client(max_connections: Optional[int] = None) -> Any:
+    """DeepSeek speaks the OpenAI-compatible API."""
+    import openai
+
+    return openai.OpenAI(
+        api_key=_require_env("DEEPSEEK_API_KEY"),
+        base_url=DEEPSEEK_API_BASE,
+        http_client=openai.DefaultHttpxClient(
+            limits=connection_limits(max_connections), http2=HTTP2_AVAILABLE,
+            event_hooks=httpx_event_hooks())
+    )
+
+
+@lru_cache(maxsize=None)
+def get_openai_client(max_connections: Optional[int] = None) -> Any:
+    import openai
+
+    return openai.OpenAI(
+        api_key=_require_env("OPENAI_API_KEY"),
+        base_url=OPENAI_BASE_URL,
+        http_client=openai.DefaultHttpxClient(
+            limits=connection_limits(max_connections), http2=HTTP2_AVAILABLE,
+            event_hooks=httpx_event_hooks())
+    )
+
+
+@lru_cache(maxsize=None)
+def get_mem0_client() -> Any:
+    """The hosted Mem0 client pings the API when constructed, so build it only on demand."""
+    from mem0 import MemoryClient  # type: ignore
+
+    return MemoryClient(api_key=_require_env("MEM0_API_KEY"), host=MEM0_API_HOST)
+
+
+@lru_cache(maxsize=None)
+def get_local_memory_client() -> Any:
+    """In-process stand-in for the Mem0 client (see local_memory.py); needs no key."""
+    from local_memory import LocalMemoryClient
+
+    return LocalMemoryClient()
+
+
+def _warm_up_errors() -> Tuple[Type[Exception], ...]:
+    """What a warm-up request may raise with the Anthropic or the OpenAI SDK."""
+    errors: Tuple[Type[Exception], ...] = (anthropic.APIError, httpx.HTTPError)
+    try:
+        import openai
+    except ImportError:
+        return errors
+    return errors + (openai.APIError,)
+
+
+def warm_up_connection(client: Any) -> float:
+    """
+    Open a pooled connection to the client's API host before any timed request,
+    so TCP/TLS setup is not counted in the first request's TTFT. Any HTTP
+    response (even an error status) leaves a keep-alive connection in the pool.
+    Works with Anthropic and OpenAI-compatible clients. Returns the seconds spent.
+    """
+    start = time.perf_counter()
+    with request_span("connection.warm_up", {"server.address": str(client.base_url)}):
+        try:
+            client.with_options(max_retries=0).get("/", cast_to=httpx.Response)
+        except _warm_up_errors():
+            pass
+    return time.perf_counter() - start
+
+
+async def warm_up_async_connection(client: Any) -> float:
+    """warm_up_connection for an async client, awaited inside the loop it is bound to."""
+    start = time.perf_counter()
+    with request_span("connection.warm_up", {"server.address": str(client.base_url)}):
+        try:
+            await client.with_options(max_retries=0).get("/", cast_to=httpx.Response)
+        except _warm_up_errors():
+            pass
+    return time.perf_counter() - start
@@ -1,35 +1,35 @@
+import argparse
 import os
 import time
-from typing import List, Dict, Any, Tuple, cast
-from mem0 import MemoryClient  # type: ignore
-from openai import OpenAI
-
-# Configuration
-DEEPSEEK_API_KEY = os.environ.get("DEEPSEEK_API_KEY")
-DEEPSEEK_API_BASE = os.environ.get(
-    "DEEPSEEK_API_BASE", "https://api.deepseek.com")
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, cast
+
+from bench_stats import latency_percentiles
+from clients import get_deepseek_client, get_local_memory_client, get_mem0_client, warm_up_connection
+from context_packing import pack_context, token_f1
+from memory_ingest import MemoryIngestor
+from memory_search_cache import MemorySearchCache, extract_memories, memory_text, same_memories
+from metrics_export import add_export_arguments, export_from_args
+from trials import add_trial_arguments, run_trials_from_args
+from tracing import (add_event, add_tracing_arguments, enable_tracing_from_args, llm_attributes,
+                     record_result, request_span)
+from summarization import RollingSummarizer
+from response_cache import cached_call, enable_response_cache, get_response_cache
+
+# Configuration (API keys and base URLs are read by clients.py on first use)
 MODEL = os.environ.get("DEEPSEEK_MODEL", "deepseek-chat")
-MEM0_API_KEY = os.environ.get("MEM0_API_KEY")
 USER_ID = "developer_alice"
 
-if not DEEPSEEK_API_KEY:
-    raise ValueError(
-        "DEEPSEEK_API_KEY not set. Export it: export DEEPSEEK_API_KEY='your-key'"
-    )
-
-if not MEM0_API_KEY:
-    raise ValueError(
-        "MEM0_API_KEY not set. Export it: export MEM0_API_KEY='your-key'"
-    )
-
-# Client (DeepSeek uses OpenAI-compatible API)
-client = OpenAI(api_key=DEEPSEEK_API_KEY, base_url=DEEPSEEK_API_BASE)
-
 # Pricing (USD per 1M tokens)
 PRICE_INPUT_CACHE_HIT = 0.028
 PRICE_INPUT_CACHE_MISS = 0.28
 PRICE_OUTPUT = 0.42
 
+# Long-lived, so a discarded speculative request never blocks the query path
+# on executor shutdown
+SPECULATION_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="speculation")
+
 
 def generate_developer_conversation() -> List[Dict[str, str]]:
     """
@@ -95,6 +95,22 @@ def generate_developer_conversation() -> List[Dict[str, str]]:
     return messages
 
 
+def generate_scaled_conversation(n: int, duplicate_every: int = 10) -> List[Dict[str, str]]:
+    """
+    n developer messages: the base preferences restated per service, with every
+    duplicate_every-th message an exact resend of the one before it.
+    """
+    base = generate_developer_conversation()
+    messages: List[Dict[str, str]] = []
+    for i in range(n):
+        if duplicate_every and i % duplicate_every == duplicate_every - 1:
+            messages.append(dict(messages[-1]))
+            continue
+        messages.append({"role": "user",
+                         "content": f"{base[i % len(base)]['content']} Applies to service {i // len(base)}."})
+    return messages
+
+
 def concat_history_as_text(history: List[Dict[str, str]]) -> str:
     return "\n".join([f"{m['role'].upper()}: {m['content']}" for m in history])
 
@@ -104,41 +120,116 @@ def token_estimate_from_text(text: str) -> int:
     return max(1, len(text) // 4)
 
 
-def run_chat(messages: List[Dict[str, str]]) -> Tuple[Dict[str, Any], float, str]:
-    start = time.perf_counter()
-    resp = client.chat.completions.create(
-        model=MODEL,
-        messages=cast(Any, messages),  # type: ignore
-        temperature=0.2,
-    )
-    elapsed = time.perf_counter() - start
-    usage = getattr(resp, "usage", None)
-    input_tokens = 0
-    output_tokens = 0
-    if usage is not None:
-        # OpenAI-compatible usage
-        input_tokens = getattr(usage, "prompt_tokens", 0) or getattr(
-            usage, "input_tokens", 0) or 0
-        output_tokens = getattr(usage, "completion_tokens", 0) or getattr(
-            usage, "output_tokens", 0) or 0
-    else:
+def usage_counts(usage: Any, messages: List[Dict[str, str]]) -> Dict[str, int]:
+    if usage is None:
         # Fallback estimate if provider doesn't return usage
         full_text = "\n".join([m.get("content", "") for m in messages])
         input_tokens = token_estimate_from_text(full_text)
-        output_tokens = 300
-
-    # Extract response text
-    response_text = ""
-    if hasattr(resp, "choices") and len(resp.choices) > 0:
-        choice = resp.choices[0]
-        if hasattr(choice, "message") and hasattr(choice.message, "content"):
-            response_text = choice.message.content or ""
-
-    return {"input_tokens": input_tokens, "output_tokens": output_tokens}, elapsed, response_text
-
-
-def estimate_cost(input_tokens: int, output_tokens: int, cache_hit_ratio: float = 0.0) -> float:
-    cache_hit_tokens = int(input_tokens * max(0.0, min(1.0, cache_hit_ratio)))
+        return {"input_tokens": input_tokens, "output_tokens": 300,
+                "cache_hit_tokens": 0, "cache_miss_tokens": input_tokens}
+    # OpenAI-compatible usage
+    input_tokens = getattr(usage, "prompt_tokens", 0) or getattr(
+        usage, "input_tokens", 0) or 0
+    output_tokens = getattr(usage, "completion_tokens", 0) or getattr(
+        usage, "output_tokens", 0) or 0
+    # DeepSeek's context cache reports the prompt tokens served from disk and
+    # those that were not; derive the misses only if the provider omits them
+    cache_hit_tokens = getattr(usage, "prompt_cache_hit_tokens", 0) or 0
+    cache_miss_tokens = getattr(usage, "prompt_cache_miss_tokens", None)
+    if cache_miss_tokens is None:
+        cache_miss_tokens = input_tokens - cache_hit_tokens
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+            "cache_hit_tokens": cache_hit_tokens, "cache_miss_tokens": cache_miss_tokens}
+
+
+def run_chat(messages: List[Dict[str, str]], stream: bool = False,
+             max_tokens: Optional[int] = None) -> Tuple[Dict[str, Any], float, str]:
+    """
+    Send one chat completion. With stream=True the response is streamed with
+    stream_options.include_usage, so TTFT, inter-token latency and usage (sent in
+    a final chunk) come from the same pass; otherwise ttft is None. max_tokens
+    None leaves the completion length to the provider's default.
+    """
+    # Omitted rather than sent as null when unset
+    limits: Dict[str, Any] = {"max_tokens": max_tokens} if max_tokens is not None else {}
+
+    def send() -> Dict[str, Any]:
+        start = time.perf_counter()
+        resp = get_deepseek_client().chat.completions.create(
+            model=MODEL,
+            messages=cast(Any, messages),  # type: ignore
+            temperature=0.2,
+            **limits,
+        )
+        elapsed = time.perf_counter() - start
+
+        # Extract response text
+        response_text = ""
+        if hasattr(resp, "choices") and len(resp.choices) > 0:
+            choice = resp.choices[0]
+            if hasattr(choice, "message") and hasattr(choice.message, "content"):
+                response_text = choice.message.content or ""
+
+        return {**usage_counts(getattr(resp, "usage", None), messages),
+                "ttft": None, "inter_token_latencies": [], "tbt": None,
+                "latency": elapsed, "text": response_text}
+
+    def send_streaming() -> Dict[str, Any]:
+        start = time.perf_counter()
+        token_times: List[float] = []
+        text_parts: List[str] = []
+        usage = None
+        for chunk in get_deepseek_client().chat.completions.create(
+            model=MODEL,
+            messages=cast(Any, messages),  # type: ignore
+            temperature=0.2,
+            stream=True,
+            stream_options={"include_usage": True},
+            **limits,
+        ):
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not token_times:
+                    add_event("first_token")
+                token_times.append(time.perf_counter())
+                text_parts.append(chunk.choices[0].delta.content)
+            # Only the final chunk, with empty choices, carries usage
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+        elapsed = time.perf_counter() - start
+
+        gaps = [b - a for a, b in zip(token_times, token_times[1:])]
+        return {**usage_counts(usage, messages),
+                "ttft": (token_times[0] - start) if token_times else None,
+                "inter_token_latencies": gaps,
+                "tbt": (sum(gaps) / len(gaps)) if gaps else None,
+                "latency": elapsed, "text": "".join(text_parts)}
+
+    request = {
+        "endpoint": str(get_deepseek_client().base_url),
+        "model": MODEL,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": 0.2,
+    }
+    if stream:
+        request["stream"] = True
+    with request_span("deepseek.chat.completions", llm_attributes("deepseek", MODEL, streaming=stream)) as span:
+        result = cached_call(request, send_streaming if stream else send)
+        record_result(span, result)
+    usage = {"input_tokens": result["input_tokens"],
+             "output_tokens": result["output_tokens"],
+             "cache_hit_tokens": result.get("cache_hit_tokens", 0),
+             "cache_miss_tokens": result.get("cache_miss_tokens", result["input_tokens"]),
+             "ttft": result.get("ttft"),
+             "tbt": result.get("tbt"),
+             "inter_token_latencies": result.get("inter_token_latencies", []),
+             "cached": result["cached"]}
+    return usage, result["latency"], result["text"]
+
+
+def estimate_cost(input_tokens: int, output_tokens: int, cache_hit_tokens: int = 0) -> float:
+    """Cost of a request; cache_hit_tokens is DeepSeek's prompt_cache_hit_tokens."""
+    cache_hit_tokens = max(0, min(input_tokens, cache_hit_tokens))
     cache_miss_tokens = input_tokens - cache_hit_tokens
     input_cost = (cache_hit_tokens * PRICE_INPUT_CACHE_HIT +
                   cache_miss_tokens * PRICE_INPUT_CACHE_MISS) / 1_000_000
@@ -146,10 +237,21 @@ def estimate_cost(input_tokens: int, output_tokens: int, cache_hit_ratio: float
     return input_cost + output_cost
 
 
-def approach_1_full_context(history: List[Dict[str, str]], query: str) -> Dict[str, Any]:
+def approach_1_full_context(history: List[Dict[str, str]], query: str,
+                            budget_tokens: Optional[int] = None, stream: bool = False) -> Dict[str, Any]:
+    """
+    Approach 1: send the conversation history with the query. With budget_tokens,
+    the history is first packed to the most relevant messages that fit the budget.
+    """
     print("\n" + "="*70)
-    print("APPROACH 1: Naive - Full Conversation Context")
+    if budget_tokens is None:
+        print("APPROACH 1: Naive - Full Conversation Context")
+    else:
+        print(f"APPROACH 1: Packed Conversation Context ({budget_tokens}-token budget)")
     print("="*70)
+    packing: Dict[str, Any] = {}
+    if budget_tokens is not None:
+        history, packing = pack_context(history, query, budget_tokens, token_estimate_from_text)
     system_msg = {"role": "system", "content": "You are a helpful assistant."}
     user_msg = {"role": "user",
                 "content": f"Conversation History:\n{concat_history_as_text(history)}\n\nUser Query: {query}"}
@@ -159,7 +261,7 @@ def approach_1_full_context(history: List[Dict[str, str]], query: str) -> Dict[s
     print(user_msg["content"])
     print("-" * 70)
 
-    usage, elapsed, response_text = run_chat([system_msg, user_msg])
+    usage, elapsed, response_text = run_chat([system_msg, user_msg], stream=stream)
 
     print("\nResponse (Full Context):")
     print("-" * 70)
@@ -174,48 +276,64 @@ def approach_1_full_context(history: List[Dict[str, str]], query: str) -> Dict[s
         "total_tokens_processed": total_tokens,
         "execution_time": elapsed,
         "avg_token_throughput": (total_tokens / elapsed) if elapsed > 0 else 0.0,
-        "estimated_cost": estimate_cost(usage["input_tokens"], usage["output_tokens"], cache_hit_ratio=0.0),
+        "estimated_cost": estimate_cost(usage["input_tokens"], usage["output_tokens"], usage["cache_hit_tokens"]),
+        "cache_hit_tokens": usage["cache_hit_tokens"],
+        "ttft": usage["ttft"],
+        "tbt": usage["tbt"],
+        "itl_percentiles": latency_percentiles(usage["inter_token_latencies"]),
+        "response_cached": usage["cached"],
+        **packing,
         "response": response_text,
     }
     print(
-        f"  Input tokens: {usage['input_tokens']}, Output tokens: {usage['output_tokens']}")
+        f"  Input tokens: {usage['input_tokens']} ({usage['cache_hit_tokens']} cache hit), "
+        f"Output tokens: {usage['output_tokens']}")
+    if packing:
+        print(f"  Packed {packing['num_messages']}/{packing['num_history_messages']} messages, "
+              f"relevance recall {packing['relevance_recall']:.1%}")
     print(
         f"  Execution time: {elapsed:.3f}s, Avg throughput: {metrics['avg_token_throughput']:.2f} tok/s")
+    if metrics["ttft"] is not None:
+        tbt_str = f"{metrics['tbt'] * 1000:.1f}ms" if metrics["tbt"] is not None else "N/A"
+        print(f"  TTFT: {metrics['ttft']:.3f}s, Time between tokens: {tbt_str}")
     print(f"  Estimated cost: ${metrics['estimated_cost']:.6f}")
     return metrics
 
 
-def approach_2_with_mem0(memory_client: MemoryClient, user_id: str, query: str) -> Dict[str, Any]:
+def memory_prompt(memories: List[Any], query: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+    relevant_text = "\n".join(memory_text(m) for m in memories)
+    system_msg = {"role": "system", "content": "You are a helpful assistant."}
+    user_msg = {"role": "user",
+                "content": f"User Context (from mem0):\n{relevant_text}\n\nUser Query: {query}"}
+    return system_msg, user_msg
+
+
+def approach_2_with_mem0(memory_client: Any, user_id: str, query: str, backend: str = "hosted",
+                         stream: bool = False) -> Dict[str, Any]:
+    """
+    Approach 2: retrieve only the relevant memories, then ask the model.
+    memory_client is the hosted Mem0 client or a LocalMemoryClient (backend="local").
+    """
     print("\n" + "="*70)
-    print("APPROACH 2: With Mem0 - Retrieve Only Relevant Context")
+    print(f"APPROACH 2: With Mem0 ({backend}) - Retrieve Only Relevant Context")
     print("="*70)
     # Search for relevant memories using Mem0
     # Filters are required - user_id must be in filters dict
-    search_results = memory_client.search(query, filters={"user_id": user_id})
+    # The Mem0 client has its own HTTP client, so this span has no phase children
+    retrieval_start = time.perf_counter()
+    with request_span("mem0.search", {"mem0.user_id": user_id, "mem0.backend": backend}):
+        search_results = memory_client.search(query, filters={"user_id": user_id})
+    retrieval_time = time.perf_counter() - retrieval_start
     # Extract memory content from search results
-    if search_results and isinstance(search_results, dict) and "results" in search_results:
-        memories = search_results["results"]
-    elif isinstance(search_results, list):
-        memories = search_results
-    else:
-        memories = []
-
-    relevant_text = "\n".join([
-        str(m.get("data", {}).get("memory", m)
-            ) if isinstance(m, dict) else str(m)
-        for m in memories
-    ]) if memories else ""
-
-    system_msg = {"role": "system", "content": "You are a helpful assistant."}
-    user_msg = {"role": "user",
-                "content": f"User Context (from mem0):\n{relevant_text}\n\nUser Query: {query}"}
+    memories = extract_memories(search_results)
+    system_msg, user_msg = memory_prompt(memories, query)
 
     print("\nUser Message (Mem0 - Relevant Context Only):")
     print("-" * 70)
     print(user_msg["content"])
     print("-" * 70)
 
-    usage, elapsed, response_text = run_chat([system_msg, user_msg])
+    usage, elapsed, response_text = run_chat([system_msg, user_msg], stream=stream)
 
     print("\nResponse (Mem0 - Relevant Context Only):")
     print("-" * 70)
@@ -230,17 +348,434 @@ def approach_2_with_mem0(memory_client: MemoryClient, user_id: str, query: str)
         "total_tokens_processed": total_tokens,
         "execution_time": elapsed,
         "avg_token_throughput": (total_tokens / elapsed) if elapsed > 0 else 0.0,
-        "estimated_cost": estimate_cost(usage["input_tokens"], usage["output_tokens"], cache_hit_ratio=0.0),
+        "estimated_cost": estimate_cost(usage["input_tokens"], usage["output_tokens"], usage["cache_hit_tokens"]),
+        "cache_hit_tokens": usage["cache_hit_tokens"],
+        "ttft": usage["ttft"],
+        "tbt": usage["tbt"],
+        "itl_percentiles": latency_percentiles(usage["inter_token_latencies"]),
+        "response_cached": usage["cached"],
+        "memory_backend": backend,
+        "num_memories": len(memories),
+        "retrieval_time": retrieval_time,
+        "end_to_end_time": retrieval_time + elapsed,
         "response": response_text,
     }
     print(
-        f"  Input tokens: {usage['input_tokens']}, Output tokens: {usage['output_tokens']}")
+        f"  Input tokens: {usage['input_tokens']} ({usage['cache_hit_tokens']} cache hit), "
+        f"Output tokens: {usage['output_tokens']}")
+    print(
+        f"  Retrieval time: {retrieval_time * 1000:.1f}ms ({len(memories)} memories), "
+        f"End-to-end: {metrics['end_to_end_time']:.3f}s")
     print(
         f"  Execution time: {elapsed:.3f}s, Avg throughput: {metrics['avg_token_throughput']:.2f} tok/s")
+    if metrics["ttft"] is not None:
+        tbt_str = f"{metrics['tbt'] * 1000:.1f}ms" if metrics["tbt"] is not None else "N/A"
+        print(f"  TTFT: {metrics['ttft']:.3f}s, Time between tokens: {tbt_str}")
     print(f"  Estimated cost: ${metrics['estimated_cost']:.6f}")
     return metrics
 
 
+def approach_4_rolling_summary(history: List[Dict[str, str]], query: str, keep_recent: int = 10,
+                               arrival_chunk: int = 10) -> Dict[str, Any]:
+    """
+    Approach 4: older turns compacted into a rolling summary, recent turns verbatim.
+    History arrives arrival_chunk messages at a time and the summary is updated
+    after each arrival, so each update only summarizes the newly aged-out tail.
+    """
+    print("\n" + "="*70)
+    print(f"APPROACH 4: Rolling Summary + Last {keep_recent} Turns")
+    print("="*70)
+    summarizer = RollingSummarizer(run_chat, keep_recent=keep_recent)
+    for end in range(arrival_chunk, len(history) + arrival_chunk, arrival_chunk):
+        summarizer.update(history[:end])
+    summary, recent = summarizer.context(history)
+
+    # The summary leads the prompt so it is a stable prefix between updates
+    system_msg = {"role": "system",
+                  "content": f"You are a helpful assistant.\n\nConversation summary:\n{summary}"}
+    user_msg = {"role": "user",
+                "content": f"Recent Conversation:\n{concat_history_as_text(recent)}\n\nUser Query: {query}"}
+
+    print("\nSystem Message (Rolling Summary):")
+    print("-" * 70)
+    print(system_msg["content"])
+    print("-" * 70)
+
+    usage, elapsed, response_text = run_chat([system_msg, user_msg])
+
+    print("\nResponse (Rolling Summary):")
+    print("-" * 70)
+    print(response_text)
+    print("-" * 70)
+
+    updates = summarizer.updates
+    summary_input = sum(u["input_tokens"] for u in updates)
+    summary_output = sum(u["output_tokens"] for u in updates)
+    total_tokens = usage["input_tokens"] + usage["output_tokens"]
+    metrics = {
+        "num_requests": 1,
+        "input_tokens": usage["input_tokens"],
+        "output_tokens": usage["output_tokens"],
+        "total_tokens_processed": total_tokens,
+        "execution_time": elapsed,
+        "avg_token_throughput": (total_tokens / elapsed) if elapsed > 0 else 0.0,
+        "estimated_cost": estimate_cost(usage["input_tokens"], usage["output_tokens"], usage["cache_hit_tokens"]),
+        "cache_hit_tokens": usage["cache_hit_tokens"],
+        "response_cached": usage["cached"],
+        "keep_recent": keep_recent,
+        "summary_updates": len(updates),
+        "summary_messages": summarizer.summarized_count,
+        "summary_input_tokens": summary_input,
+        "summary_output_tokens": summary_output,
+        "summary_time": sum(u["latency"] for u in updates),
+        "summary_cost": sum(estimate_cost(u["input_tokens"], u["output_tokens"], u["cache_hit_tokens"])
+                            for u in updates),
+        "response": response_text,
+    }
+    print(
+        f"  Input tokens: {usage['input_tokens']} ({usage['cache_hit_tokens']} cache hit), "
+        f"Output tokens: {usage['output_tokens']}")
+    print(
+        f"  Summary: {summarizer.summarized_count} messages in {len(updates)} incremental updates, "
+        f"{summary_input} input tokens, {metrics['summary_time']:.3f}s off the query path")
+    print(
+        f"  Execution time: {elapsed:.3f}s, Avg throughput: {metrics['avg_token_throughput']:.2f} tok/s")
+    print(f"  Estimated cost: ${metrics['estimated_cost']:.6f} "
+          f"(+ ${metrics['summary_cost']:.6f} for summary updates)")
+    return metrics
+
+
+def repeated_prefix_queries(n: int) -> List[str]:
+    """n distinct queries, so each repeat is a new request over the same history prefix."""
+    topics = ["retries and idempotency", "schema migrations", "multi-tenant isolation",
+              "deploy safety", "observability", "rate limiting", "event delivery guarantees",
+              "secrets handling", "read scaling", "caching hot keys"]
+    return [f"Given my preferences, what should I do about {topics[i % len(topics)]}? (#{i + 1})"
+            for i in range(n)]
+
+
+def approach_5_repeated_prefix(history: List[Dict[str, str]], repeats: int = 5) -> Dict[str, Any]:
+    """
+    Approach 5: send the same full history several times with different queries.
+    DeepSeek caches prompt prefixes on disk automatically, so after the first
+    request the history should come back as prompt_cache_hit_tokens.
+    """
+    print("\n" + "="*70)
+    print(f"APPROACH 5: Repeated Prefix - Full History x{repeats}")
+    print("="*70)
+    system_msg = {"role": "system", "content": "You are a helpful assistant."}
+    history_text = concat_history_as_text(history)
+
+    requests: List[Dict[str, Any]] = []
+    for i, query in enumerate(repeated_prefix_queries(repeats)):
+        user_msg = {"role": "user",
+                    "content": f"Conversation History:\n{history_text}\n\nUser Query: {query}"}
+        usage, elapsed, _ = run_chat([system_msg, user_msg])
+        cost = estimate_cost(usage["input_tokens"], usage["output_tokens"], usage["cache_hit_tokens"])
+        requests.append({"request": i + 1, "latency": elapsed, **usage, "estimated_cost": cost,
+                         "uncached_cost": estimate_cost(usage["input_tokens"], usage["output_tokens"])})
+        print(f"  Request {i + 1}: {elapsed:.3f}s, {usage['cache_hit_tokens']}/{usage['input_tokens']} "
+              f"input tokens from cache, ${cost:.6f}")
+
+    input_tokens = sum(r["input_tokens"] for r in requests)
+    cache_hit_tokens = sum(r["cache_hit_tokens"] for r in requests)
+    metrics = {
+        "num_requests": len(requests),
+        "input_tokens": input_tokens,
+        "output_tokens": sum(r["output_tokens"] for r in requests),
+        "cache_hit_tokens": cache_hit_tokens,
+        "cache_hit_rate": cache_hit_tokens / input_tokens if input_tokens else 0.0,
+        "execution_time": sum(r["latency"] for r in requests),
+        "estimated_cost": sum(r["estimated_cost"] for r in requests),
+        "uncached_cost": sum(r["uncached_cost"] for r in requests),
+        "requests": requests,
+    }
+    return metrics
+
+
+def print_repeated_prefix(metrics: Dict[str, Any]):
+    """
+    Print how the automatic context cache changes latency and cost per repeat.
+    """
+    requests = metrics["requests"]
+    print("\n" + "="*70)
+    print("REPEATED PREFIX: DEEPSEEK CONTEXT CACHE")
+    print("="*70)
+    print(f"{'Request':<9} {'Input Tok':<11} {'Cache Hit':<11} {'Miss':<8} {'Latency (s)':<13} "
+          f"{'Cost (USD)':<13} {'Uncached'}")
+    print("-"*70)
+    for r in requests:
+        print(f"{r['request']:<9} {r['input_tokens']:<11} {r['cache_hit_tokens']:<11} "
+              f"{r['cache_miss_tokens']:<8} {r['latency']:<13.3f} {r['estimated_cost']:<13.6f} "
+              f"{r['uncached_cost']:.6f}")
+    print("="*70)
+    print(f"Cache hit rate: {metrics['cache_hit_rate']:.1%} of input tokens")
+    if len(requests) > 1:
+        warm = requests[1:]
+        warm_latency = sum(r["latency"] for r in warm) / len(warm)
+        print(f"Latency: first {requests[0]['latency']:.3f}s, repeats {warm_latency:.3f}s on average")
+    if metrics["uncached_cost"] > 0:
+        saved = metrics["uncached_cost"] - metrics["estimated_cost"]
+        print(f"Cost: ${metrics['estimated_cost']:.6f} vs ${metrics['uncached_cost']:.6f} without caching "
+              f"({saved / metrics['uncached_cost']:.1%} saved)")
+
+
+def print_summary_comparison(full: Dict[str, Any], mem0: Dict[str, Any], summary: Dict[str, Any]):
+    """
+    Print per-query input tokens, latency and cost for full context, Mem0 and rolling summary.
+    Summary updates run when messages arrive, not per query, so they are listed separately.
+    """
+    print("\n" + "="*70)
+    print("FULL CONTEXT VS MEM0 VS ROLLING SUMMARY")
+    print("="*70)
+    print(f"{'Metric':<29} {'Full Context':<14} {'Mem0':<14} {'Rolling Summary'}")
+    print("-"*70)
+    print(f"{'Input Tokens':<29} {full['input_tokens']:<14} {mem0['input_tokens']:<14} {summary['input_tokens']}")
+    print(f"{'Execution Time (s)':<29} {full['execution_time']:<14.3f} {mem0['execution_time']:<14.3f} "
+          f"{summary['execution_time']:.3f}")
+    print(f"{'Estimated Cost (USD)':<29} {full['estimated_cost']:<14.6f} {mem0['estimated_cost']:<14.6f} "
+          f"{summary['estimated_cost']:.6f}")
+    print(f"{'Summary Updates':<29} {'-':<14} {'-':<14} {summary['summary_updates']} "
+          f"({summary['summary_input_tokens']} tok, ${summary['summary_cost']:.6f})")
+    print("="*70)
+
+
+def approach_6_ingest_scaling(memory_client: Any, backend: str, sizes: List[int], chunk_size: int,
+                              max_workers: int, num_queries: int = 5) -> List[Dict[str, Any]]:
+    """
+    Approach 6: bulk-ingest growing histories, each under a fresh user, and time
+    ingestion (until indexed) and search at every size.
+    """
+    print("\n" + "="*70)
+    print(f"APPROACH 6: Bulk Ingestion Scaling ({backend}, chunks of {chunk_size}, {max_workers} workers)")
+    print("="*70)
+    run_id = uuid.uuid4().hex[:8]
+    queries = repeated_prefix_queries(num_queries)
+    rows: List[Dict[str, Any]] = []
+    for size in sizes:
+        user_id = f"{USER_ID}_ingest_{size}_{run_id}"
+        ingestor = MemoryIngestor(memory_client, user_id, chunk_size=chunk_size,
+                                  max_workers=max_workers, version="v2")
+        stats = ingestor.ingest(generate_scaled_conversation(size))
+
+        search_times = []
+        for query in queries:
+            start = time.perf_counter()
+            memory_client.search(query, filters={"user_id": user_id})
+            search_times.append(time.perf_counter() - start)
+        search_times.sort()
+        row = {"size": size, **stats,
+               "search_p50": search_times[len(search_times) // 2],
+               "search_max": search_times[-1]}
+        rows.append(row)
+        throughput = (f"{stats['ingest_throughput']:.0f} msg/s" if stats["ingest_throughput"] is not None
+                      else "indexing timed out")
+        print(f"  {size} messages: {stats['num_unique']} unique in {stats['ingest_time']:.2f}s "
+              f"({throughput}), search p50 {row['search_p50'] * 1000:.1f}ms")
+    return rows
+
+
+def print_ingest_scaling(rows: List[Dict[str, Any]]):
+    """
+    Print ingest throughput and search latency against history size.
+    """
+    print("\n" + "="*70)
+    print("BULK INGESTION: THROUGHPUT AND SEARCH LATENCY VS HISTORY SIZE")
+    print("="*70)
+    print(f"{'Messages':<10} {'Unique':<8} {'Chunks':<8} {'Submit (s)':<11} {'Index (s)':<10} "
+          f"{'Msg/s':<9} {'Search p50':<11} {'Max (ms)'}")
+    print("-"*70)
+    for r in rows:
+        throughput = f"{r['ingest_throughput']:.0f}" if r["ingest_throughput"] is not None else "N/A"
+        print(f"{r['size']:<10} {r['num_unique']:<8} {r['num_chunks']:<8} {r['submit_time']:<11.2f} "
+              f"{r.get('index_wait_time', 0.0):<10.2f} {throughput:<9} "
+              f"{r['search_p50'] * 1000:<11.1f} {r['search_max'] * 1000:.1f}")
+    print("="*70)
+    failed = sum(r["failed_chunks"] for r in rows)
+    timed_out = [str(r["size"]) for r in rows if r.get("index_timed_out")]
+    if failed:
+        print(f"{failed} chunks failed to ingest")
+    if timed_out:
+        print(f"Indexing did not finish before the timeout for: {', '.join(timed_out)} "
+              "(no Msg/s reported)")
+
+
+def approach_7_speculative(search_cache: MemorySearchCache, user_id: str, query: str) -> Dict[str, Any]:
+    """
+    Approach 7: Mem0 retrieval with a per-user search cache and speculation.
+
+    - fresh cache entry: answer from it, no search
+    - stale entry: generate from the stale memories while the fresh search runs;
+      keep that answer if the memories are unchanged, otherwise discard it and
+      generate again from the fresh memories
+    - nothing cached: search, then generate (as approach 2)
+    """
+    start = time.perf_counter()
+    snapshot, fresh = search_cache.lookup(user_id, query)
+    wasted = {"input_tokens": 0, "output_tokens": 0}
+    retrieval_time = 0.0
+
+    if snapshot is not None and fresh:
+        outcome, memories = "fresh_cache_hit", snapshot
+        usage, elapsed, response_text = run_chat(list(memory_prompt(memories, query)))
+    elif snapshot is not None:
+        speculative = SPECULATION_EXECUTOR.submit(run_chat, list(memory_prompt(snapshot, query)))
+        memories = search_cache.search(user_id, query)
+        retrieval_time = time.perf_counter() - start
+        if same_memories(snapshot, memories):
+            outcome = "speculation_reused"
+            usage, elapsed, response_text = speculative.result()
+        else:
+            # Regenerate right away; the speculative request cannot be cancelled
+            # mid-flight, so it keeps running alongside and is counted as waste
+            outcome = "speculation_discarded"
+            usage, elapsed, response_text = run_chat(list(memory_prompt(memories, query)))
+    else:
+        outcome = "serial"
+        memories = search_cache.search(user_id, query)
+        retrieval_time = time.perf_counter() - start
+        usage, elapsed, response_text = run_chat(list(memory_prompt(memories, query)))
+    end_to_end = time.perf_counter() - start
+
+    if outcome == "speculation_discarded":
+        # Collected after end_to_end is taken; it started first, so it has
+        # usually finished by the time the fresh answer arrives
+        try:
+            wasted_usage = speculative.result()[0]
+            wasted = {"input_tokens": wasted_usage["input_tokens"], "output_tokens": wasted_usage["output_tokens"]}
+        except Exception as e:
+            print(f"  Discarded speculative request failed: {e}")
+
+    metrics = {
+        "outcome": outcome,
+        "input_tokens": usage["input_tokens"],
+        "output_tokens": usage["output_tokens"],
+        "cache_hit_tokens": usage["cache_hit_tokens"],
+        "num_memories": len(memories),
+        "retrieval_time": retrieval_time,
+        "execution_time": elapsed,
+        "end_to_end_time": end_to_end,
+        "wasted_input_tokens": wasted["input_tokens"],
+        "wasted_output_tokens": wasted["output_tokens"],
+        "estimated_cost": estimate_cost(usage["input_tokens"], usage["output_tokens"], usage["cache_hit_tokens"])
+                          + estimate_cost(wasted["input_tokens"], wasted["output_tokens"]),
+        "response": response_text,
+    }
+    print(f"  {outcome}: retrieval {retrieval_time * 1000:.1f}ms, end-to-end {end_to_end:.3f}s")
+    return metrics
+
+
+def wait_for_new_memories(memory_client: Any, user_id: str, query: str, before: List[Any],
+                          timeout: float = 60.0, poll_interval: float = 1.0) -> bool:
+    """Poll the search (bypassing any cache) until its results differ from `before`."""
+    deadline = time.monotonic() + timeout
+    while True:
+        if not same_memories(before, extract_memories(memory_client.search(query, filters={"user_id": user_id}))):
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(poll_interval)
+
+
+def run_speculative_scenarios(memory_client: Any, user_id: str, query: str) -> List[Dict[str, Any]]:
+    """
+    Walk one hot user through every path of approach 7: a cold search, a fresh
+    cache hit, a stale snapshot that is still right, and a stale snapshot made
+    wrong by a new memory. The cache TTL is set per scenario (never expiring for
+    the fresh hit, expired for the stale ones), so the paths taken do not depend
+    on how long each LLM call happens to take.
+    """
+    print("\n" + "="*70)
+    print("APPROACH 7: Speculative Retrieval + Generation")
+    print("="*70)
+    search_cache = MemorySearchCache(memory_client)
+    runs = [approach_7_speculative(search_cache, user_id, query)]
+    search_cache.ttl = float("inf")
+    runs.append(approach_7_speculative(search_cache, user_id, query))
+    search_cache.ttl = 0.0
+    runs.append(approach_7_speculative(search_cache, user_id, query))
+
+    before = extract_memories(memory_client.search(query, filters={"user_id": user_id}))
+    MemoryIngestor(memory_client, user_id, version="v2").ingest([{
+        "role": "user", "content": "New: async workflows retry with idempotency keys and a dead-letter queue."}])
+    # Indexing is asynchronous; the scenario only means something once search sees the new memory
+    if not wait_for_new_memories(memory_client, user_id, query, before):
+        print("  Warning: the new memory never appeared in search results; "
+              "the last run will reuse the speculation")
+    runs.append(approach_7_speculative(search_cache, user_id, query))
+    return runs
+
+
+def print_speculative_comparison(serial: Dict[str, Any], runs: List[Dict[str, Any]]):
+    """
+    Print end-to-end latency of each speculative path next to serial approach 2.
+    """
+    print("\n" + "="*70)
+    print("SPECULATIVE RETRIEVAL VS SERIAL MEM0")
+    print("="*70)
+    print(f"{'Path':<25} {'Retrieval (ms)':<16} {'LLM (s)':<10} {'End-to-End (s)':<16} {'Wasted Tok'}")
+    print("-"*70)
+    rows = [("approach 2 (serial)", serial)] + [(r["outcome"], r) for r in runs]
+    for name, r in rows:
+        wasted = r.get("wasted_input_tokens", 0) + r.get("wasted_output_tokens", 0)
+        print(f"{name:<25} {r['retrieval_time'] * 1000:<16.1f} {r['execution_time']:<10.3f} "
+              f"{r['end_to_end_time']:<16.3f} {wasted}")
+    print("="*70)
+
+
+def print_memory_comparison(hosted: Dict[str, Any], local: Dict[str, Any]):
+    """
+    Print retrieval latency and end-to-end response time for hosted vs local memory.
+    """
+    print("\n" + "="*70)
+    print("MEMORY BACKENDS: HOSTED MEM0 VS LOCAL")
+    print("="*70)
+    print(f"{'Metric':<35} {'Hosted':<17} {'Local':<17}")
+    print("-"*70)
+    print(f"{'Retrieval Time':<35} {hosted['retrieval_time'] * 1000:<17.1f} {local['retrieval_time'] * 1000:.1f} ms")
+    print(f"{'Memories Retrieved':<35} {hosted['num_memories']:<17} {local['num_memories']}")
+    print(f"{'Input Tokens':<35} {hosted['input_tokens']:<17} {local['input_tokens']}")
+    print(f"{'LLM Time':<35} {hosted['execution_time']:<17.3f} {local['execution_time']:.3f} s")
+    print(f"{'End-to-End Time':<35} {hosted['end_to_end_time']:<17.3f} {local['end_to_end_time']:.3f} s")
+    print("="*70)
+    if local["retrieval_time"] > 0:
+        print(f"\nLocal retrieval is {hosted['retrieval_time'] / local['retrieval_time']:.0f}x faster "
+              f"({(hosted['retrieval_time'] - local['retrieval_time']) * 1000:.1f}ms saved per query)")
+
+
+def approach_3_budget_sweep(history: List[Dict[str, str]], query: str, budgets: List[int],
+                            reference: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Approach 3: run approach 1 packed to each token budget. Answer quality is the
+    token F1 of each answer against the full-context (reference) answer.
+    """
+    curve: List[Dict[str, Any]] = []
+    for budget in sorted(budgets):
+        metrics = approach_1_full_context(history, query, budget_tokens=budget)
+        metrics["answer_f1"] = token_f1(metrics["response"], reference["response"])
+        curve.append(metrics)
+    return curve
+
+
+def print_budget_curve(curve: List[Dict[str, Any]], reference: Dict[str, Any]):
+    """
+    Print answer quality and context recall against tokens for each budget.
+    """
+    print("\n" + "="*70)
+    print("QUALITY VS TOKENS: PACKED CONTEXT BUDGETS")
+    print("="*70)
+    print(f"{'Budget':<9} {'Packed':<9} {'Msgs':<7} {'Input Tok':<11} {'Recall':<9} "
+          f"{'Answer F1':<11} {'Time (s)':<10} {'Cost (USD)'}")
+    print("-"*70)
+    for m in curve:
+        print(f"{m['budget_tokens']:<9} {m['packed_tokens']:<9} {m['num_messages']:<7} "
+              f"{m['input_tokens']:<11} {m['relevance_recall']:<9.1%} {m['answer_f1']:<11.3f} "
+              f"{m['execution_time']:<10.3f} ${m['estimated_cost']:.6f}")
+    print(f"{'full':<9} {'-':<9} {'-':<7} {reference['input_tokens']:<11} {1.0:<9.1%} {1.0:<11.3f} "
+          f"{reference['execution_time']:<10.3f} ${reference['estimated_cost']:.6f}")
+    print("="*70)
+
+
 def print_comparison(metrics1: Dict[str, Any], metrics2: Dict[str, Any]):
     # Display metrics comparison
     print("\n" + "="*70)
@@ -256,8 +791,20 @@ def print_comparison(metrics1: Dict[str, Any], metrics2: Dict[str, Any]):
         f"{'Execution Time':<35} {metrics1['execution_time']:.3f}s{'':<25} {metrics2['execution_time']:.3f}s{'':<25}")
     print(
         f"{'Avg Token Throughput':<35} {metrics1['avg_token_throughput']:.2f} tok/s{'':<15} {metrics2['avg_token_throughput']:.2f} tok/s{'':<15}")
+    if metrics1["ttft"] is not None or metrics2["ttft"] is not None:
+        ttfts = [f"{m['ttft']:.3f}s" if m["ttft"] is not None else "N/A" for m in (metrics1, metrics2)]
+        print(f"{'TTFT':<35} {ttfts[0]:<30} {ttfts[1]:<30}")
+        for pct in ("p50", "p90", "p99"):
+            itls = [f"{m['itl_percentiles'][pct] * 1000:.1f}ms" if m["itl_percentiles"] else "N/A"
+                    for m in (metrics1, metrics2)]
+            print(f"{'Inter-Token Latency ' + pct:<35} {itls[0]:<30} {itls[1]:<30}")
+    print(
+        f"{'Cache Hit Tokens':<35} {metrics1['cache_hit_tokens']:<30} {metrics2['cache_hit_tokens']:<30}")
     print(
         f"{'Estimated Cost (USD)':<35} ${metrics1['estimated_cost']:.6f}{'':<20} ${metrics2['estimated_cost']:.6f}{'':<20}")
+    if get_response_cache() is not None:
+        hits = ["hit" if m["response_cached"] else "miss" for m in (metrics1, metrics2)]
+        print(f"{'Response Cache':<35} {hits[0]:<30} {hits[1]:<30}")
     print("="*70)
 
     if metrics2['execution_time'] > 0 and metrics1['execution_time'] > 0:
@@ -281,17 +828,126 @@ def print_comparison(metrics1: Dict[str, Any], metrics2: Dict[str, Any]):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Full-context vs Mem0 context management comparison")
+    parser.add_argument("--response-cache", action="store_true",
+                        help="serve repeated requests from the local on-disk response cache")
+    parser.add_argument("--response-cache-bypass", action="store_true",
+                        help="with --response-cache: never read, only refresh the cache")
+    parser.add_argument("--memory", choices=["hosted", "local", "both"], default="hosted",
+                        help="memory backend for approach 2: the hosted Mem0 API, the in-process "
+                             "NumPy store (local_memory.py), or both for a latency comparison")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream approaches 1 and 2 to measure TTFT and inter-token latency")
+    parser.add_argument("--context-budget", type=int, default=None, metavar="TOKENS",
+                        help="pack approach 1's history to the most relevant messages within TOKENS")
+    parser.add_argument("--budget-sweep", default=None, metavar="TOKENS,...",
+                        help="also run approach 1 packed to each budget (e.g. 64,128,256,512) and "
+                             "report answer quality against tokens")
+    parser.add_argument("--summary", action="store_true",
+                        help="also run approach 4: older turns compacted into a rolling summary")
+    parser.add_argument("--keep-recent", type=int, default=10,
+                        help="with --summary: turns kept verbatim after the summary (default: 10)")
+    parser.add_argument("--arrival-chunk", type=int, default=10,
+                        help="with --summary: messages per arrival, one summary update each (default: 10)")
+    parser.add_argument("--repeat-prefix", type=int, default=0, metavar="N",
+                        help="also send the full history N times with different queries to measure "
+                             "DeepSeek's automatic prefix caching")
+    parser.add_argument("--ingest-sizes", default=None, metavar="N,...",
+                        help="also bulk-ingest histories of these sizes (e.g. 50,500,5000,50000) and "
+                             "report ingest throughput and search latency")
+    parser.add_argument("--ingest-chunk", type=int, default=100,
+                        help="messages per add() call during ingestion (default: 100)")
+    parser.add_argument("--ingest-workers", type=int, default=8,
+                        help="concurrent add() calls during ingestion (default: 8)")
+    parser.add_argument("--speculative", action="store_true",
+                        help="also run approach 7: speculative generation from cached memory searches")
+    add_trial_arguments(parser)
+    add_export_arguments(parser)
+    add_tracing_arguments(parser)
+    args = parser.parse_args()
+    for flag, value in [("--arrival-chunk", args.arrival_chunk), ("--ingest-chunk", args.ingest_chunk),
+                        ("--ingest-workers", args.ingest_workers)]:
+        if value < 1:
+            parser.error(f"{flag} must be at least 1, got {value}")
+    enable_tracing_from_args(args, "context_management_with_mem0")
+    budgets = [int(b) for b in args.budget_sweep.split(",")] if args.budget_sweep else []
+
+    if args.response_cache:
+        enable_response_cache(bypass=args.response_cache_bypass)
+
+    # Open the pooled connection up front so it is not billed to approach 1's TTFT
+    warm_up_connection(get_deepseek_client())
+
     # Build and store conversation history
     conversation_history = generate_developer_conversation()
 
-    # Initialize Mem0 client (hosted API)
-    mem0_client = MemoryClient(api_key=MEM0_API_KEY)
+    # Initialize the memory clients (hosted Mem0 API and/or the local store)
+    backends = ["hosted", "local"] if args.memory == "both" else [args.memory]
+    memory_clients = {backend: get_mem0_client() if backend == "hosted" else get_local_memory_client()
+                      for backend in backends}
 
-    # Add conversation history to Mem0
-    mem0_client.add(conversation_history, user_id=USER_ID, version="v2")
+    # Add conversation history to memory and wait until it is searchable
+    ingest_stats = {}
+    for backend, memory_client in memory_clients.items():
+        ingest_stats[backend] = MemoryIngestor(
+            memory_client, USER_ID, chunk_size=args.ingest_chunk, max_workers=args.ingest_workers,
+            version="v2").ingest(conversation_history)
+        print(f"Ingested {ingest_stats[backend]['num_unique']} messages into {backend} memory "
+              f"in {ingest_stats[backend]['ingest_time']:.2f}s")
 
     query = "How should I structure a resilient async workflow with retries and idempotency?"
 
-    metrics_full = approach_1_full_context(conversation_history, query)
-    metrics_mem0 = approach_2_with_mem0(mem0_client, USER_ID, query)
-    print_comparison(metrics_full, metrics_mem0)
+    metrics_full = approach_1_full_context(conversation_history, query, args.context_budget, stream=args.stream)
+    results = {"full_context": metrics_full}
+    for backend, memory_client in memory_clients.items():
+        results[f"mem0_{backend}"] = approach_2_with_mem0(
+            memory_client, USER_ID, query, backend=backend, stream=args.stream)
+    # Budget curves are scored against the unpacked answer
+    reference = metrics_full
+    if budgets and args.context_budget is not None:
+        reference = results["full_context_unpacked"] = approach_1_full_context(conversation_history, query)
+    curve = approach_3_budget_sweep(conversation_history, query, budgets, reference)
+    for m in curve:
+        results[f"packed_{m['budget_tokens']}"] = m
+    if args.ingest_sizes:
+        sizes = [int(n) for n in args.ingest_sizes.split(",")]
+        for backend, memory_client in memory_clients.items():
+            rows = approach_6_ingest_scaling(memory_client, backend, sizes,
+                                             args.ingest_chunk, args.ingest_workers)
+            for row in rows:
+                results[f"ingest_{backend}_{row['size']}"] = row
+            print_ingest_scaling(rows)
+    speculative_runs = []
+    if args.speculative:
+        # A separate user, so the new memory added here does not leak into other approaches
+        speculative_user = f"{USER_ID}_speculative_{uuid.uuid4().hex[:8]}"
+        speculative_client = memory_clients[backends[0]]
+        MemoryIngestor(speculative_client, speculative_user, version="v2").ingest(conversation_history)
+        speculative_runs = run_speculative_scenarios(speculative_client, speculative_user, query)
+        for i, run in enumerate(speculative_runs):
+            results[f"speculative_{i}_{run['outcome']}"] = run
+    if args.summary:
+        results["rolling_summary"] = approach_4_rolling_summary(
+            conversation_history, query, keep_recent=args.keep_recent, arrival_chunk=args.arrival_chunk)
+    if args.repeat_prefix:
+        results["repeated_prefix"] = approach_5_repeated_prefix(conversation_history, args.repeat_prefix)
+    print_comparison(metrics_full, results[f"mem0_{backends[0]}"])
+    if args.memory == "both":
+        print_memory_comparison(results["mem0_hosted"], results["mem0_local"])
+    if curve:
+        print_budget_curve(curve, reference)
+    if args.summary:
+        print_summary_comparison(metrics_full, results[f"mem0_{backends[0]}"], results["rolling_summary"])
+    if args.repeat_prefix:
+        print_repeated_prefix(results["repeated_prefix"])
+    if speculative_runs:
+        print_speculative_comparison(results[f"mem0_{backends[0]}"], speculative_runs)
+    trial_backend = backends[0]
+    results.update(run_trials_from_args(args, {
+        "full_context": lambda: approach_1_full_context(
+            conversation_history, query, args.context_budget, stream=args.stream),
+        f"mem0_{trial_backend}": lambda: approach_2_with_mem0(
+            memory_clients[trial_backend], USER_ID, query, backend=trial_backend, stream=args.stream),
+    }, baseline="full_context"))
+    export_from_args(args, "context_management_with_mem0", results)
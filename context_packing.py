@@ -0,0 +1,98 @@
+"""
+Token-budgeted context packing for conversation history.
+
+Messages are ranked by BM25 relevance to the query and taken greedily, most
+relevant first, skipping near-duplicates of messages already taken, until the
+token budget is spent. The chosen messages are then emitted in their original
+order: a packed context for a growing history stays a stable prefix across
+queries, which keeps it cache-friendly, and the model reads it chronologically.
+"""
+import math
+from collections import Counter
+from typing import Callable, Dict, List, Any, Sequence, Set, Tuple
+
+from local_memory import tokenize
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Messages whose token sets overlap at least this much (Jaccard) count as duplicates
+DUPLICATE_THRESHOLD = 0.8
+
+
+def bm25_scores(query: str, documents: Sequence[str]) -> List[float]:
+    doc_tokens = [tokenize(d) for d in documents]
+    if not doc_tokens:
+        return []
+    avg_length = sum(len(t) for t in doc_tokens) / len(doc_tokens) or 1.0
+    document_frequency = Counter(term for tokens in doc_tokens for term in set(tokens))
+    n = len(doc_tokens)
+
+    scores: List[float] = []
+    query_terms = set(tokenize(query))
+    for tokens in doc_tokens:
+        tf = Counter(tokens)
+        score = 0.0
+        for term in query_terms:
+            if term not in tf:
+                continue
+            idf = math.log(1.0 + (n - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+            score += idf * tf[term] * (BM25_K1 + 1) / (
+                tf[term] + BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / avg_length))
+        scores.append(score)
+    return scores
+
+
+def is_near_duplicate(tokens: Set[str], seen: List[Set[str]], threshold: float = DUPLICATE_THRESHOLD) -> bool:
+    return any(len(tokens & other) / max(1, len(tokens | other)) >= threshold for other in seen)
+
+
+def pack_context(history: Sequence[Dict[str, str]], query: str, budget_tokens: int,
+                 count_tokens: Callable[[str], int]) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+    """
+    Pick the most relevant, non-duplicate messages that fit budget_tokens and
+    return them in original order, with packing stats.
+    """
+    texts = [m["content"] for m in history]
+    scores = bm25_scores(query, texts)
+    ranked = sorted(range(len(history)), key=lambda i: (-scores[i], i))
+
+    chosen: List[int] = []
+    seen: List[Set[str]] = []
+    used_tokens = 0
+    num_duplicates = 0
+    for i in ranked:
+        tokens = set(tokenize(texts[i]))
+        if is_near_duplicate(tokens, seen):
+            num_duplicates += 1
+            continue
+        cost = count_tokens(texts[i])
+        if used_tokens + cost > budget_tokens:
+            continue
+        chosen.append(i)
+        seen.append(tokens)
+        used_tokens += cost
+
+    chosen.sort()
+    relevant_mass = sum(s for s in scores if s > 0)
+    stats = {
+        "budget_tokens": budget_tokens,
+        "packed_tokens": used_tokens,
+        "num_history_messages": len(history),
+        "num_messages": len(chosen),
+        "num_duplicates_skipped": num_duplicates,
+        # Share of the history's total BM25 relevance that made it into the context
+        "relevance_recall": sum(scores[i] for i in chosen) / relevant_mass if relevant_mass else 1.0
+    }
+    return [history[i] for i in chosen], stats
+
+
+def token_f1(candidate: str, reference: str) -> float:
+    """Token-overlap F1 between two texts, as used for extractive QA scoring."""
+    candidate_tokens = Counter(tokenize(candidate))
+    reference_tokens = Counter(tokenize(reference))
+    overlap = sum((candidate_tokens & reference_tokens).values())
+    if overlap == 0:
+        return 0.0
+    precision = overlap / sum(candidate_tokens.values())
+    recall = overlap / sum(reference_tokens.values())
+    return 2 * precision * recall / (precision + recall)
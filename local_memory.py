@@ -0,0 +1,148 @@
+"""
+In-process memory store with the add/search surface of Mem0's MemoryClient.
+
+Each memory is embedded with a hashing embedder (signed feature hashing of
+stemmed unigrams and bigrams without stopwords, sublinear term frequency,
+L2-normalized), so nothing is downloaded and nothing leaves the process.
+Vectors live in one growable NumPy matrix per user; search weights the query
+by IDF over that user's memories and takes the top-k cosine scores with a
+single matrix-vector product.
+
+Unlike hosted Mem0, add() does not ask an LLM to extract facts: every message
+becomes one memory, the same way the mock server stores them.
+"""
+import hashlib
+import re
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Tuple, Union
+
+import numpy as np
+
+DEFAULT_DIMENSIONS = 1024
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = set("""a an and are as at be but by for from how i in is it of on or over should
+the to via we what when where which with you your""".split())
+SUFFIXES = ("ies", "ing", "ed", "es", "s")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords, with plural and -ing/-ed endings stripped."""
+    tokens: List[str] = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        for suffix in SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                token = token[:-len(suffix)] + ("y" if suffix == "ies" else "")
+                break
+        tokens.append(token)
+    return tokens
+
+
+class HashingEmbedder:
+    def __init__(self, dimensions: int = DEFAULT_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _bucket(self, feature: str) -> Tuple[int, float]:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        return h % self.dimensions, (1.0 if h >> 63 else -1.0)
+
+    def term_frequencies(self, text: str) -> np.ndarray:
+        """Signed, sublinear (1 + log tf) feature counts, not normalized."""
+        tokens = tokenize(text)
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        counts: Dict[Tuple[int, float], int] = {}
+        for feature in features:
+            key = self._bucket(feature)
+            counts[key] = counts.get(key, 0) + 1
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for (index, sign), count in counts.items():
+            vector[index] += sign * (1.0 + np.log(count))
+        return vector
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = self.term_frequencies(text)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+
+class VectorIndex:
+    """Row-per-memory float32 matrix that doubles its capacity as it fills."""
+
+    def __init__(self, dimensions: int, capacity: int = 64):
+        self.vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.document_frequency = np.zeros(dimensions, dtype=np.float32)
+        self.size = 0
+
+    def add(self, vector: np.ndarray) -> int:
+        if self.size == len(self.vectors):
+            grown = np.zeros((2 * len(self.vectors), self.vectors.shape[1]), dtype=np.float32)
+            grown[:self.size] = self.vectors[:self.size]
+            self.vectors = grown
+        self.vectors[self.size] = vector
+        self.document_frequency += vector != 0
+        self.size += 1
+        return self.size - 1
+
+    def search(self, query: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        if self.size == 0:
+            return []
+        idf = np.log((1.0 + self.size) / (1.0 + self.document_frequency)) + 1.0
+        weighted = query * idf
+        norm = np.linalg.norm(weighted)
+        if norm == 0:
+            return []
+        scores = self.vectors[:self.size] @ (weighted / norm)
+        k = min(top_k, self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+
+class LocalMemoryClient:
+    def __init__(self, embedder: Optional[HashingEmbedder] = None):
+        self.embedder = embedder or HashingEmbedder()
+        self._indexes: Dict[str, VectorIndex] = {}
+        self._memories: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, messages: Union[str, List[Dict[str, Any]]], user_id: Optional[str] = None,
+            **kwargs: Any) -> Dict[str, Any]:
+        user_id = user_id or "default"
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        added: List[Dict[str, Any]] = []
+        for message in messages:
+            text = str(message.get("content", ""))
+            vector = self.embedder.embed(text)
+            memory = {"id": str(uuid.uuid4()), "memory": text, "user_id": user_id,
+                      "created_at": datetime.now(timezone.utc).isoformat()}
+            with self._lock:
+                index = self._indexes.setdefault(user_id, VectorIndex(self.embedder.dimensions))
+                index.add(vector)
+                self._memories.setdefault(user_id, []).append(memory)
+            added.append({"id": memory["id"], "memory": text, "event": "ADD"})
+        return {"results": added}
+
+    def search(self, query: str, filters: Optional[Dict[str, Any]] = None, top_k: int = 10,
+               user_id: Optional[str] = None, **kwargs: Any) -> Dict[str, Any]:
+        user_id = (filters or {}).get("user_id") or user_id or "default"
+        query_vector = self.embedder.term_frequencies(query)
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                return {"results": []}
+            hits = index.search(query_vector, top_k)
+            memories = self._memories[user_id]
+            return {"results": [{**memories[i], "score": score} for i, score in hits]}
+
+    def get_all(self, filters: Optional[Dict[str, Any]] = None, page: int = 1, page_size: int = 100,
+                **kwargs: Any) -> Dict[str, Any]:
+        user_id = (filters or {}).get("user_id") or "default"
+        with self._lock:
+            memories = self._memories.get(user_id, [])
+            start = (page - 1) * page_size
+            return {"count": len(memories), "next": None, "previous": None,
+                    "results": memories[start:start + page_size]}
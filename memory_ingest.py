@@ -0,0 +1,136 @@
+"""
+Bulk ingestion of conversation history into a memory store.
+
+Messages are deduplicated by a hash of role and normalized content (across
+calls, per ingestor), split into chunks and submitted with bounded
+parallelism. Hosted Mem0 indexes asynchronously, so an add() returning does
+not mean the memories are searchable; wait_for_indexing() polls the store's
+memory count until it reaches the expected number or stops changing.
+
+Works with Mem0's MemoryClient and with local_memory.LocalMemoryClient.
+"""
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Set
+
+from tracing import request_span
+
+DEFAULT_CHUNK_SIZE = 100
+DEFAULT_MAX_WORKERS = 8
+
+
+def content_hash(message: Dict[str, Any]) -> str:
+    normalized = " ".join(str(message.get("content", "")).lower().split())
+    return hashlib.sha256(f"{message.get('role', 'user')}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+def memory_count(memory_client: Any, user_id: str) -> int:
+    response = memory_client.get_all(filters={"user_id": user_id}, page=1, page_size=1)
+    if isinstance(response, dict):
+        return int(response.get("count", len(response.get("results", []))))
+    return len(response)
+
+
+def wait_for_indexing(memory_client: Any, user_id: str, expected: int, timeout: float = 300.0,
+                      poll_interval: float = 1.0, settle_polls: int = 3, baseline: int = 0) -> Dict[str, Any]:
+    """
+    Poll until the user has `expected` memories, or the count has risen above
+    `baseline` (the count before the add) and been unchanged for settle_polls
+    polls (hosted Mem0 extracts facts, so the final count need not match the
+    number of messages).
+
+    index_wait_time runs until the count reached its final value, so the settle
+    polls are not counted; index_poll_time is the whole time spent polling.
+    """
+    start = time.perf_counter()
+    count, unchanged, polls, settled_at = -1, 0, 0, 0.0
+    while True:
+        current = memory_count(memory_client, user_id)
+        polls += 1
+        elapsed = time.perf_counter() - start
+        if current != count:
+            settled_at = elapsed
+        unchanged = unchanged + 1 if current == count and current > baseline else 0
+        count = current
+        if count >= expected or unchanged >= settle_polls or elapsed >= timeout:
+            return {"indexed_count": count, "index_wait_time": settled_at, "index_poll_time": elapsed,
+                    "index_polls": polls, "index_timed_out": count < expected and unchanged < settle_polls}
+        time.sleep(poll_interval)
+
+
+class MemoryIngestor:
+    def __init__(self, memory_client: Any, user_id: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_workers: int = DEFAULT_MAX_WORKERS, **add_kwargs: Any):
+        self.memory_client = memory_client
+        self.user_id = user_id
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.add_kwargs = add_kwargs
+        self._seen: Set[str] = set()
+
+    def _add_chunk(self, chunk: List[Dict[str, Any]]) -> float:
+        start = time.perf_counter()
+        with request_span("mem0.add", {"mem0.user_id": self.user_id, "mem0.num_messages": len(chunk)}):
+            self.memory_client.add(chunk, user_id=self.user_id, **self.add_kwargs)
+        return time.perf_counter() - start
+
+    def ingest(self, messages: List[Dict[str, Any]], wait: bool = True,
+               timeout: float = 300.0) -> Dict[str, Any]:
+        """
+        Deduplicate, chunk and submit messages; with wait, also block until indexed.
+        Chunks that fail are counted and skipped; their messages are not marked
+        as seen, so a later ingest() retries them.
+
+        ingest_throughput is messages added per second of submit time plus
+        index_wait_time; it is None when indexing timed out, since the messages
+        were never all searchable (index_timed_out says so).
+        """
+        pending: Dict[str, Dict[str, Any]] = {}
+        for message in messages:
+            digest = content_hash(message)
+            if digest not in self._seen and digest not in pending:
+                pending[digest] = message
+        unique = list(pending.values())
+        digests = list(pending)
+        chunks = [(digests[i:i + self.chunk_size], unique[i:i + self.chunk_size])
+                  for i in range(0, len(unique), self.chunk_size)]
+        # The user may already have memories; wait for the new ones on top of them
+        baseline = memory_count(self.memory_client, self.user_id) if wait and unique else 0
+
+        start = time.perf_counter()
+        chunk_times: List[float] = []
+        failed_chunks, num_added = 0, 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._add_chunk, chunk) for _, chunk in chunks]
+            for (chunk_digests, chunk), future in zip(chunks, futures):
+                try:
+                    chunk_times.append(future.result())
+                except Exception as e:
+                    failed_chunks += 1
+                    print(f"  Chunk failed: {e}")
+                    continue
+                self._seen.update(chunk_digests)
+                num_added += len(chunk)
+        submit_time = time.perf_counter() - start
+
+        stats: Dict[str, Any] = {
+            "num_messages": len(messages),
+            "num_unique": len(unique),
+            "num_duplicates": len(messages) - len(unique),
+            "num_chunks": len(chunks),
+            "failed_chunks": failed_chunks,
+            "num_added": num_added,
+            "submit_time": submit_time,
+            "avg_chunk_time": sum(chunk_times) / len(chunk_times) if chunk_times else 0.0,
+            "submit_throughput": num_added / submit_time if submit_time > 0 else 0.0,
+        }
+        # Nothing new reached the store, so there is nothing to wait for
+        if wait and num_added:
+            stats.update(wait_for_indexing(self.memory_client, self.user_id, baseline + num_added, timeout,
+                                           baseline=baseline))
+        ingest_time = submit_time + stats.get("index_wait_time", 0.0)
+        stats["ingest_time"] = ingest_time
+        stats["ingest_throughput"] = (None if stats.get("index_timed_out") else
+                                      num_added / ingest_time if ingest_time > 0 else 0.0)
+        return stats
@@ -0,0 +1,61 @@
+"""
+Per-user cache of memory search results with a TTL.
+
+A fresh entry (younger than ttl) answers a search without a round-trip. An
+expired entry is kept as a stale snapshot: the speculative path in
+context_management_with_mem0.py generates from it while the fresh search runs,
+and keeps that answer if the fresh search returns the same memories.
+"""
+import threading
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+DEFAULT_TTL = 60.0
+
+
+def extract_memories(search_results: Any) -> List[Any]:
+    """The list of memories in a Mem0 search response (dict with results, or a bare list)."""
+    if search_results and isinstance(search_results, dict) and "results" in search_results:
+        return search_results["results"]
+    if isinstance(search_results, list):
+        return search_results
+    return []
+
+
+def memory_text(memory: Any) -> str:
+    if isinstance(memory, dict):
+        return str(memory.get("memory") or memory.get("data", {}).get("memory", memory))
+    return str(memory)
+
+
+def same_memories(a: List[Any], b: List[Any]) -> bool:
+    """Whether two searches retrieved the same memories, ignoring scores."""
+    return [memory_text(m) for m in a] == [memory_text(m) for m in b]
+
+
+class MemorySearchCache:
+    def __init__(self, memory_client: Any, ttl: float = DEFAULT_TTL):
+        self.memory_client = memory_client
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, str], Tuple[float, List[Any]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(user_id: str, query: str) -> Tuple[str, str]:
+        return user_id, " ".join(query.lower().split())
+
+    def lookup(self, user_id: str, query: str) -> Tuple[Optional[List[Any]], bool]:
+        """(memories, fresh); memories is None when nothing was ever cached."""
+        with self._lock:
+            entry = self._entries.get(self._key(user_id, query))
+        if entry is None:
+            return None, False
+        stored_at, memories = entry
+        return memories, time.monotonic() - stored_at < self.ttl
+
+    def search(self, user_id: str, query: str) -> List[Any]:
+        """Search the memory store and cache the result, whatever is cached."""
+        memories = extract_memories(self.memory_client.search(query, filters={"user_id": user_id}))
+        with self._lock:
+            self._entries[self._key(user_id, query)] = (time.monotonic(), memories)
+        return memories
@@ -0,0 +1,152 @@
+"""
+Machine-readable export of benchmark metrics.
+
+Every script returns plain `metrics` dicts per approach. This module turns one
+run (all approaches plus the CLI configuration and the git SHA) into a record
+and writes it as JSON, as CSV (one row per request plus one aggregate row per
+approach), or as a Prometheus textfile for node_exporter's textfile collector.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import subprocess
+import time
+import uuid
+from typing import Dict, List, Any, Optional
+
+# Large or free-text fields that do not belong in metrics exports
+EXCLUDED_FIELDS = {"response", "text", "window_history",
+                   "latencies", "inter_token_latencies"}
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def git_sha() -> str:
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR,
+                                capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+    return result.stdout.strip() if result.returncode == 0 else "unknown"
+
+
+def flatten(values: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Keep scalar fields and flatten one level of nested dicts, so
+    {"ttft_percentiles": {"p50": 0.2}} becomes {"ttft_percentiles_p50": 0.2}.
+    """
+    flat: Dict[str, Any] = {}
+    for key, value in values.items():
+        if key in EXCLUDED_FIELDS or key == "requests":
+            continue
+        if isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                if isinstance(sub_value, (int, float, str, bool)) or sub_value is None:
+                    flat[f"{key}_{sub_key}"] = sub_value
+        elif isinstance(value, (int, float, str, bool)) or value is None:
+            flat[key] = value
+    return flat
+
+
+def build_run_record(script: str, approaches: Dict[str, Dict[str, Any]],
+                     config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return {
+        "run_id": uuid.uuid4().hex,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_sha": git_sha(),
+        "script": script,
+        "config": config or {},
+        "approaches": {
+            name: {
+                "aggregate": flatten(metrics),
+                "requests": [flatten(r) for r in metrics.get("requests", [])]
+            }
+            for name, metrics in approaches.items()
+        }
+    }
+
+
+def write_json(record: Dict[str, Any], path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2)
+
+
+def write_csv(record: Dict[str, Any], path: str):
+    rows: List[Dict[str, Any]] = []
+    for name, approach in record["approaches"].items():
+        base = {"run_id": record["run_id"], "timestamp": record["timestamp"],
+                "git_sha": record["git_sha"], "script": record["script"], "approach": name}
+        rows.append({**base, "request": "aggregate", **approach["aggregate"]})
+        for i, request in enumerate(approach["requests"]):
+            rows.append({**base, "request": i, **request})
+
+    columns: List[str] = []
+    for row in rows:
+        columns += [key for key in row if key not in columns]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _prometheus_name(key: str) -> str:
+    return "llm_bench_" + re.sub(r"[^a-zA-Z0-9_]", "_", key)
+
+
+def write_prometheus(record: Dict[str, Any], path: str):
+    """
+    Write numeric aggregates as gauges. The file is written to a temp name and
+    renamed so the textfile collector never reads a partial file.
+    """
+    # The exposition format wants every sample of a metric family together
+    samples: Dict[str, List[str]] = {}
+    for name, approach in record["approaches"].items():
+        labels = (f'script="{record["script"]}",approach="{name}",'
+                  f'git_sha="{record["git_sha"]}"')
+        for key, value in approach["aggregate"].items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            metric = _prometheus_name(key)
+            samples.setdefault(metric, []).append(
+                f"{metric}{{{labels}}} {value}")
+
+    lines: List[str] = []
+    for metric, metric_samples in samples.items():
+        lines.append(f"# TYPE {metric} gauge")
+        lines += metric_samples
+    lines.append("# TYPE llm_bench_last_run_timestamp_seconds gauge")
+    lines.append(f"llm_bench_last_run_timestamp_seconds{{script=\"{record['script']}\"}} {time.time()}")
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+def add_export_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--export-json", metavar="PATH",
+                        help="write per-request and aggregate metrics as JSON")
+    parser.add_argument("--export-csv", metavar="PATH",
+                        help="write per-request and aggregate metrics as CSV")
+    parser.add_argument("--export-prom", metavar="PATH",
+                        help="write aggregate metrics as a Prometheus textfile")
+
+
+def export_from_args(args: argparse.Namespace, script: str, approaches: Dict[str, Dict[str, Any]]):
+    """Write whichever exports were requested on the command line."""
+    if not (args.export_json or args.export_csv or args.export_prom):
+        return
+    config = {key: value for key, value in vars(args).items()
+              if not key.startswith("export_")}
+    record = build_run_record(script, approaches, config)
+    if args.export_json:
+        write_json(record, args.export_json)
+        print(f"Metrics written to {args.export_json}")
+    if args.export_csv:
+        write_csv(record, args.export_csv)
+        print(f"Metrics written to {args.export_csv}")
+    if args.export_prom:
+        write_prometheus(record, args.export_prom)
+        print(f"Metrics written to {args.export_prom}")
@@ -0,0 +1,743 @@
+"""
+Offline stand-in for the LLM endpoints used by the demos.
+
+Speaks just enough of three APIs to run every script without network access:
+  - Anthropic Messages API:   POST /v1/messages (JSON and SSE streaming),
+                              POST /v1/messages/count_tokens
+  - Anthropic Message Batches: POST /v1/messages/batches, GET .../{id}, GET .../{id}/results
+  - OpenAI chat completions:  POST /chat/completions and /v1/chat/completions
+  - Mem0 hosted memory:       GET /v1/ping/, POST /v3/memories/add/, POST /v3/memories/search/,
+                              POST /v3/memories/ (list with count)
+
+Latency is simulated as a fixed TTFT, plus prefill time per uncached input token,
+plus a per-token delay while generating output. Prefix caching is simulated for
+both APIs: Anthropic-style explicit `cache_control` breakpoints and DeepSeek-style
+automatic prefix caching in 64-token units. Token counts use the same
+4-chars-per-token estimate as `token_estimate_from_text`. Optional request and
+input-token rate limits (429 + anthropic-ratelimit-* headers) and a concurrency
+cap (529 overloaded) exercise client-side backoff. Added memories can be made
+visible only after an indexing delay, like hosted Mem0's asynchronous processing.
+
+Usage:
+    python mock_llm_server.py --port 8080 --ttft 0.2 --per-token-latency 0.01
+    export ANTHROPIC_BASE_URL="http://127.0.0.1:8080"
+    export DEEPSEEK_API_BASE="http://127.0.0.1:8080"
+    export MEM0_API_HOST="http://127.0.0.1:8080"
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Optional, Tuple
+
+# Anthropic only caches prefixes of at least this many tokens (Sonnet models)
+MIN_CACHEABLE_TOKENS = 1024
+# DeepSeek's automatic context cache works in units of 64 tokens
+DEEPSEEK_CACHE_UNIT_TOKENS = 64
+CACHE_TTL_SECONDS = {"5m": 300.0, "1h": 3600.0}
+
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "ttft": 0.2,
+    "per_token_latency": 0.01,
+    "prefill_per_1k_tokens": 0.05,
+    "cache_read_discount": 0.1,
+    "cache_ttl_scale": 1.0,
+    "output_tokens": 64,
+    "requests_per_minute": 0,
+    "input_tokens_per_minute": 0,
+    "max_concurrent": 0,
+    "batch_processing_time": 2.0,
+    "memory_indexing_delay": 0.0,
+    "verbose": False,
+}
+
+VOCABULARY = [
+    "the", "king", "ghost", "night", "watch", "Denmark", "Hamlet", "Horatio",
+    "speak", "mark", "answer", "father", "spirit", "honour", "madness", "soft",
+    "castle", "platform", "guard", "act", "scene", "line", "player", "court",
+]
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough estimate: 4 chars per token (matches token_estimate_from_text)
+    return max(1, len(text) // 4) if text else 0
+
+
+def _block_text(block: Any) -> str:
+    if isinstance(block, str):
+        return block
+    if isinstance(block, dict):
+        if block.get("type") == "text":
+            return block.get("text", "")
+        return json.dumps(block, sort_keys=True)
+    return str(block)
+
+
+def _content_blocks(content: Any) -> List[Any]:
+    if isinstance(content, list):
+        return content
+    return [content]
+
+
+class PrefixCache:
+    """
+    Thread-safe map of prefix hash -> expiry time.
+    Entries become visible only when `store` is called, which the handlers do
+    after prefill, so concurrent cold requests for the same prefix all miss.
+    ttl_scale shrinks every TTL so expiry can be exercised in seconds.
+    """
+
+    def __init__(self, ttl_scale: float = 1.0):
+        self.ttl_scale = ttl_scale
+        self._entries: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, key: str, ttl: float) -> bool:
+        now = time.monotonic()
+        ttl *= self.ttl_scale
+        with self._lock:
+            expiry = self._entries.get(key)
+            if expiry is None or expiry < now:
+                self._entries.pop(key, None)
+                return False
+            # A hit refreshes the TTL
+            self._entries[key] = now + ttl
+            return True
+
+    def store(self, key: str, ttl: float):
+        with self._lock:
+            self._entries[key] = time.monotonic() + ttl * self.ttl_scale
+
+
+class TokenBucket:
+    """Continuously refilled per-minute budget; a limit of 0 means unlimited."""
+
+    def __init__(self, per_minute: int):
+        self.limit = per_minute
+        self.available = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.available = min(float(self.limit), self.available +
+                             (now - self.updated) * self.limit / 60.0)
+        self.updated = now
+
+    def seconds_until(self, amount: float) -> float:
+        missing = amount - self.available
+        return max(0.0, missing * 60.0 / self.limit) if self.limit else 0.0
+
+    def headers(self, name: str) -> Dict[str, str]:
+        if not self.limit:
+            return {}
+        reset = datetime.now(timezone.utc) + \
+            timedelta(seconds=self.seconds_until(self.limit))
+        return {
+            f"anthropic-ratelimit-{name}-limit": str(self.limit),
+            f"anthropic-ratelimit-{name}-remaining": str(int(self.available)),
+            f"anthropic-ratelimit-{name}-reset": reset.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+
+
+class RateLimiter:
+    """
+    Anthropic-style limits: requests and input tokens per minute (429 with
+    retry-after when exhausted) and a concurrency cap that answers 529 overloaded.
+    Cache reads do not count against the input token budget, as on the real API.
+    """
+
+    def __init__(self, requests_per_minute: int, input_tokens_per_minute: int, max_concurrent: int):
+        self.requests = TokenBucket(requests_per_minute)
+        self.input_tokens = TokenBucket(input_tokens_per_minute)
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def admit(self, input_tokens: int) -> Tuple[Optional[int], Dict[str, str]]:
+        """Return (error status or None, rate limit headers) and reserve budget on success."""
+        with self._lock:
+            self.requests.refill()
+            self.input_tokens.refill()
+            if self.max_concurrent and self.in_flight >= self.max_concurrent:
+                return 529, {}
+            wait = max(self.requests.seconds_until(1),
+                       self.input_tokens.seconds_until(min(input_tokens, self.input_tokens.limit)))
+            if wait > 0:
+                headers = {**self.requests.headers("requests"), **self.input_tokens.headers("input-tokens"),
+                           "retry-after": str(max(1, int(wait + 0.999)))}
+                return 429, headers
+            if self.requests.limit:
+                self.requests.available -= 1
+            if self.input_tokens.limit:
+                self.input_tokens.available -= input_tokens
+            self.in_flight += 1
+            return None, {**self.requests.headers("requests"), **self.input_tokens.headers("input-tokens")}
+
+    def finish(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+def anthropic_prefix_usage(body: Dict[str, Any], cache: PrefixCache) -> Tuple[Dict[str, int], List[Tuple[str, float]]]:
+    """
+    Work out input/cache_read/cache_creation tokens for a Messages API request.
+    Returns the usage and the (prefix_key, ttl) breakpoints to store after prefill.
+    """
+    digest = hashlib.sha256(str(body.get("model", "")).encode("utf-8"))
+    total_tokens = 0
+    breakpoints: List[Tuple[str, int, float]] = []
+
+    def consume(block: Any):
+        nonlocal total_tokens
+        text = _block_text(block)
+        digest.update(text.encode("utf-8"))
+        total_tokens += estimate_tokens(text)
+        cache_control = block.get("cache_control") if isinstance(
+            block, dict) else None
+        if cache_control:
+            ttl = CACHE_TTL_SECONDS.get(cache_control.get("ttl", "5m"), 300.0)
+            breakpoints.append((digest.hexdigest(), total_tokens, ttl))
+
+    system = body.get("system")
+    if system:
+        for block in _content_blocks(system):
+            consume(block)
+    for message in body.get("messages", []):
+        digest.update(str(message.get("role", "")).encode("utf-8"))
+        for block in _content_blocks(message.get("content", "")):
+            consume(block)
+
+    cache_read = 0
+    for key, tokens, ttl in reversed(breakpoints):
+        if cache.lookup(key, ttl):
+            cache_read = tokens
+            break
+
+    to_store: List[Tuple[str, float]] = []
+    cache_creation = 0
+    for key, tokens, ttl in breakpoints:
+        if tokens > cache_read and tokens >= MIN_CACHEABLE_TOKENS:
+            to_store.append((key, ttl))
+            cache_creation = tokens - cache_read
+
+    usage = {
+        "input_tokens": total_tokens - cache_read - cache_creation,
+        "cache_read_input_tokens": cache_read,
+        "cache_creation_input_tokens": cache_creation,
+    }
+    return usage, to_store
+
+
+def openai_prefix_usage(body: Dict[str, Any], cache: PrefixCache) -> Tuple[Dict[str, int], List[Tuple[str, float]]]:
+    """
+    DeepSeek-style automatic prefix caching: every 64-token boundary of the
+    serialized conversation is a cache entry; the longest stored one is a hit.
+    """
+    serialized = str(body.get("model", "")) + "".join(
+        f"{m.get('role', '')}:{_block_text(m.get('content', ''))}" for m in body.get("messages", []))
+    prompt_tokens = estimate_tokens(serialized)
+    unit_chars = DEEPSEEK_CACHE_UNIT_TOKENS * 4
+    ttl = CACHE_TTL_SECONDS["1h"]
+
+    keys: List[str] = []
+    digest = hashlib.sha256()
+    for start in range(0, (len(serialized) // unit_chars) * unit_chars, unit_chars):
+        digest.update(serialized[start:start + unit_chars].encode("utf-8"))
+        keys.append(digest.hexdigest())
+
+    hit_units = 0
+    for units in range(len(keys), 0, -1):
+        if cache.lookup(keys[units - 1], ttl):
+            hit_units = units
+            break
+
+    hit_tokens = min(prompt_tokens, hit_units * DEEPSEEK_CACHE_UNIT_TOKENS)
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "prompt_cache_hit_tokens": hit_tokens,
+        "prompt_cache_miss_tokens": prompt_tokens - hit_tokens,
+    }
+    return usage, [(key, ttl) for key in keys[hit_units:]]
+
+
+def generate_tokens(seed_text: str, count: int) -> List[str]:
+    """Deterministic pseudo-text: the same prompt always yields the same tokens."""
+    rng = random.Random(hashlib.sha256(seed_text.encode("utf-8")).hexdigest())
+    return [rng.choice(VOCABULARY) + " " for _ in range(count)]
+
+
+def output_budget(requested: Any, config: Dict[str, Any]) -> int:
+    """Generate max_tokens tokens, but never more than the configured output length."""
+    requested = requested or config["output_tokens"]
+    return max(1, min(int(requested), config["output_tokens"]))
+
+
+def mock_message(body: Dict[str, Any], usage: Dict[str, int], config: Dict[str, Any]) -> Dict[str, Any]:
+    """A complete non-streaming Messages API response to body."""
+    messages = body.get("messages", [])
+    seed = _block_text(messages[-1].get("content", "")) if messages else ""
+    tokens = generate_tokens(seed, output_budget(body.get("max_tokens"), config))
+    stop_reason = "max_tokens" if len(
+        tokens) >= body.get("max_tokens", len(tokens) + 1) else "end_turn"
+    return {
+        "id": f"msg_mock_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", "mock-model"),
+        "content": [{"type": "text", "text": "".join(tokens).strip()}],
+        "stop_reason": stop_reason,
+        "stop_sequence": None,
+        "usage": {**usage, "output_tokens": len(tokens)},
+    }
+
+
+def _rfc3339(offset_seconds: float = 0.0) -> str:
+    moment = datetime.now(timezone.utc) + timedelta(seconds=offset_seconds)
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MockLLMServer"
+
+    def log_message(self, format: str, *args: Any):
+        if self.server.config["verbose"]:
+            super().log_message(format, *args)
+
+    # ---- plumbing -------------------------------------------------------
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        return json.loads(raw) if raw else {}
+
+    def _send_json(self, payload: Any, status: int = 200, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("request-id", f"req_mock_{uuid.uuid4().hex[:24]}")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_stream(self, headers: Optional[Dict[str, str]] = None):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("request-id", f"req_mock_{uuid.uuid4().hex[:24]}")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _send_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_sse(self, event: Optional[str], payload: Any):
+        data = payload if isinstance(payload, str) else json.dumps(payload)
+        prefix = f"event: {event}\n" if event else ""
+        self._send_chunk(f"{prefix}data: {data}\n\n".encode("utf-8"))
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _prefill(self, uncached_tokens: int, cached_tokens: int, to_store: List[Tuple[str, float]]):
+        config = self.server.config
+        billed_tokens = uncached_tokens + \
+            cached_tokens * config["cache_read_discount"]
+        time.sleep(config["ttft"] + billed_tokens /
+                   1000.0 * config["prefill_per_1k_tokens"])
+        for key, ttl in to_store:
+            self.server.prefix_cache.store(key, ttl)
+
+    def _output_budget(self, body: Dict[str, Any], key: str) -> int:
+        return output_budget(body.get(key), self.server.config)
+
+    # ---- routing --------------------------------------------------------
+
+    def do_HEAD(self):
+        # Cheap probe for opening a pooled connection before timed requests
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path.startswith("/v1/messages/batches/"):
+            self._handle_batch_get(path[len("/v1/messages/batches/"):])
+        elif path == "/v1/ping/":
+            self._send_json({"status": "ok", "org_id": "mock-org",
+                            "project_id": "mock-project", "user_email": None})
+        else:
+            self._send_json({"error": f"unknown path {path}"}, status=404)
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        try:
+            body = self._read_json()
+        except json.JSONDecodeError:
+            self._send_json({"error": "invalid JSON body"}, status=400)
+            return
+
+        if path == "/v1/messages":
+            self._handle_anthropic_messages(body)
+        elif path == "/v1/messages/count_tokens":
+            self._handle_count_tokens(body)
+        elif path == "/v1/messages/batches":
+            self._handle_batch_create(body)
+        elif path in ("/chat/completions", "/v1/chat/completions"):
+            self._handle_openai_chat(body)
+        elif path == "/v3/memories/add/":
+            self._handle_mem0_add(body)
+        elif path == "/v3/memories/search/":
+            self._handle_mem0_search(body)
+        elif path == "/v3/memories/":
+            self._handle_mem0_list(body, self.path.partition("?")[2])
+        else:
+            self._send_json({"error": f"unknown path {path}"}, status=404)
+
+    # ---- Anthropic Messages API -----------------------------------------
+
+    def _handle_count_tokens(self, body: Dict[str, Any]):
+        blocks = list(_content_blocks(body.get("system") or []))
+        for message in body.get("messages", []):
+            blocks += _content_blocks(message.get("content", ""))
+        self._send_json({"input_tokens": sum(estimate_tokens(_block_text(b)) for b in blocks)})
+
+    def _handle_anthropic_messages(self, body: Dict[str, Any]):
+        usage, to_store = anthropic_prefix_usage(body, self.server.prefix_cache)
+        uncached = usage["input_tokens"] + \
+            usage["cache_creation_input_tokens"]
+        status, limit_headers = self.server.rate_limiter.admit(uncached)
+        if status == 429:
+            self._send_json({"type": "error", "error": {
+                "type": "rate_limit_error", "message": "Mock rate limit exceeded"}},
+                status=429, headers=limit_headers)
+            return
+        if status == 529:
+            self._send_json({"type": "error", "error": {
+                "type": "overloaded_error", "message": "Mock server overloaded"}}, status=529)
+            return
+        try:
+            self._send_anthropic_message(
+                body, usage, to_store, uncached, limit_headers)
+        finally:
+            self.server.rate_limiter.finish()
+
+    def _send_anthropic_message(self, body: Dict[str, Any], usage: Dict[str, int],
+                                to_store: List[Tuple[str, float]], uncached: int,
+                                limit_headers: Dict[str, str]):
+        messages = body.get("messages", [])
+        seed = _block_text(messages[-1].get("content", "")) if messages else ""
+        max_tokens = self._output_budget(body, "max_tokens")
+        tokens = generate_tokens(seed, max_tokens)
+        stop_reason = "max_tokens" if len(
+            tokens) >= body.get("max_tokens", len(tokens) + 1) else "end_turn"
+        message_id = f"msg_mock_{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "mock-model")
+
+        if not body.get("stream"):
+            self._prefill(uncached, usage["cache_read_input_tokens"], to_store)
+            time.sleep(len(tokens) * self.server.config["per_token_latency"])
+            self._send_json(mock_message(body, usage, self.server.config),
+                            headers=limit_headers)
+            return
+
+        self._start_stream(limit_headers)
+        self._prefill(uncached, usage["cache_read_input_tokens"], to_store)
+        self._send_sse("message_start", {
+            "type": "message_start",
+            "message": {
+                "id": message_id,
+                "type": "message",
+                "role": "assistant",
+                "model": model,
+                "content": [],
+                "stop_reason": None,
+                "stop_sequence": None,
+                "usage": {**usage, "output_tokens": 1},
+            },
+        })
+        self._send_sse("content_block_start", {
+            "type": "content_block_start", "index": 0,
+            "content_block": {"type": "text", "text": ""}})
+        self._send_sse("ping", {"type": "ping"})
+        for i, token in enumerate(tokens):
+            if i > 0:
+                time.sleep(self.server.config["per_token_latency"])
+            self._send_sse("content_block_delta", {
+                "type": "content_block_delta", "index": 0,
+                "delta": {"type": "text_delta", "text": token}})
+        self._send_sse("content_block_stop", {
+                       "type": "content_block_stop", "index": 0})
+        self._send_sse("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+            "usage": {"output_tokens": len(tokens)},
+        })
+        self._send_sse("message_stop", {"type": "message_stop"})
+        self._end_stream()
+
+    # ---- Anthropic Message Batches API ----------------------------------
+
+    def _handle_batch_create(self, body: Dict[str, Any]):
+        batch_id = f"msgbatch_mock_{uuid.uuid4().hex[:24]}"
+        requests = body.get("requests", [])
+        batch = {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "in_progress",
+            "request_counts": {"processing": len(requests), "succeeded": 0,
+                               "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": _rfc3339(),
+            "expires_at": _rfc3339(24 * 3600),
+            "ended_at": None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": None,
+        }
+        results_url = f"http://{self.headers.get('Host')}/v1/messages/batches/{batch_id}/results"
+        with self.server.batch_lock:
+            self.server.batches[batch_id] = {"batch": batch, "results": []}
+        threading.Thread(target=self.server.process_batch,
+                         args=(batch_id, requests, results_url), daemon=True).start()
+        self._send_json(batch)
+
+    def _handle_batch_get(self, rest: str):
+        batch_id, _, suffix = rest.partition("/")
+        with self.server.batch_lock:
+            entry = self.server.batches.get(batch_id)
+            batch = dict(entry["batch"]) if entry else None
+            results = list(entry["results"]) if entry else []
+        if batch is None:
+            self._send_json({"type": "error", "error": {
+                "type": "not_found_error", "message": f"batch {batch_id} not found"}}, status=404)
+        elif suffix == "results":
+            data = "".join(json.dumps(r) + "\n" for r in results).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/binary")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._send_json(batch)
+
+    # ---- OpenAI chat completions ----------------------------------------
+
+    def _handle_openai_chat(self, body: Dict[str, Any]):
+        usage, to_store = openai_prefix_usage(body, self.server.prefix_cache)
+        messages = body.get("messages", [])
+        seed = _block_text(messages[-1].get("content", "")) if messages else ""
+        tokens = generate_tokens(seed, self._output_budget(body, "max_tokens"))
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        model = body.get("model", "mock-model")
+        full_usage = {
+            **usage,
+            "completion_tokens": len(tokens),
+            "total_tokens": usage["prompt_tokens"] + len(tokens),
+            "prompt_tokens_details": {"cached_tokens": usage["prompt_cache_hit_tokens"]},
+        }
+
+        if not body.get("stream"):
+            self._prefill(usage["prompt_cache_miss_tokens"],
+                          usage["prompt_cache_hit_tokens"], to_store)
+            time.sleep(len(tokens) * self.server.config["per_token_latency"])
+            self._send_json({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens).strip()},
+                    "finish_reason": "stop",
+                }],
+                "usage": full_usage,
+            })
+            return
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+
+        self._start_stream()
+        self._prefill(usage["prompt_cache_miss_tokens"],
+                      usage["prompt_cache_hit_tokens"], to_store)
+        self._send_sse(None, chunk({"role": "assistant", "content": ""}))
+        for i, token in enumerate(tokens):
+            if i > 0:
+                time.sleep(self.server.config["per_token_latency"])
+            self._send_sse(None, chunk({"content": token}))
+        self._send_sse(None, chunk({}, finish_reason="stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._send_sse(None, {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [],
+                "usage": full_usage,
+            })
+        self._send_sse(None, "[DONE]")
+        self._end_stream()
+
+    # ---- Mem0 hosted memory ---------------------------------------------
+
+    def _handle_mem0_add(self, body: Dict[str, Any]):
+        user_id = body.get("user_id") or "default"
+        added: List[Dict[str, Any]] = []
+        indexed_at = time.monotonic() + self.server.config["memory_indexing_delay"]
+        with self.server.memory_lock:
+            memories = self.server.memories.setdefault(user_id, [])
+            for message in body.get("messages", []):
+                memory = {"id": str(uuid.uuid4()),
+                          "memory": _block_text(message.get("content", ""))}
+                memories.append((indexed_at, memory))
+                added.append({**memory, "event": "ADD"})
+        self._send_json({"results": added})
+
+    def _indexed_memories(self, user_id: str) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self.server.memory_lock:
+            return [memory for indexed_at, memory in self.server.memories.get(user_id, [])
+                    if indexed_at <= now]
+
+    def _handle_mem0_list(self, body: Dict[str, Any], query: str):
+        filters = body.get("filters") or {}
+        params = dict(pair.partition("=")[::2] for pair in query.split("&") if pair)
+        page = int(params.get("page") or 1)
+        page_size = int(params.get("page_size") or 100)
+        memories = self._indexed_memories(filters.get("user_id") or "default")
+        start = (page - 1) * page_size
+        self._send_json({"count": len(memories), "next": None, "previous": None,
+                         "results": memories[start:start + page_size]})
+
+    def _handle_mem0_search(self, body: Dict[str, Any]):
+        filters = body.get("filters") or {}
+        user_id = filters.get("user_id") or body.get("user_id") or "default"
+        top_k = int(body.get("top_k") or 10)
+        query_words = set(str(body.get("query", "")).lower().split())
+        memories = self._indexed_memories(user_id)
+        scored = []
+        for memory in memories:
+            words = set(memory["memory"].lower().split())
+            overlap = len(query_words & words)
+            if overlap:
+                scored.append(
+                    {**memory, "score": overlap / max(1, len(query_words))})
+        scored.sort(key=lambda m: m["score"], reverse=True)
+        self._send_json({"results": scored[:top_k]})
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: Dict[str, Any]):
+        super().__init__(address, MockLLMHandler)
+        self.config = config
+        self.prefix_cache = PrefixCache(config["cache_ttl_scale"])
+        # user_id -> [(indexed_at, memory)]
+        self.memories: Dict[str, List[Tuple[float, Dict[str, Any]]]] = {}
+        self.memory_lock = threading.Lock()
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.batch_lock = threading.Lock()
+        self.rate_limiter = RateLimiter(config["requests_per_minute"],
+                                        config["input_tokens_per_minute"],
+                                        config["max_concurrent"])
+
+    def process_batch(self, batch_id: str, requests: List[Dict[str, Any]], results_url: str):
+        """Work through a batch in the background, spreading batch_processing_time over it."""
+        per_request = self.config["batch_processing_time"] / max(1, len(requests))
+        for request in requests:
+            time.sleep(per_request)
+            params = request.get("params", {})
+            usage, to_store = anthropic_prefix_usage(params, self.prefix_cache)
+            for key, ttl in to_store:
+                self.prefix_cache.store(key, ttl)
+            result = {"custom_id": request.get("custom_id"),
+                      "result": {"type": "succeeded",
+                                 "message": mock_message(params, usage, self.config)}}
+            with self.batch_lock:
+                entry = self.batches[batch_id]
+                entry["results"].append(result)
+                counts = entry["batch"]["request_counts"]
+                counts["processing"] -= 1
+                counts["succeeded"] += 1
+        with self.batch_lock:
+            batch = self.batches[batch_id]["batch"]
+            batch["processing_status"] = "ended"
+            batch["ended_at"] = _rfc3339()
+            batch["results_url"] = results_url
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_mock_server(host: str = "127.0.0.1", port: int = 0, **overrides: Any) -> MockLLMServer:
+    """
+    Start the mock server on a background thread and return it.
+    port=0 picks a free port; read it back from `server.base_url`.
+    Call `server.shutdown()` when done.
+    """
+    server = MockLLMServer((host, port), {**DEFAULT_CONFIG, **overrides})
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Offline mock of the Anthropic, OpenAI-compatible and Mem0 APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--ttft", type=float, default=DEFAULT_CONFIG["ttft"],
+                        help="fixed time to first token in seconds")
+    parser.add_argument("--per-token-latency", type=float, default=DEFAULT_CONFIG["per_token_latency"],
+                        help="delay between output tokens in seconds")
+    parser.add_argument("--prefill-per-1k-tokens", type=float, default=DEFAULT_CONFIG["prefill_per_1k_tokens"],
+                        help="extra TTFT in seconds per 1k uncached input tokens")
+    parser.add_argument("--cache-read-discount", type=float, default=DEFAULT_CONFIG["cache_read_discount"],
+                        help="fraction of prefill time still paid for cached tokens")
+    parser.add_argument("--cache-ttl-scale", type=float, default=DEFAULT_CONFIG["cache_ttl_scale"],
+                        help="multiply cache TTLs (e.g. 0.01: 5m -> 3s, 1h -> 36s)")
+    parser.add_argument("--output-tokens", type=int, default=DEFAULT_CONFIG["output_tokens"],
+                        help="tokens generated per response (capped by max_tokens)")
+    parser.add_argument("--requests-per-minute", type=int, default=DEFAULT_CONFIG["requests_per_minute"],
+                        help="Messages API request budget; 429 when exhausted (0 = unlimited)")
+    parser.add_argument("--input-tokens-per-minute", type=int, default=DEFAULT_CONFIG["input_tokens_per_minute"],
+                        help="uncached input token budget; 429 when exhausted (0 = unlimited)")
+    parser.add_argument("--max-concurrent", type=int, default=DEFAULT_CONFIG["max_concurrent"],
+                        help="concurrent Messages API requests before 529 overloaded (0 = unlimited)")
+    parser.add_argument("--batch-processing-time", type=float, default=DEFAULT_CONFIG["batch_processing_time"],
+                        help="seconds a Message Batch takes to end, whatever its size")
+    parser.add_argument("--memory-indexing-delay", type=float, default=DEFAULT_CONFIG["memory_indexing_delay"],
+                        help="seconds before added memories become searchable")
+    parser.add_argument("--verbose", action="store_true",
+                        help="log every request")
+    args = parser.parse_args()
+
+    config = {**DEFAULT_CONFIG, **{k: v for k, v in vars(args).items() if k in DEFAULT_CONFIG}}
+    server = MockLLMServer((args.host, args.port), config)
+    print(f"Mock LLM server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,161 @@
+"""
+Run the demo workloads against several providers and compare them side by side.
+
+Workloads (each a shared system prompt plus one user message per request):
+    prefix   the TTFT demo: Shakespeare context, short analysis questions
+    needle   the throughput demo: Shakespeare context, 5000-character needle prompts
+    memory   the context-management demo: developer history, one query per request
+
+Requests are sent one at a time per provider and workload, so later requests
+can hit the prefix cache the earlier ones filled. The table reports TTFT,
+decode throughput (output tokens per second after the first token), the share
+of prompt tokens read from cache, and cost per provider and workload.
+
+Usage:
+    python provider_benchmark.py --providers anthropic:claude-sonnet-4-20250514,deepseek:deepseek-chat
+    python provider_benchmark.py --providers openai:gpt-4o-mini --workloads memory --num-requests 20
+"""
+import argparse
+from typing import Callable, Dict, List, Any, Tuple
+
+from bench_stats import latency_percentiles
+from clients import load_large_context
+from metrics_export import add_export_arguments, export_from_args
+from providers import Provider, get_provider
+from response_cache import enable_response_cache
+from tracing import add_tracing_arguments, enable_tracing_from_args
+
+DEFAULT_PROVIDERS = "anthropic:claude-sonnet-4-20250514,deepseek:deepseek-chat"
+
+Workload = Tuple[str, List[str]]
+
+
+def prefix_workload() -> Workload:
+    from ttft_prefix_caching_1 import user_prompts
+
+    return f"You are a helpful AI assistant.\n\n{load_large_context()}", user_prompts
+
+
+def needle_workload() -> Workload:
+    from throughput_parallel_vs_sequential import get_system_message, user_prompts
+
+    return get_system_message(), user_prompts
+
+
+def memory_workload() -> Workload:
+    from context_management_with_mem0 import (concat_history_as_text, generate_developer_conversation,
+                                              repeated_prefix_queries)
+
+    # The history leads the prompt, so repeated queries share it as a cacheable prefix
+    system = ("You are a helpful assistant.\n\nConversation History:\n"
+              f"{concat_history_as_text(generate_developer_conversation())}")
+    return system, repeated_prefix_queries(10)
+
+
+WORKLOADS: Dict[str, Callable[[], Workload]] = {
+    "prefix": prefix_workload,
+    "needle": needle_workload,
+    "memory": memory_workload,
+}
+
+
+def run_workload(provider: Provider, workload: str, num_requests: int, max_tokens: int) -> Dict[str, Any]:
+    system, prompts = WORKLOADS[workload]()
+    requests: List[Dict[str, Any]] = []
+    num_errors = 0
+    for i in range(num_requests):
+        prompt = prompts[i % len(prompts)]
+        try:
+            result = provider.stream(system, [{"role": "user", "content": prompt}], max_tokens=max_tokens)
+        except Exception as e:
+            num_errors += 1
+            print(f"  {provider.name} {workload} request {i + 1} failed: {type(e).__name__}: {e}")
+            continue
+        result.pop("text", None)
+        requests.append(result)
+
+    input_tokens = sum(r["input_tokens"] for r in requests)
+    output_tokens = sum(r["output_tokens"] for r in requests)
+    cache_read = sum(r["cache_read_tokens"] for r in requests)
+    decode_time = sum(r["latency"] - (r["ttft"] or 0.0) for r in requests)
+    costs = [r["estimated_cost"] for r in requests]
+    metrics = {
+        "provider": provider.name,
+        "workload": workload,
+        "num_requests": len(requests),
+        "num_errors": num_errors,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cache_read_tokens": cache_read,
+        "cache_creation_tokens": sum(r["cache_creation_tokens"] for r in requests),
+        "cache_hit_rate": cache_read / input_tokens if input_tokens else 0.0,
+        "ttft_percentiles": latency_percentiles([r["ttft"] for r in requests]),
+        "latency_percentiles": latency_percentiles([r["latency"] for r in requests]),
+        "decode_throughput": output_tokens / decode_time if decode_time > 0 else 0.0,
+        "estimated_cost": sum(costs) if costs and None not in costs else None,
+        "requests": requests,
+    }
+    ttft_str = f"{metrics['ttft_percentiles']['p50']:.3f}s" if metrics["ttft_percentiles"] else "N/A"
+    print(f"  {provider.name} / {workload}: {len(requests)} requests, TTFT p50 {ttft_str}")
+    return metrics
+
+
+def print_provider_table(rows: List[Dict[str, Any]]):
+    print("\n" + "="*100)
+    print("PROVIDERS SIDE BY SIDE")
+    print("="*100)
+    print(f"{'Provider':<38} {'Workload':<9} {'TTFT p50':<10} {'TTFT p90':<10} {'Latency p50':<12} "
+          f"{'Decode tok/s':<13} {'Cache Hit':<10} {'Cost (USD)'}")
+    print("-"*100)
+    for r in rows:
+        ttft, latency = r["ttft_percentiles"], r["latency_percentiles"]
+        cells = [f"{ttft['p50']:.3f}s" if ttft else "N/A",
+                 f"{ttft['p90']:.3f}s" if ttft else "N/A",
+                 f"{latency['p50']:.3f}s" if latency else "N/A"]
+        cost = f"${r['estimated_cost']:.4f}" if r["estimated_cost"] is not None else "N/A"
+        print(f"{r['provider']:<38} {r['workload']:<9} {cells[0]:<10} {cells[1]:<10} {cells[2]:<12} "
+              f"{r['decode_throughput']:<13.1f} {r['cache_hit_rate']:<10.1%} {cost}")
+    print("="*100)
+    failed = [f"{r['provider']}/{r['workload']} ({r['num_errors']})" for r in rows if r["num_errors"]]
+    if failed:
+        print(f"Failed requests: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the same workloads against several LLM providers and compare them")
+    parser.add_argument("--providers", default=DEFAULT_PROVIDERS,
+                        help=f"comma-separated kind:model specs (default: {DEFAULT_PROVIDERS}); "
+                             "kinds: anthropic, deepseek, openai")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS),
+                        help=f"comma-separated workloads (default: all of {', '.join(WORKLOADS)})")
+    parser.add_argument("--num-requests", type=int, default=10,
+                        help="requests per provider and workload, cycling the prompts (default: 10)")
+    parser.add_argument("--max-tokens", type=int, default=512,
+                        help="max_tokens per request (default: 512)")
+    parser.add_argument("--response-cache", action="store_true",
+                        help="serve repeated requests from the local on-disk response cache")
+    add_export_arguments(parser)
+    add_tracing_arguments(parser)
+    args = parser.parse_args()
+    enable_tracing_from_args(args, "provider_benchmark")
+
+    if args.response_cache:
+        enable_response_cache()
+
+    try:
+        providers = [get_provider(spec.strip()) for spec in args.providers.split(",")]
+    except ValueError as e:
+        parser.error(str(e))
+    workloads = [w.strip() for w in args.workloads.split(",")]
+    unknown = [w for w in workloads if w not in WORKLOADS]
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(unknown)}")
+
+    rows = []
+    for provider in providers:
+        provider.warm_up()
+        for workload in workloads:
+            rows.append(run_workload(provider, workload, args.num_requests, args.max_tokens))
+    print_provider_table(rows)
+    export_from_args(args, "provider_benchmark", {f"{r['provider']}/{r['workload']}": r for r in rows})
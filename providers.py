@@ -0,0 +1,195 @@
+"""
+One streaming interface over the LLM backends the demos use.
+
+A provider is given as "kind:model" (e.g. "anthropic:claude-sonnet-4-20250514",
+"deepseek:deepseek-chat", "openai:gpt-4o-mini"). Every provider streams a
+request built from a system prompt and chat messages and returns the same
+result keys, so workloads can be run unchanged against any of them:
+
+    input_tokens            all prompt tokens, cached or not
+    output_tokens
+    cache_read_tokens       prompt tokens served from the provider's prefix cache
+    cache_creation_tokens   prompt tokens written to the cache (Anthropic only)
+    ttft, tbt, latency      seconds; tbt is the mean gap between streamed chunks
+    estimated_cost          USD, or None for a model without a price entry
+
+Anthropic caches only what is marked, so cache=True marks the system prompt.
+DeepSeek and OpenAI cache prompt prefixes automatically and ignore the flag.
+"""
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Any, Optional, Tuple, cast
+
+from clients import get_anthropic_client, get_deepseek_client, get_openai_client, warm_up_connection
+from response_cache import cached_call
+from tracing import add_event, llm_attributes, record_result, request_span
+
+# USD per 1M tokens: (input, output, cache read, cache write)
+MODEL_PRICES: Dict[str, Tuple[float, float, float, float]] = {
+    "claude-sonnet-4-20250514": (3.00, 15.00, 0.30, 3.75),
+    "claude-3-5-haiku-20241022": (0.80, 4.00, 0.08, 1.00),
+    "deepseek-chat": (0.28, 0.42, 0.028, 0.28),
+    "gpt-4o-mini": (0.15, 0.60, 0.075, 0.15),
+    "gpt-4o": (2.50, 10.00, 1.25, 2.50),
+}
+
+
+class Provider(ABC):
+    kind = ""
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @property
+    def name(self) -> str:
+        return f"{self.kind}:{self.model}"
+
+    @abstractmethod
+    def client(self) -> Any:
+        """The SDK client requests are sent with."""
+
+    def base_url(self) -> str:
+        return str(self.client().base_url)
+
+    def warm_up(self) -> float:
+        """Open a pooled connection, so it is not billed to the first request's TTFT."""
+        return warm_up_connection(self.client())
+
+    @abstractmethod
+    def _stream(self, system: str, messages: List[Dict[str, Any]], max_tokens: int,
+                cache: bool) -> Dict[str, Any]:
+        """Send one streaming request; return usage, token times and text."""
+
+    def estimate_cost(self, result: Dict[str, Any]) -> Optional[float]:
+        prices = MODEL_PRICES.get(self.model)
+        if prices is None:
+            return None
+        price_input, price_output, price_cache_read, price_cache_write = prices
+        uncached = result["input_tokens"] - result["cache_read_tokens"] - result["cache_creation_tokens"]
+        return (uncached * price_input + result["output_tokens"] * price_output +
+                result["cache_read_tokens"] * price_cache_read +
+                result["cache_creation_tokens"] * price_cache_write) / 1_000_000
+
+    def stream(self, system: str, messages: List[Dict[str, Any]], max_tokens: int = 1024,
+               cache: bool = True) -> Dict[str, Any]:
+        def send() -> Dict[str, Any]:
+            request_start = time.perf_counter()
+            sent = self._stream(system, messages, max_tokens, cache)
+            token_times = sent.pop("token_times")
+            gaps = [b - a for a, b in zip(token_times, token_times[1:])]
+            return {
+                **sent,
+                "ttft": (token_times[0] - request_start) if token_times else None,
+                "tbt": (sum(gaps) / len(gaps)) if gaps else None,
+                "latency": time.perf_counter() - request_start,
+            }
+
+        with request_span(f"{self.kind}.stream", llm_attributes(self.kind, self.model, streaming=True)) as span:
+            result = cached_call({
+                "endpoint": self.base_url(),
+                "model": self.model,
+                "system": system,
+                "messages": messages,
+                "max_tokens": max_tokens,
+                "temperature": None,
+                "cache": cache,
+            }, send)
+            record_result(span, result)
+        result["estimated_cost"] = self.estimate_cost(result)
+        return result
+
+
+class AnthropicProvider(Provider):
+    kind = "anthropic"
+
+    def client(self) -> Any:
+        return get_anthropic_client()
+
+    def _stream(self, system: str, messages: List[Dict[str, Any]], max_tokens: int,
+                cache: bool) -> Dict[str, Any]:
+        block: Dict[str, Any] = {"type": "text", "text": system}
+        if cache:
+            block["cache_control"] = {"type": "ephemeral"}
+        token_times: List[float] = []
+        text_parts: List[str] = []
+        usage = {"input_tokens": 0, "output_tokens": 0, "cache_read_tokens": 0, "cache_creation_tokens": 0}
+        with self.client().messages.stream(
+            model=self.model,
+            max_tokens=max_tokens,
+            system=cast(Any, [block]),  # type: ignore
+            messages=cast(Any, messages)
+        ) as stream:
+            for event in stream:
+                if event.type == "message_start":
+                    start_usage = event.message.usage
+                    usage["cache_read_tokens"] = start_usage.cache_read_input_tokens or 0
+                    usage["cache_creation_tokens"] = start_usage.cache_creation_input_tokens or 0
+                    # Anthropic's input_tokens excludes cached and cache-written tokens
+                    usage["input_tokens"] = (start_usage.input_tokens + usage["cache_read_tokens"] +
+                                             usage["cache_creation_tokens"])
+                elif event.type == "content_block_delta":
+                    if not token_times:
+                        add_event("first_token")
+                    token_times.append(time.perf_counter())
+                    text_parts.append(getattr(event.delta, "text", ""))
+                elif event.type == "message_delta":
+                    usage["output_tokens"] = event.usage.output_tokens
+        return {**usage, "token_times": token_times, "text": "".join(text_parts)}
+
+
+class OpenAICompatibleProvider(Provider):
+    def __init__(self, kind: str, model: str, get_client: Callable[[], Any]):
+        super().__init__(model)
+        self.kind = kind
+        self.get_client = get_client
+
+    def client(self) -> Any:
+        return self.get_client()
+
+    def _stream(self, system: str, messages: List[Dict[str, Any]], max_tokens: int,
+                cache: bool) -> Dict[str, Any]:
+        token_times: List[float] = []
+        text_parts: List[str] = []
+        usage = None
+        for chunk in self.client().chat.completions.create(
+            model=self.model,
+            messages=cast(Any, [{"role": "system", "content": system}] + messages),  # type: ignore
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+        ):
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not token_times:
+                    add_event("first_token")
+                token_times.append(time.perf_counter())
+                text_parts.append(chunk.choices[0].delta.content)
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+
+        input_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        # DeepSeek reports prompt_cache_hit_tokens; OpenAI prompt_tokens_details.cached_tokens
+        cache_read = getattr(usage, "prompt_cache_hit_tokens", None)
+        if cache_read is None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            cache_read = getattr(details, "cached_tokens", 0)
+        return {"input_tokens": input_tokens,
+                "output_tokens": getattr(usage, "completion_tokens", 0) or 0,
+                "cache_read_tokens": cache_read or 0,
+                "cache_creation_tokens": 0,
+                "token_times": token_times, "text": "".join(text_parts)}
+
+
+PROVIDER_KINDS: Dict[str, Callable[[str], Provider]] = {
+    "anthropic": AnthropicProvider,
+    "deepseek": lambda model: OpenAICompatibleProvider("deepseek", model, get_deepseek_client),
+    "openai": lambda model: OpenAICompatibleProvider("openai", model, get_openai_client),
+}
+
+
+def get_provider(spec: str) -> Provider:
+    """Build a provider from "kind:model"."""
+    kind, _, model = spec.partition(":")
+    if kind not in PROVIDER_KINDS or not model:
+        raise ValueError(f"Unknown provider {spec!r}; expected one of "
+                         f"{', '.join(k + ':<model>' for k in PROVIDER_KINDS)}")
+    return PROVIDER_KINDS[kind](model)
@@ -0,0 +1,164 @@
+"""
+Optional on-disk, content-addressed cache of LLM responses.
+
+Entries are keyed by a SHA-256 of the canonical JSON of the request (endpoint,
+model, system blocks, messages, max_tokens, temperature) and stored one JSON
+file per key. Entries older than the TTL are treated as misses; once the cache
+holds more than max_entries files, the least recently used ones are evicted
+(a hit refreshes the file's mtime).
+
+The cache is off unless a script enables it, so benchmarks are never served
+from disk by accident. With bypass=True nothing is read from the cache but
+fresh responses are still written, which refreshes a replay set.
+
+Environment:
+    RESPONSE_CACHE_DIR          default .response_cache next to this file
+    RESPONSE_CACHE_TTL          seconds, default 86400
+    RESPONSE_CACHE_MAX_ENTRIES  default 1000
+"""
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Any, Iterator, Optional
+
+DEFAULT_DIRECTORY = os.environ.get("RESPONSE_CACHE_DIR", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".response_cache"))
+DEFAULT_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "86400"))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+
+# Timing fields of a cached result are replaced by the lookup time on a hit
+TIMING_FIELDS = ("latency", "ttft", "ttlt")
+
+
+class ResponseCache:
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, bypass: bool = False):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(request: Dict[str, Any]) -> str:
+        canonical = json.dumps(request, sort_keys=True,
+                               separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.bypass:
+            self._count(hit=False)
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count(hit=False)
+            return None
+        if time.time() - entry["created"] > self.ttl:
+            self._remove(path)
+            self._count(hit=False)
+            return None
+        try:
+            os.utime(path)  # LRU: a hit makes the entry most recently used
+        except OSError:
+            pass  # evicted by another thread since it was read; the value is still good
+        self._count(hit=True)
+        return entry["value"]
+
+    def put(self, key: str, value: Dict[str, Any]):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "value": value}, f)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                       if name.endswith(".json")]
+            if len(entries) <= self.max_entries:
+                return
+            entries.sort(key=lambda p: os.path.getmtime(p)
+                         if os.path.exists(p) else 0.0)
+            for path in entries[:len(entries) - self.max_entries]:
+                self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def enable_response_cache(bypass: bool = False, **kwargs: Any) -> ResponseCache:
+    """Turn the cache on for this process; kwargs override the ResponseCache defaults."""
+    global _response_cache
+    _response_cache = ResponseCache(bypass=bypass, **kwargs)
+    return _response_cache
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    return _response_cache
+
+
+@contextlib.contextmanager
+def response_cache_disabled() -> Iterator[None]:
+    """Send every request to the provider inside the block, whatever the script enabled."""
+    global _response_cache
+    cache, _response_cache = _response_cache, None
+    try:
+        yield
+    finally:
+        _response_cache = cache
+
+
+def cached_call(request: Dict[str, Any], send: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Return send()'s result dict, served from the cache when enabled and present.
+    The result gains "cached": True/False; on a hit its timings are the lookup time.
+    """
+    cache = _response_cache
+    if cache is None:
+        return {**send(), "cached": False}
+
+    lookup_start = time.perf_counter()
+    key = cache.key(request)
+    value = cache.get(key)
+    if value is not None:
+        elapsed = time.perf_counter() - lookup_start
+        replay = {**value, "cached": True}
+        for field in TIMING_FIELDS:
+            if replay.get(field) is not None:
+                replay[field] = elapsed
+        if "tbt" in replay:
+            replay["tbt"] = None
+        if "inter_token_latencies" in replay:
+            replay["inter_token_latencies"] = []
+        return replay
+
+    result = send()
+    cache.put(key, result)
+    return {**result, "cached": False}
@@ -0,0 +1,56 @@
+"""
+Incremental rolling summarization of conversation history.
+
+Older turns are compacted into one summary; the most recent keep_recent turns
+stay verbatim. When new messages arrive, only the turns that have since aged out
+of the recent window are summarized, folded into the existing summary with one
+LLM call, so the cost of an update depends on the new tail and not on the length
+of the whole history. The summary only changes on those updates, so placed at
+the start of the prompt it is a stable, cacheable prefix between them.
+"""
+from typing import Callable, Dict, List, Any, Tuple
+
+# run_chat-style callable: messages -> (usage, elapsed seconds, response text)
+ChatFunction = Callable[[List[Dict[str, str]]], Tuple[Dict[str, Any], float, str]]
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation. Merge the new messages into "
+    "the existing summary. Keep every stated preference, decision and constraint; "
+    "drop small talk and repetition. Answer with the updated summary only, at most "
+    "{max_words} words.")
+
+
+class RollingSummarizer:
+    def __init__(self, chat: ChatFunction, keep_recent: int = 10, max_words: int = 200):
+        self.chat = chat
+        self.keep_recent = keep_recent
+        self.max_words = max_words
+        self.summary = ""
+        # Number of leading history messages already folded into the summary
+        self.summarized_count = 0
+        self.updates: List[Dict[str, Any]] = []
+
+    def update(self, history: List[Dict[str, str]]) -> bool:
+        """
+        Fold messages that have left the recent window into the summary.
+        Returns False when there was nothing new to summarize.
+        """
+        cutoff = max(0, len(history) - self.keep_recent)
+        new_messages = history[self.summarized_count:cutoff]
+        if not new_messages:
+            return False
+
+        new_text = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in new_messages)
+        usage, elapsed, text = self.chat([
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS.format(max_words=self.max_words)},
+            {"role": "user", "content": f"Existing summary:\n{self.summary or '(none)'}\n\n"
+                                        f"New messages:\n{new_text}"},
+        ])
+        self.summary = text.strip()
+        self.summarized_count = cutoff
+        self.updates.append({"num_messages": len(new_messages), "latency": elapsed, **usage})
+        return True
+
+    def context(self, history: List[Dict[str, str]]) -> Tuple[str, List[Dict[str, str]]]:
+        """The current summary and the turns after it, to send verbatim."""
+        return self.summary, history[self.summarized_count:]
@@ -1,19 +1,34 @@
 import anthropic
-import os
+import argparse
+import asyncio
+import random
+import threading
 import time
-from typing import Dict, List, Any
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple, cast
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-api_key = os.environ.get("ANTHROPIC_API_KEY")
-if not api_key:
-    raise ValueError(
-        "ANTHROPIC_API_KEY environment variable not set. "
-        "Please export it: export ANTHROPIC_API_KEY='your-key-here'"
-    )
-client = anthropic.Anthropic(api_key=api_key)
+from adaptive_concurrency import AdaptiveConcurrencyController
+from bench_stats import latency_percentiles, percentile
+from clients import (get_anthropic_client, load_large_context, make_async_anthropic_client,
+                     warm_up_async_connection, warm_up_connection)
+from metrics_export import add_export_arguments, export_from_args
+from tracing import (add_event, add_tracing_arguments, enable_tracing_from_args, llm_attributes,
+                     record_result, request_span)
+from response_cache import cached_call, enable_response_cache, get_response_cache
+from trials import add_trial_arguments, run_trials_from_args
+from token_accounting import get_token_counter, preflight, print_preflight
 
-with open("large_shakespearean_text_dump", "r", encoding="utf-8") as f:
-    large_context = f.read()
+# Pricing for claude-sonnet-4 (USD per 1M tokens)
+PRICE_INPUT = 3.00
+PRICE_OUTPUT = 15.00
+# Message Batches are billed at half the standard price
+BATCH_DISCOUNT = 0.5
+
+
+def estimate_cost(input_tokens: int, output_tokens: int, batch: bool = False) -> float:
+    cost = (input_tokens * PRICE_INPUT + output_tokens * PRICE_OUTPUT) / 1_000_000
+    return cost * BATCH_DISCOUNT if batch else cost
 
 
 def generate_needle_prompt(needle: str, index: int) -> str:
@@ -51,61 +66,136 @@ needles = [
 user_prompts = [generate_needle_prompt(
     needle, i) for i, needle in enumerate(needles)]
 
-system_message = f"""You are a helpful AI assistant. Analyze the following Shakespearean text carefully.
+@lru_cache(maxsize=None)
+def get_system_message() -> str:
+    return f"""You are a helpful AI assistant. Analyze the following Shakespearean text carefully.
+
+{load_large_context()}"""
+
+
+def get_cached_system_message() -> List[Dict[str, Any]]:
+    """Same system prompt as a single block marked for prefix caching."""
+    return [
+        {
+            "type": "text",
+            "text": get_system_message(),
+            "cache_control": {"type": "ephemeral"}
+        }
+    ]
+
+
+def preflight_needles(num_requests: Optional[int] = None, batch: bool = False) -> Dict[str, Any]:
+    """Count input tokens and price the needle workload without sending it."""
+    prompts = needle_prompts(num_requests)
+    return preflight(get_token_counter("claude-sonnet-4-20250514"),
+                     [(get_system_message(), [{"role": "user", "content": prompt}]) for prompt in prompts],
+                     max_tokens=1024, cost=lambda i, o: estimate_cost(i, o, batch=batch))
+
+
+def response_cache_request(client: anthropic.Anthropic, request: Dict[str, Any]) -> Dict[str, Any]:
+    """Everything that determines a response, hashed as the response cache key."""
+    return {"endpoint": str(client.base_url), "temperature": None, **request}
+
 
-{large_context}"""
+def usage_result(response: Any) -> Dict[str, Any]:
+    """The parts of a Messages API response the approaches report (and the cache stores)."""
+    return {
+        "input_tokens": response.usage.input_tokens,
+        "output_tokens": response.usage.output_tokens,
+        "total_tokens": response.usage.input_tokens + response.usage.output_tokens,
+        "text": "".join(getattr(block, "text", "") for block in response.content)
+    }
 
 
-def approach_1_parallel() -> Dict[str, Any]:
+def approach_1_parallel(adaptive: bool = False, num_requests: Optional[int] = None,
+                        max_workers: int = 10) -> Dict[str, Any]:
     """
-    Approach 1: Send all 10 prompts in parallel using ThreadPoolExecutor.
+    Approach 1: Send the prompts (10 unless num_requests is given) in parallel
+    using ThreadPoolExecutor.
+    With adaptive=True, in-flight requests are governed by an AIMD controller
+    that backs off and retries on 429/529 instead of failing the whole run.
     """
     print("\n" + "="*70)
-    print("APPROACH 1: Parallel Requests")
+    print("APPROACH 1: Parallel Requests" +
+          (" (adaptive concurrency)" if adaptive else ""))
     print("="*70)
 
+    prompts = needle_prompts(num_requests)
+
     metrics: Dict[str, Any] = {
         "total_tokens_processed": 0,
         "execution_time": 0.0,
         "avg_token_throughput": 0.0,
-        "num_requests": len(user_prompts)
+        "num_requests": len(prompts),
+        "concurrency": max_workers,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "response_cache_hits": 0,
+        "response_cache_misses": 0,
+        "requests": []
     }
 
+    client = get_anthropic_client()
+    controller = AdaptiveConcurrencyController(
+        max_window=max_workers) if adaptive else None
+    # The controller does its own retries, so the SDK must surface every 429/529
+    retry_free_client = client.with_options(max_retries=0)
+
     start_time = time.perf_counter()
 
     def send_request(prompt: str, index: int) -> Dict[str, Any]:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1024,
-            system=system_message,
-            messages=[
+        request_start = time.perf_counter()
+        request: Dict[str, Any] = {
+            "model": "claude-sonnet-4-20250514",
+            "max_tokens": 1024,
+            "system": get_system_message(),
+            "messages": [
                 {
                     "role": "user",
                     "content": prompt
                 }
             ]
-        )
-        return {
-            "index": index,
-            "input_tokens": response.usage.input_tokens,
-            "output_tokens": response.usage.output_tokens,
-            "total_tokens": response.usage.input_tokens + response.usage.output_tokens
         }
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
+        def create() -> Dict[str, Any]:
+            if controller is None:
+                response = client.messages.create(**request)
+            else:
+                def send() -> Tuple[Any, Any, int]:
+                    raw = retry_free_client.messages.with_raw_response.create(
+                        **request)
+                    parsed = raw.parse()
+                    return parsed, raw.headers, parsed.usage.input_tokens
+                response = controller.call(send)
+            return usage_result(response)
+
+        with request_span("anthropic.messages.create", llm_attributes("anthropic", request["model"])) as span:
+            result = cached_call(response_cache_request(client, request), create)
+            record_result(span, result)
+        return {"index": index, **result, "latency": time.perf_counter() - request_start}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
         future_to_prompt = {
             executor.submit(send_request, prompt, i): (prompt, i)
-            for i, prompt in enumerate(user_prompts)
+            for i, prompt in enumerate(prompts)
         }
 
         completed = 0
         for future in as_completed(future_to_prompt):
             completed += 1
             result = future.result()
+            result.pop("text", None)
+            metrics["requests"].append(result)
             metrics["total_tokens_processed"] += result["total_tokens"]
-            print(f"  Request {result['index']+1}/10 completed: "
-                  f"{result['input_tokens']} input + {result['output_tokens']} output tokens")
-
+            metrics["input_tokens"] += result["input_tokens"]
+            metrics["output_tokens"] += result["output_tokens"]
+            metrics["response_cache_hits" if result["cached"]
+                    else "response_cache_misses"] += 1
+            window_str = f" (window {controller.window:.1f})" if controller else ""
+            print(f"  Request {result['index']+1}/{len(prompts)} completed: "
+                  f"{result['input_tokens']} input + {result['output_tokens']} output tokens{window_str}")
+
+    metrics["requests"].sort(key=lambda r: r["index"])
     metrics["execution_time"] = time.perf_counter() - start_time
     if metrics["execution_time"] > 0:
         metrics["avg_token_throughput"] = metrics["total_tokens_processed"] / \
@@ -113,12 +203,19 @@ def approach_1_parallel() -> Dict[str, Any]:
     else:
         metrics["avg_token_throughput"] = 0.0
 
+    metrics["estimated_cost"] = estimate_cost(
+        metrics["input_tokens"], metrics["output_tokens"])
+
+    if controller is not None:
+        metrics.update(controller.metrics())
+
     return metrics
 
 
-def approach_2_sequential() -> Dict[str, Any]:
+def approach_2_sequential(num_requests: Optional[int] = None) -> Dict[str, Any]:
     """
-    Approach 2: Send 10 prompts sequentially, one after another.
+    Approach 2: Send the prompts (10 unless num_requests is given) sequentially,
+    one after another.
     """
     print("\n" + "="*70)
     print("APPROACH 2: Sequential Requests")
@@ -128,36 +225,56 @@ def approach_2_sequential() -> Dict[str, Any]:
         "total_tokens_processed": 0,
         "execution_time": 0.0,
         "avg_token_throughput": 0.0,
-        "num_requests": len(user_prompts)
+        "num_requests": 0,
+        "concurrency": 1,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "response_cache_hits": 0,
+        "response_cache_misses": 0,
+        "requests": []
     }
 
+    client = get_anthropic_client()
     start_time = time.perf_counter()
 
-    for i, prompt in enumerate(user_prompts):
-        print(f"\nSending request {i+1}/10...")
+    prompts = needle_prompts(num_requests)
+    metrics["num_requests"] = len(prompts)
+    for i, prompt in enumerate(prompts):
+        print(f"\nSending request {i+1}/{len(prompts)}...")
         request_start = time.perf_counter()
 
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1024,
-            system=system_message,
-            messages=[
+        request: Dict[str, Any] = {
+            "model": "claude-sonnet-4-20250514",
+            "max_tokens": 1024,
+            "system": get_system_message(),
+            "messages": [
                 {
                     "role": "user",
                     "content": prompt
                 }
             ]
-        )
+        }
+        with request_span("anthropic.messages.create", llm_attributes("anthropic", request["model"])) as span:
+            result = cached_call(response_cache_request(client, request),
+                                 lambda: usage_result(client.messages.create(**request)))
+            record_result(span, result)
 
         request_end = time.perf_counter()
         request_time = request_end - request_start
 
-        input_tokens = response.usage.input_tokens
-        output_tokens = response.usage.output_tokens
+        input_tokens = result["input_tokens"]
+        output_tokens = result["output_tokens"]
         metrics["total_tokens_processed"] += input_tokens + output_tokens
+        metrics["input_tokens"] += input_tokens
+        metrics["output_tokens"] += output_tokens
+        metrics["response_cache_hits" if result["cached"]
+                else "response_cache_misses"] += 1
+        metrics["requests"].append({"index": i, "input_tokens": input_tokens, "output_tokens": output_tokens,
+                                    "cached": result["cached"], "latency": request_time})
 
         print(f"  Completed in {request_time:.2f}s: "
-              f"{input_tokens} input + {output_tokens} output tokens")
+              f"{input_tokens} input + {output_tokens} output tokens"
+              f"{' (response cache)' if result['cached'] else ''}")
 
     metrics["execution_time"] = time.perf_counter() - start_time
     if metrics["execution_time"] > 0:
@@ -166,9 +283,568 @@ def approach_2_sequential() -> Dict[str, Any]:
     else:
         metrics["avg_token_throughput"] = 0.0
 
+    metrics["estimated_cost"] = estimate_cost(
+        metrics["input_tokens"], metrics["output_tokens"])
+
     return metrics
 
 
+async def _run_async_workload(async_client: anthropic.AsyncAnthropic, prompts: List[str], concurrency: int,
+                              verbose: bool) -> Tuple[List[Dict[str, Any]], float]:
+    """
+    Send prompts through AsyncAnthropic with at most `concurrency` requests in
+    flight. Returns the results and the wall time of the workload alone.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send_request(prompt: str, index: int) -> Dict[str, Any]:
+        async with semaphore:
+            request_start = time.perf_counter()
+            with request_span("anthropic.messages.create",
+                              llm_attributes("anthropic", "claude-sonnet-4-20250514")) as span:
+                response = await async_client.messages.create(
+                    model="claude-sonnet-4-20250514",
+                    max_tokens=1024,
+                    system=get_system_message(),
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ]
+                )
+                latency = time.perf_counter() - request_start
+                result = {
+                    "index": index,
+                    "input_tokens": response.usage.input_tokens,
+                    "output_tokens": response.usage.output_tokens,
+                    "total_tokens": response.usage.input_tokens + response.usage.output_tokens,
+                    "latency": latency
+                }
+                record_result(span, result)
+        if verbose:
+            print(f"  Request {index+1}/{len(prompts)} completed in {latency:.2f}s: "
+                  f"{result['input_tokens']} input + {result['output_tokens']} output tokens")
+        return result
+
+    start_time = time.perf_counter()
+    results = await asyncio.gather(*(send_request(prompt, i) for i, prompt in enumerate(prompts)))
+    return results, time.perf_counter() - start_time
+
+
+def needle_prompts(num_requests: Optional[int] = None) -> List[str]:
+    """num_requests needle prompts (default: one of each), cycling if there are more."""
+    num_requests = num_requests or len(user_prompts)
+    return [user_prompts[i % len(user_prompts)] for i in range(num_requests)]
+
+
+def async_metrics(concurrency: int, results: List[Dict[str, Any]], execution_time: float) -> Dict[str, Any]:
+    """Throughput and latency percentiles of one async workload."""
+    metrics: Dict[str, Any] = {
+        "total_tokens_processed": sum(result["total_tokens"] for result in results),
+        "execution_time": execution_time,
+        "avg_token_throughput": 0.0,
+        "num_requests": len(results),
+        "concurrency": concurrency,
+        "requests_per_second": 0.0,
+        "latencies": [result["latency"] for result in results],
+        "requests": results
+    }
+
+    if execution_time > 0:
+        metrics["avg_token_throughput"] = metrics["total_tokens_processed"] / execution_time
+        metrics["requests_per_second"] = metrics["num_requests"] / execution_time
+
+    metrics["latency_p50"] = percentile(metrics["latencies"], 50)
+    metrics["latency_p90"] = percentile(metrics["latencies"], 90)
+    metrics["latency_p99"] = percentile(metrics["latencies"], 99)
+
+    return metrics
+
+
+def approach_3_async(concurrency: int = 10, num_requests: Optional[int] = None,
+                     verbose: bool = True) -> Dict[str, Any]:
+    """
+    Approach 3: Send prompts with AsyncAnthropic, bounded by an asyncio.Semaphore.
+    Unlike the thread pool, in-flight requests are not tied to OS threads, so
+    concurrency can go well past the number of workers a pool would allow.
+    If num_requests exceeds the number of needle prompts, the prompts are cycled.
+    """
+    prompts = needle_prompts(num_requests)
+
+    if verbose:
+        print("\n" + "="*70)
+        print(f"APPROACH 3: Async Requests (concurrency={concurrency})")
+        print("="*70)
+
+    async def run() -> Tuple[List[Dict[str, Any]], float]:
+        async with make_async_anthropic_client(concurrency) as async_client:
+            # Connect before timing starts, so TCP/TLS setup is not billed to the first requests
+            await warm_up_async_connection(async_client)
+            return await _run_async_workload(async_client, prompts, concurrency, verbose)
+
+    results, execution_time = asyncio.run(run())
+    return async_metrics(concurrency, results, execution_time)
+
+
+def concurrency_levels(max_concurrency: int) -> List[int]:
+    """Return 1, 2, 4, ... up to and including max_concurrency."""
+    levels: List[int] = []
+    level = 1
+    while level < max_concurrency:
+        levels.append(level)
+        level *= 2
+    levels.append(max_concurrency)
+    return levels
+
+
+def sweep_concurrency(max_concurrency: int, num_requests: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Run the same needle workload through approach 3 at concurrency 1, 2, 4, ... N
+    and collect the metrics of every level. Every level sends the same number of
+    requests, so levels differ only in concurrency. One warmed-up client is
+    shared by every level, so connections opened at one level are reused at the next.
+    """
+    prompts = needle_prompts(num_requests or max(len(user_prompts), max_concurrency))
+    print("\n" + "="*70)
+    print(f"CONCURRENCY SWEEP: 1 .. {max_concurrency}")
+    print("="*70)
+
+    async def run() -> List[Dict[str, Any]]:
+        sweep_results: List[Dict[str, Any]] = []
+        async with make_async_anthropic_client(max_concurrency) as async_client:
+            await warm_up_async_connection(async_client)
+            for level in concurrency_levels(max_concurrency):
+                print(f"\nRunning at concurrency {level}...")
+                metrics = async_metrics(level, *await _run_async_workload(async_client, prompts, level, False))
+                print(f"  {metrics['num_requests']} requests in {metrics['execution_time']:.2f}s, "
+                      f"{metrics['avg_token_throughput']:.2f} tokens/s, "
+                      f"p50 latency {metrics['latency_p50']:.2f}s")
+                sweep_results.append(metrics)
+        return sweep_results
+
+    return asyncio.run(run())
+
+
+def print_sweep(sweep_results: List[Dict[str, Any]]):
+    """
+    Print throughput and latency at every concurrency level of a sweep.
+    The knee is where throughput stops growing while latency keeps rising.
+    """
+    print("\n" + "="*96)
+    print("CONCURRENCY SWEEP RESULTS")
+    print("="*96)
+    print(f"{'Concurrency':<13} {'Requests':<10} {'Exec Time':<12} {'Tokens/s':<12} "
+          f"{'Req/s':<9} {'p50 Lat':<10} {'p90 Lat':<10} {'p99 Lat':<10}")
+    print("-"*96)
+    for m in sweep_results:
+        print(f"{m['concurrency']:<13} {m['num_requests']:<10} {m['execution_time']:<12.3f} "
+              f"{m['avg_token_throughput']:<12.2f} {m['requests_per_second']:<9.2f} "
+              f"{m['latency_p50']:<10.3f} {m['latency_p90']:<10.3f} {m['latency_p99']:<10.3f}")
+    print("="*96)
+
+    best = max(sweep_results, key=lambda m: m["avg_token_throughput"])
+    print(f"\nPeak throughput: {best['avg_token_throughput']:.2f} tokens/s "
+          f"at concurrency {best['concurrency']}")
+
+
+def approach_4_warmup_fanout(max_workers: int = 10) -> Dict[str, Any]:
+    """
+    Approach 4: Warm the prefix cache with one request, then fan out in parallel.
+    Concurrent cold requests would all miss the cache and each pay the full
+    prefill of the large context. Instead the first prompt is streamed alone; the
+    cache entry exists once its message_start arrives, and only then are the
+    remaining prompts sent in parallel so they read the prefix from cache.
+    """
+    print("\n" + "="*70)
+    print("APPROACH 4: Cache Warm-up then Parallel Fan-out")
+    print("="*70)
+
+    metrics: Dict[str, Any] = {
+        "total_tokens_processed": 0,
+        "execution_time": 0.0,
+        "avg_token_throughput": 0.0,
+        "num_requests": len(user_prompts),
+        "warmup_time": 0.0,
+        "cache_read_tokens": 0,
+        "cache_creation_tokens": 0,
+        "requests": []
+    }
+
+    client = get_anthropic_client()
+    cache_ready = threading.Event()
+
+    def send_request(prompt: str, index: int, warm_up: bool = False) -> Dict[str, Any]:
+        request_start = time.perf_counter()
+        request_kwargs: Dict[str, Any] = {
+            "model": "claude-sonnet-4-20250514",
+            "max_tokens": 1024,
+            "system": cast(Any, get_cached_system_message()),
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        }
+        span_name = "anthropic.messages.stream" if warm_up else "anthropic.messages.create"
+        attributes = {**llm_attributes("anthropic", request_kwargs["model"], streaming=warm_up),
+                      "bench.cache_warm_up": warm_up}
+        with request_span(span_name, attributes) as span:
+            if warm_up:
+                try:
+                    with client.messages.stream(**request_kwargs) as stream:
+                        for event in stream:
+                            if event.type == "message_start":
+                                add_event("message_start")
+                                cache_ready.set()
+                        response = stream.get_final_message()
+                finally:
+                    # Never leave the fan-out waiting if the warm-up fails
+                    cache_ready.set()
+            else:
+                response = client.messages.create(**request_kwargs)
+
+            cache_read = response.usage.cache_read_input_tokens or 0
+            cache_creation = response.usage.cache_creation_input_tokens or 0
+            result = {
+                "index": index,
+                "input_tokens": response.usage.input_tokens,
+                "output_tokens": response.usage.output_tokens,
+                "cache_read_tokens": cache_read,
+                "cache_creation_tokens": cache_creation,
+                "total_tokens": response.usage.input_tokens + cache_read + cache_creation +
+                response.usage.output_tokens,
+                "latency": time.perf_counter() - request_start
+            }
+            record_result(span, result)
+        return result
+
+    start_time = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(2, max_workers)) as executor:
+        futures = [executor.submit(send_request, user_prompts[0], 0, True)]
+        cache_ready.wait()
+        metrics["warmup_time"] = time.perf_counter() - start_time
+        print(f"  Cache warm-up ready after {metrics['warmup_time']:.2f}s, "
+              f"fanning out {len(user_prompts) - 1} requests")
+
+        futures += [
+            executor.submit(send_request, prompt, i)
+            for i, prompt in enumerate(user_prompts[1:], start=1)
+        ]
+
+        for future in as_completed(futures):
+            result = future.result()
+            metrics["requests"].append(result)
+            metrics["total_tokens_processed"] += result["total_tokens"]
+            metrics["cache_read_tokens"] += result["cache_read_tokens"]
+            metrics["cache_creation_tokens"] += result["cache_creation_tokens"]
+            print(f"  Request {result['index']+1}/{len(user_prompts)} completed: "
+                  f"cache read {result['cache_read_tokens']}, "
+                  f"cache creation {result['cache_creation_tokens']}")
+
+    metrics["requests"].sort(key=lambda r: r["index"])
+    metrics["execution_time"] = time.perf_counter() - start_time
+    if metrics["execution_time"] > 0:
+        metrics["avg_token_throughput"] = metrics["total_tokens_processed"] / \
+            metrics["execution_time"]
+    else:
+        metrics["avg_token_throughput"] = 0.0
+
+    return metrics
+
+
+def print_cache_breakdown(metrics: Dict[str, Any]):
+    """
+    Print cache read vs cache creation tokens for every request of approach 4.
+    """
+    print("\n" + "="*70)
+    print("PREFIX CACHE BREAKDOWN")
+    print("="*70)
+    print(f"{'Request':<10} {'Input':<10} {'Cache Read':<14} {'Cache Creation':<16} {'Latency':<10}")
+    print("-"*70)
+    for r in metrics["requests"]:
+        print(f"{r['index']+1:<10} {r['input_tokens']:<10} {r['cache_read_tokens']:<14} "
+              f"{r['cache_creation_tokens']:<16} {r['latency']:.3f}s")
+    print("-"*70)
+    print(f"{'Total':<10} {'':<10} {metrics['cache_read_tokens']:<14} "
+          f"{metrics['cache_creation_tokens']:<16}")
+    print("="*70)
+    print(f"\nWarm-up: {metrics['warmup_time']:.2f}s, "
+          f"total execution time: {metrics['execution_time']:.2f}s")
+    print(f"Prefill tokens served from cache: {metrics['cache_read_tokens']}")
+
+
+def poisson_arrivals(target_qps: float, duration: float, seed: Optional[int] = None) -> List[float]:
+    """Arrival offsets (seconds from start) of a Poisson process at target_qps."""
+    rng = random.Random(seed)
+    arrivals: List[float] = []
+    t = rng.expovariate(target_qps)
+    while t < duration:
+        arrivals.append(t)
+        t += rng.expovariate(target_qps)
+    return arrivals
+
+
+def trace_arrivals(trace_path: str, duration: float) -> List[float]:
+    """
+    Arrival offsets taken from the 'arrival' field of a JSONL workload trace
+    (the format read by workload_runner.py), cut off at duration.
+    """
+    from workload_runner import read_workload
+
+    arrivals = sorted(float(r.get("arrival") or 0.0)
+                      for r in read_workload(trace_path))
+    return [t for t in arrivals if t < duration]
+
+
+async def _run_open_loop(arrivals: List[float]) -> Tuple[List[Dict[str, Any]], float]:
+    """
+    Issue one request at every arrival offset regardless of how many are still
+    in flight, recording how late each one actually went out. Returns the
+    results and the wall time from the first scheduled arrival.
+
+    The connection pool is sized so every request could be in flight at once:
+    a request waiting for a free pooled connection would count client-side
+    queueing as server latency, and schedule_lag would not show it.
+    """
+    async with make_async_anthropic_client(max(len(arrivals), 1)) as async_client:
+        await warm_up_async_connection(async_client)
+        start_time = time.perf_counter()
+
+        async def send_request(prompt: str, index: int, scheduled_at: float) -> Dict[str, Any]:
+            sent_at = time.perf_counter() - start_time
+            result: Dict[str, Any] = {
+                "index": index,
+                "scheduled_at": scheduled_at,
+                "schedule_lag": max(0.0, sent_at - scheduled_at),
+                "total_tokens": 0,
+                "latency": None,
+                "error": None
+            }
+            with request_span("anthropic.messages.create", {
+                    **llm_attributes("anthropic", "claude-sonnet-4-20250514"),
+                    "bench.schedule_lag_seconds": result["schedule_lag"]}) as span:
+                try:
+                    response = await async_client.messages.create(
+                        model="claude-sonnet-4-20250514",
+                        max_tokens=1024,
+                        system=get_system_message(),
+                        messages=[
+                            {
+                                "role": "user",
+                                "content": prompt
+                            }
+                        ]
+                    )
+                    result["input_tokens"] = response.usage.input_tokens
+                    result["output_tokens"] = response.usage.output_tokens
+                    result["total_tokens"] = response.usage.input_tokens + \
+                        response.usage.output_tokens
+                    result["latency"] = time.perf_counter() - start_time - sent_at
+                    record_result(span, result)
+                except anthropic.APIError as e:
+                    result["error"] = f"{type(e).__name__}: {e}"
+                    if span is not None:
+                        span.record_exception(e)
+            return result
+
+        tasks: List[asyncio.Task] = []
+        for i, scheduled_at in enumerate(arrivals):
+            delay = scheduled_at - (time.perf_counter() - start_time)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send_request(
+                user_prompts[i % len(user_prompts)], i, scheduled_at)))
+
+        results = await asyncio.gather(*tasks)
+        return results, time.perf_counter() - start_time
+
+
+def approach_5_open_loop(target_qps: float = 2.0, duration: float = 30.0,
+                         trace_path: Optional[str] = None, seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Approach 5: Open-loop load at a target request rate for a fixed duration.
+    Closed-loop runs only send the next request once one finishes, which hides
+    queueing. Here requests go out on a schedule (Poisson arrivals at
+    target_qps, or the arrivals of a JSONL trace) whether or not earlier ones
+    have completed, so latency includes any queueing the backend adds.
+    """
+    arrivals = trace_arrivals(trace_path, duration) if trace_path else \
+        poisson_arrivals(target_qps, duration, seed)
+
+    print("\n" + "="*70)
+    source = f"trace {trace_path}" if trace_path else f"Poisson at {target_qps:.2f} req/s"
+    print(f"APPROACH 5: Open-Loop Load ({source}, {duration:.0f}s)")
+    print("="*70)
+    print(f"  Scheduling {len(arrivals)} requests")
+
+    results, execution_time = asyncio.run(_run_open_loop(arrivals))
+
+    completed = [r for r in results if r["error"] is None]
+    total_tokens = sum(r["total_tokens"] for r in completed)
+    lags = [r["schedule_lag"] for r in results]
+
+    metrics: Dict[str, Any] = {
+        "num_requests": len(results),
+        "num_completed": len(completed),
+        "num_errors": len(results) - len(completed),
+        "duration": duration,
+        "execution_time": execution_time,
+        "offered_qps": len(results) / duration if duration > 0 else 0.0,
+        "achieved_qps": len(completed) / execution_time if execution_time > 0 else 0.0,
+        "total_tokens_processed": total_tokens,
+        "avg_token_throughput": total_tokens / execution_time if execution_time > 0 else 0.0,
+        "latency_percentiles": latency_percentiles([r["latency"] for r in completed]),
+        "schedule_lag_percentiles": latency_percentiles(lags),
+        "max_schedule_lag": max(lags) if lags else 0.0,
+        "requests": results
+    }
+    return metrics
+
+
+def print_open_loop(metrics: Dict[str, Any]):
+    """
+    Print achieved vs offered load, latency percentiles and schedule lag.
+    A growing schedule lag means the client itself could not keep up.
+    """
+    print("\n" + "="*70)
+    print("OPEN-LOOP LOAD RESULTS")
+    print("="*70)
+    print(f"{'Requests Issued':<35} {metrics['num_requests']}")
+    print(f"{'Requests Completed':<35} {metrics['num_completed']}")
+    print(f"{'Errors':<35} {metrics['num_errors']}")
+    print(f"{'Offered Load':<35} {metrics['offered_qps']:.2f} req/s")
+    print(f"{'Achieved Throughput':<35} {metrics['achieved_qps']:.2f} req/s")
+    print(f"{'Avg Token Throughput':<35} {metrics['avg_token_throughput']:.2f} tokens/s")
+    print(f"{'Execution Time':<35} {metrics['execution_time']:.3f}s "
+          f"(schedule {metrics['duration']:.0f}s)")
+    for key, name in [("latency_percentiles", "Latency"), ("schedule_lag_percentiles", "Schedule Lag")]:
+        values = metrics[key]
+        summary = (f"p50 {values['p50']:.3f}s, p90 {values['p90']:.3f}s, p99 {values['p99']:.3f}s"
+                   if values else "N/A")
+        print(f"{name:<35} {summary}")
+    print(f"{'Max Schedule Lag':<35} {metrics['max_schedule_lag']:.3f}s")
+    print("="*70)
+
+
+def approach_6_batch(num_requests: Optional[int] = None, initial_poll_interval: float = 1.0,
+                     max_poll_interval: float = 60.0) -> Dict[str, Any]:
+    """
+    Approach 6: Submit all prompts (10 unless num_requests is given) as one
+    Message Batch and poll until it ends.
+    Batches trade latency for cost: results can take minutes to hours, but every
+    token is billed at half price and no client concurrency is needed.
+    """
+    print("\n" + "="*70)
+    print("APPROACH 6: Message Batches API")
+    print("="*70)
+
+    metrics: Dict[str, Any] = {
+        "total_tokens_processed": 0,
+        "execution_time": 0.0,
+        "avg_token_throughput": 0.0,
+        "num_requests": 0,
+        "num_errors": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "num_polls": 0,
+        "requests": []
+    }
+
+    prompts = needle_prompts(num_requests)
+    metrics["num_requests"] = len(prompts)
+    client = get_anthropic_client()
+    start_time = time.perf_counter()
+
+    batch = client.messages.batches.create(requests=cast(Any, [
+        {
+            "custom_id": f"needle-{i}",
+            "params": {
+                "model": "claude-sonnet-4-20250514",
+                "max_tokens": 1024,
+                "system": get_system_message(),
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ]
+            }
+        }
+        for i, prompt in enumerate(prompts)
+    ]))
+    print(f"  Submitted batch {batch.id} with {len(prompts)} requests")
+
+    # Poll with exponential backoff; batches rarely end within the first seconds
+    poll_interval = initial_poll_interval
+    while batch.processing_status != "ended":
+        time.sleep(poll_interval)
+        poll_interval = min(max_poll_interval, poll_interval * 1.5)
+        batch = client.messages.batches.retrieve(batch.id)
+        metrics["num_polls"] += 1
+        counts = batch.request_counts
+        print(f"  {batch.processing_status}: {counts.succeeded} succeeded, "
+              f"{counts.processing} processing, {counts.errored} errored")
+
+    metrics["processing_time"] = time.perf_counter() - start_time
+
+    # Results are streamed as JSONL rather than loaded in one response
+    for entry in client.messages.batches.results(batch.id):
+        if entry.result.type != "succeeded":
+            metrics["num_errors"] += 1
+            print(f"  {entry.custom_id}: {entry.result.type}")
+            continue
+        usage = entry.result.message.usage
+        metrics["requests"].append({"custom_id": entry.custom_id, "input_tokens": usage.input_tokens,
+                                    "output_tokens": usage.output_tokens})
+        metrics["input_tokens"] += usage.input_tokens
+        metrics["output_tokens"] += usage.output_tokens
+        metrics["total_tokens_processed"] += usage.input_tokens + usage.output_tokens
+
+    metrics["execution_time"] = time.perf_counter() - start_time
+    if metrics["execution_time"] > 0:
+        metrics["avg_token_throughput"] = metrics["total_tokens_processed"] / \
+            metrics["execution_time"]
+    else:
+        metrics["avg_token_throughput"] = 0.0
+
+    metrics["estimated_cost"] = estimate_cost(
+        metrics["input_tokens"], metrics["output_tokens"], batch=True)
+
+    return metrics
+
+
+def print_batch_comparison(metrics1: Dict[str, Any], metrics2: Dict[str, Any], metrics6: Dict[str, Any]):
+    """
+    Print parallel, sequential and batch runs side by side, including cost.
+    """
+    print("\n" + "="*100)
+    print("METRICS COMPARISON: LIVE VS BATCH")
+    print("="*100)
+    print(f"{'Metric':<28} {'Approach 1 (Parallel)':<24} {'Approach 2 (Sequential)':<24} {'Approach 6 (Batch)':<24}")
+    print("-"*100)
+    rows = [
+        ("Number of Requests", "num_requests", "{}"),
+        ("Total Tokens Processed", "total_tokens_processed", "{}"),
+        ("Execution Time", "execution_time", "{:.3f}s"),
+        ("Avg Token Throughput", "avg_token_throughput", "{:.2f} tokens/s"),
+        ("Estimated Cost (USD)", "estimated_cost", "${:.4f}"),
+    ]
+    for label, key, fmt in rows:
+        cells = [fmt.format(m[key]) for m in (metrics1, metrics2, metrics6)]
+        print(f"{label:<28} {cells[0]:<24} {cells[1]:<24} {cells[2]:<24}")
+    print("="*100)
+
+    if metrics6["estimated_cost"] > 0:
+        print(f"\nBatch cost: {metrics1['estimated_cost'] / metrics6['estimated_cost']:.2f}x cheaper "
+              f"than live requests")
+    if metrics1["execution_time"] > 0:
+        print(f"Batch wall time: {metrics6['execution_time'] / metrics1['execution_time']:.2f}x "
+              f"the parallel run ({metrics6['num_polls']} status polls)")
+
+
 def print_comparison(metrics1: Dict[str, Any], metrics2: Dict[str, Any]):
     """
     Print a formatted comparison table of metrics from both approaches.
@@ -186,6 +862,16 @@ def print_comparison(metrics1: Dict[str, Any], metrics2: Dict[str, Any]):
         f"{'Execution Time':<35} {metrics1['execution_time']:.3f}s{'':<25} {metrics2['execution_time']:.3f}s{'':<25}")
     print(
         f"{'Avg Token Throughput':<35} {metrics1['avg_token_throughput']:.2f} tokens/s{'':<15} {metrics2['avg_token_throughput']:.2f} tokens/s{'':<15}")
+    if get_response_cache() is not None:
+        cells = [f"{m['response_cache_hits']} / {m['response_cache_misses']}"
+                 for m in (metrics1, metrics2)]
+        print(f"{'Response Cache Hit/Miss':<35} {cells[0]:<30} {cells[1]:<30}")
+    if "concurrency_window" in metrics1:
+        print(
+            f"{'Concurrency Window (final)':<35} {metrics1['concurrency_window']:.1f} "
+            f"(min {metrics1['min_concurrency_window']:.1f}, max {metrics1['max_concurrency_window']:.1f})")
+        print(
+            f"{'Throttled / Retries':<35} {metrics1['num_throttled']} / {metrics1['num_retries']}")
     print("="*70)
 
     if metrics2['execution_time'] > 0 and metrics1['execution_time'] > 0:
@@ -216,11 +902,108 @@ def print_comparison(metrics1: Dict[str, Any], metrics2: Dict[str, Any]):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Parallel vs sequential (and async) request throughput")
+    parser.add_argument("--mode", choices=["compare", "async", "sweep", "fanout", "open-loop", "batch"],
+                        default="compare",
+                        help="compare: threads vs sequential; async: approach 3 only; "
+                             "sweep: approach 3 at concurrency 1, 2, 4, ... N; "
+                             "fanout: cache warm-up then parallel fan-out (approach 4); "
+                             "open-loop: requests at a target rate for a fixed duration (approach 5); "
+                             "batch: parallel and sequential vs the Message Batches API (approach 6)")
+    parser.add_argument("--concurrency", type=int, default=10,
+                        help="in-flight requests for --mode async and --mode fanout; "
+                             "thread pool size (and adaptive window cap) for approach 1")
+    parser.add_argument("--max-concurrency", type=int, default=32,
+                        help="highest concurrency level for --mode sweep")
+    parser.add_argument("--num-requests", type=int, default=None,
+                        help="requests per run; needle prompts are cycled (default: 10, or "
+                             "--max-concurrency in a sweep if larger, the same at every level)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="run approach 1 under the AIMD controller with 429/529 backoff")
+    parser.add_argument("--response-cache", action="store_true",
+                        help="serve repeated requests of approaches 1 and 2 from the local response cache")
+    parser.add_argument("--response-cache-bypass", action="store_true",
+                        help="with --response-cache: never read, only refresh the cache")
+    parser.add_argument("--qps", type=float, default=2.0,
+                        help="target request rate for --mode open-loop")
+    parser.add_argument("--duration", type=float, default=30.0,
+                        help="seconds to keep issuing requests in --mode open-loop")
+    parser.add_argument("--trace", default=None,
+                        help="JSONL trace whose 'arrival' offsets replace Poisson arrivals")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="random seed for Poisson arrivals")
+    parser.add_argument("--preflight", action="store_true",
+                        help="count input tokens and estimate cost before sending (always on for "
+                             "--mode batch); abort if a request would not fit the context window")
+    add_trial_arguments(parser)
+    add_export_arguments(parser)
+    add_tracing_arguments(parser)
+    args = parser.parse_args()
+    for flag, value in [("--concurrency", args.concurrency), ("--max-concurrency", args.max_concurrency),
+                        ("--num-requests", args.num_requests)]:
+        if value is not None and value < 1:
+            parser.error(f"{flag} must be at least 1, got {value}")
+    enable_tracing_from_args(args, "throughput_parallel_vs_sequential")
+
+    if args.response_cache:
+        enable_response_cache(bypass=args.response_cache_bypass)
+
     print("Parallel vs Sequential Requests Comparison")
     print("="*70)
     print("Finding needles in a haystack: 10 prompts, each ~5000 characters")
     print("Each prompt asks to find a specific quote in the Shakespearean text")
 
-    metrics1 = approach_1_parallel()
-    metrics2 = approach_2_sequential()
-    print_comparison(metrics1, metrics2)
+    # Open the pooled connection up front so it is not billed to the first request;
+    # the async modes use their own clients and warm those instead
+    if args.mode not in ("async", "sweep", "open-loop"):
+        warm_up_connection(get_anthropic_client())
+
+    if args.preflight or args.mode == "batch":
+        # Price exactly the prompts the mode will send (per level in a sweep)
+        preflight_requests = {"sweep": args.num_requests or max(len(user_prompts), args.max_concurrency),
+                              "fanout": None}.get(args.mode, args.num_requests)
+        report = preflight_needles(preflight_requests, batch=args.mode == "batch")
+        print_preflight(report)
+        if report["over_context_window"]:
+            raise SystemExit("Aborting: some requests would not fit the context window")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    if args.mode == "async":
+        metrics3 = approach_3_async(
+            concurrency=args.concurrency, num_requests=args.num_requests)
+        print_sweep([metrics3])
+        results["async"] = metrics3
+    elif args.mode == "fanout":
+        metrics4 = approach_4_warmup_fanout(max_workers=args.concurrency)
+        print_cache_breakdown(metrics4)
+        results["warmup_fanout"] = metrics4
+    elif args.mode == "open-loop":
+        metrics5 = approach_5_open_loop(target_qps=args.qps, duration=args.duration,
+                                        trace_path=args.trace, seed=args.seed)
+        print_open_loop(metrics5)
+        results["open_loop"] = metrics5
+    elif args.mode == "batch":
+        metrics1 = approach_1_parallel(num_requests=args.num_requests, max_workers=args.concurrency)
+        metrics2 = approach_2_sequential(num_requests=args.num_requests)
+        metrics6 = approach_6_batch(num_requests=args.num_requests)
+        print_batch_comparison(metrics1, metrics2, metrics6)
+        results.update(parallel=metrics1, sequential=metrics2, batch=metrics6)
+    elif args.mode == "sweep":
+        sweep_results = sweep_concurrency(
+            args.max_concurrency, num_requests=args.num_requests)
+        print_sweep(sweep_results)
+        results.update({f"async_c{m['concurrency']}": m for m in sweep_results})
+    else:
+        metrics1 = approach_1_parallel(
+            adaptive=args.adaptive, num_requests=args.num_requests, max_workers=args.concurrency)
+        metrics2 = approach_2_sequential(num_requests=args.num_requests)
+        print_comparison(metrics1, metrics2)
+        results.update(parallel=metrics1, sequential=metrics2)
+        results.update(run_trials_from_args(args, {
+            "sequential": lambda: approach_2_sequential(num_requests=args.num_requests),
+            "parallel": lambda: approach_1_parallel(adaptive=args.adaptive, num_requests=args.num_requests,
+                                                    max_workers=args.concurrency),
+        }, baseline="sequential"))
+
+    export_from_args(args, "throughput_parallel_vs_sequential", results)
@@ -0,0 +1,143 @@
+"""
+Token accounting with the Messages API token counting endpoint.
+
+count_tokens is called once per distinct content block (the large context,
+each prompt) and the result is memoized on disk, keyed by a SHA-256 of model and
+block content, so later runs know input sizes without calling the API again. A
+request's input size is the sum of its blocks plus the framing overhead of a
+minimal request (measured once per model); per-message framing makes this
+accurate to within a few tokens per message. Runners use it to check requests
+against the context window and to price a run before sending anything.
+
+Environment:
+    TOKEN_COUNT_CACHE   default .token_counts.json next to this file
+"""
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, List, Any, Optional, Sequence, Tuple, Union
+
+import anthropic
+
+DEFAULT_PATH = os.environ.get("TOKEN_COUNT_CACHE", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".token_counts.json"))
+
+# Context window of the Claude models the demos use
+CONTEXT_WINDOW_TOKENS = 200_000
+
+Block = Union[str, Dict[str, Any]]
+
+
+class TokenCounter:
+    def __init__(self, client: anthropic.Anthropic, model: str, path: str = DEFAULT_PATH):
+        self.client = client
+        self.model = model
+        self.path = path
+        self.api_calls = 0
+        self._lock = threading.Lock()
+        self._counts = self._load()
+
+    def _load(self) -> Dict[str, int]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._counts, f)
+        os.replace(tmp_path, self.path)
+
+    def _key(self, content: Any) -> str:
+        canonical = json.dumps([self.model, content], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _memoized(self, key: str, count: Callable[[], int]) -> int:
+        with self._lock:
+            if key in self._counts:
+                return self._counts[key]
+        value = count()
+        with self._lock:
+            self._counts[key] = value
+            self._save()
+        return value
+
+    def _count_messages(self, messages: List[Dict[str, Any]]) -> int:
+        self.api_calls += 1
+        return self.client.messages.count_tokens(model=self.model, messages=messages).input_tokens  # type: ignore
+
+    def overhead(self) -> int:
+        """Tokens the API adds around a one-token user message."""
+        return self._memoized(self._key("__overhead__"), lambda: max(
+            0, self._count_messages([{"role": "user", "content": "."}]) - 1))
+
+    def count_block(self, block: Block) -> int:
+        """Tokens of one content block; cache_control does not change the count."""
+        if isinstance(block, dict):
+            block = {k: v for k, v in block.items() if k != "cache_control"}
+            if block.get("type") == "text":
+                block = block["text"]
+        content = block if isinstance(block, str) else [block]
+        return self._memoized(self._key(block), lambda: max(
+            0, self._count_messages([{"role": "user", "content": content}]) - self.overhead()))
+
+    def count_request(self, system: Optional[Union[str, Sequence[Block]]],
+                      messages: Sequence[Dict[str, Any]]) -> int:
+        blocks: List[Block] = []
+        if system:
+            blocks += [system] if isinstance(system, str) else list(system)
+        for message in messages:
+            content = message["content"]
+            blocks += [content] if isinstance(content, str) else list(content)
+        return self.overhead() + sum(self.count_block(block) for block in blocks)
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(model: str) -> TokenCounter:
+    from clients import get_anthropic_client
+
+    return TokenCounter(get_anthropic_client(), model)
+
+
+def preflight(counter: TokenCounter, requests: Sequence[Tuple[Any, Sequence[Dict[str, Any]]]],
+              max_tokens: int, cost: Callable[[int, int], float]) -> Dict[str, Any]:
+    """
+    Size and price (system, messages) requests before sending them. Costs assume
+    no prefix caching and span zero to max_tokens output tokens per request.
+    """
+    sizes = [counter.count_request(system, messages) for system, messages in requests]
+    input_tokens = sum(sizes)
+    max_output_tokens = max_tokens * len(sizes)
+    return {
+        "num_requests": len(sizes),
+        "input_tokens": input_tokens,
+        "largest_request_tokens": max(sizes) if sizes else 0,
+        "max_output_tokens": max_output_tokens,
+        "estimated_cost_min": cost(input_tokens, 0),
+        "estimated_cost_max": cost(input_tokens, max_output_tokens),
+        "over_context_window": [i for i, size in enumerate(sizes)
+                                if size + max_tokens > CONTEXT_WINDOW_TOKENS],
+        "count_api_calls": counter.api_calls
+    }
+
+
+def print_preflight(report: Dict[str, Any]):
+    print("\n" + "="*70)
+    print("PREFLIGHT: INPUT SIZE AND COST BEFORE SENDING")
+    print("="*70)
+    print(f"{'Requests':<35} {report['num_requests']}")
+    print(f"{'Input Tokens (total)':<35} {report['input_tokens']}")
+    print(f"{'Largest Request':<35} {report['largest_request_tokens']} tokens "
+          f"(window {CONTEXT_WINDOW_TOKENS})")
+    print(f"{'Output Tokens (upper bound)':<35} {report['max_output_tokens']}")
+    print(f"{'Estimated Cost (USD)':<35} ${report['estimated_cost_min']:.4f} - "
+          f"${report['estimated_cost_max']:.4f}")
+    print(f"{'count_tokens Calls':<35} {report['count_api_calls']}")
+    if report["over_context_window"]:
+        print(f"{'Over Context Window':<35} requests "
+              f"{', '.join(str(i + 1) for i in report['over_context_window'])}")
+    print("="*70)
@@ -0,0 +1,166 @@
+"""
+Optional OpenTelemetry spans for every LLM request.
+
+When enabled, each request gets a span carrying model, token counts and cache
+hits, and the HTTP transport adds one child span per phase of the exchange,
+taken from httpcore's `trace` request extension:
+
+    http.connect        TCP connect, including DNS (absent on a reused connection)
+    http.tls            TLS handshake
+    http.send_headers   request line and headers
+    http.upload         request body (the large context goes here)
+    http.server_wait    body sent -> response headers: server queueing and prefill
+    http.download       response body; for streams, first byte through last event
+
+Spans are written as JSON lines to a file, or to stdout for "-". Without the
+optional `opentelemetry-sdk` package, or when tracing is not enabled, every
+helper here is a no-op and the request path is unchanged.
+"""
+import argparse
+import importlib.util
+import sys
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    OTEL_AVAILABLE = importlib.util.find_spec("opentelemetry.sdk") is not None
+except ModuleNotFoundError:
+    OTEL_AVAILABLE = False
+
+# httpcore trace step -> span name
+HTTP_PHASES = {
+    "connect_tcp": "http.connect",
+    "start_tls": "http.tls",
+    "send_request_headers": "http.send_headers",
+    "send_request_body": "http.upload",
+    "receive_response_headers": "http.server_wait",
+    "receive_response_body": "http.download",
+}
+
+# Request result key -> span attribute
+RESULT_ATTRIBUTES = {
+    "input_tokens": "gen_ai.usage.input_tokens",
+    "output_tokens": "gen_ai.usage.output_tokens",
+    "cache_read_tokens": "gen_ai.usage.cache_read_input_tokens",
+    "cache_creation_tokens": "gen_ai.usage.cache_creation_input_tokens",
+    "cache_hit_tokens": "gen_ai.usage.cache_read_input_tokens",
+    "cached": "bench.response_cache_hit",
+    "ttft": "bench.ttft_seconds",
+}
+
+_tracer: Optional[Any] = None
+
+
+def enable_tracing(output: str = "-", service_name: str = "llm-bench") -> bool:
+    """
+    Export spans as JSON lines to `output` ("-" for stdout).
+    Returns False if opentelemetry-sdk is not installed.
+    """
+    global _tracer
+    if not OTEL_AVAILABLE:
+        return False
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    out = sys.stdout if output == "-" else open(output, "a", encoding="utf-8")
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter(
+        out=out, formatter=lambda span: span.to_json(indent=None) + "\n")))
+    _tracer = provider.get_tracer(__name__)
+    return True
+
+
+@contextmanager
+def request_span(name: str, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Optional[Any]]:
+    """Span around one request; yields None when tracing is off."""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name, attributes={
+            key: value for key, value in (attributes or {}).items() if value is not None}) as span:
+        yield span
+
+
+def llm_attributes(system: str, model: str, streaming: bool = False) -> Dict[str, Any]:
+    return {"gen_ai.system": system, "gen_ai.request.model": model, "bench.streaming": streaming}
+
+
+def record_result(span: Optional[Any], result: Dict[str, Any]):
+    """Copy token counts, cache hits and TTFT from a request result onto its span."""
+    if span is None:
+        return
+    for key, attribute in RESULT_ATTRIBUTES.items():
+        if result.get(key) is not None:
+            span.set_attribute(attribute, result[key])
+
+
+def add_event(name: str):
+    """Mark a point in time (e.g. the first streamed token) on the current request span."""
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+
+    trace.get_current_span().add_event(name)
+
+
+def _phase_callback() -> Callable[[str, Dict[str, Any]], None]:
+    """httpcore trace callback that opens and closes one span per phase."""
+    open_spans: Dict[str, Any] = {}
+
+    def on_event(event: str, info: Dict[str, Any]):
+        # event looks like "http11.send_request_body.started"
+        prefix, _, rest = event.partition(".")
+        step, _, status = rest.rpartition(".")
+        phase = HTTP_PHASES.get(step)
+        if phase is None or _tracer is None:
+            return
+        if status == "started":
+            open_spans[step] = _tracer.start_span(
+                phase, attributes={"http.protocol": prefix})
+            return
+        span = open_spans.pop(step, None)
+        if span is None:
+            return
+        exception = info.get("exception")
+        # A stream closed before its end raises GeneratorExit; that is not a failure
+        if exception is not None and not isinstance(exception, GeneratorExit):
+            span.record_exception(exception)
+        span.end()
+
+    return on_event
+
+
+def httpx_event_hooks(async_client: bool = False) -> Dict[str, List[Callable[..., Any]]]:
+    """
+    httpx event hooks that attach the phase callback to each outgoing request.
+    They are installed on every client but do nothing until tracing is enabled.
+    """
+    if async_client:
+        async def attach_async(request: Any):
+            if _tracer is not None:
+                on_event = _phase_callback()
+
+                async def trace(event: str, info: Dict[str, Any]):
+                    on_event(event, info)
+                request.extensions["trace"] = trace
+        return {"request": [attach_async]}
+
+    def attach(request: Any):
+        if _tracer is not None:
+            request.extensions["trace"] = _phase_callback()
+    return {"request": [attach]}
+
+
+def add_tracing_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--trace-file", metavar="PATH",
+                        help="write OpenTelemetry spans of every request as JSON lines "
+                             "to PATH ('-' for stdout); needs opentelemetry-sdk")
+
+
+def enable_tracing_from_args(args: argparse.Namespace, service_name: str):
+    if not args.trace_file:
+        return
+    if not enable_tracing(args.trace_file, service_name):
+        print("opentelemetry-sdk is not installed; --trace-file ignored")
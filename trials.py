@@ -0,0 +1,169 @@
+"""
+Repeated-trial runner for comparing approaches.
+
+A single run of each approach mostly measures network noise. run_trials()
+first runs every approach `warmup` times (results discarded: connections,
+prefix caches and server-side warm state are filled), then runs `trials`
+rounds, each round running every approach once in a freshly shuffled order so
+drift over time (rate limits, cache expiry, load on the provider) is spread
+evenly instead of favouring whichever approach always runs first.
+
+Each metric is summarized as median, IQR and a bootstrap confidence interval of
+the median. Each approach is compared with the baseline through a bootstrap
+interval of the difference of medians; differences whose interval contains 0,
+or measured over fewer than MIN_SIGNIFICANCE_TRIALS trials, are flagged as not
+significant. Metrics an approach does not report (TTFT of a non-streaming
+approach) are left out of its summary.
+
+The response cache is switched off while trials run, so they measure the
+provider rather than disk lookups.
+"""
+import argparse
+import contextlib
+import io
+import random
+from typing import Callable, Dict, List, Any, Optional
+
+from bench_stats import bootstrap_ci, bootstrap_difference_ci, quartiles
+from response_cache import response_cache_disabled
+
+# metric key -> (label, unit, higher is better); "<name>_p50" reads
+# metrics["<name>_percentiles"]["p50"]
+TRIAL_METRICS = {
+    "execution_time": ("Latency", "s", False),
+    "avg_token_throughput": ("Throughput", "tok/s", True),
+    "ttft_p50": ("TTFT p50", "s", False),
+}
+CONFIDENCE = 0.95
+# Below this many trials the bootstrap intervals collapse onto the few samples
+MIN_SIGNIFICANCE_TRIALS = 3
+
+
+def metric_value(metrics: Dict[str, Any], key: str) -> Optional[float]:
+    """A trial metric from an approach's result dict, or None when not reported."""
+    if key in metrics:
+        value = metrics[key]
+    else:
+        name, _, percentile = key.rpartition("_")
+        value = (metrics.get(f"{name}_percentiles") or {}).get(percentile)
+    return None if value is None else float(value)
+
+
+def run_trials(approaches: Dict[str, Callable[[], Dict[str, Any]]], trials: int, warmup: int = 1,
+               seed: Optional[int] = None) -> Dict[str, Dict[str, List[float]]]:
+    """
+    Run warm-up passes, then `trials` rounds in randomized order. The approaches'
+    own output is suppressed. Returns metric samples per approach, only for the
+    metrics the approach reported.
+    """
+    rng = random.Random(seed)
+    names = list(approaches)
+    samples: Dict[str, Dict[str, List[float]]] = {name: {key: [] for key in TRIAL_METRICS} for name in names}
+
+    for i in range(warmup):
+        print(f"  Warm-up {i + 1}/{warmup}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name in names:
+                approaches[name]()
+
+    for i in range(trials):
+        order = rng.sample(names, len(names))
+        print(f"  Trial {i + 1}/{trials}: {', '.join(order)}")
+        for name in order:
+            with contextlib.redirect_stdout(io.StringIO()):
+                metrics = approaches[name]()
+            for key in TRIAL_METRICS:
+                value = metric_value(metrics, key)
+                if value is not None:
+                    samples[name][key].append(value)
+    return {name: {key: values for key, values in metrics.items() if values}
+            for name, metrics in samples.items()}
+
+
+def summarize_trials(samples: Dict[str, Dict[str, List[float]]], baseline: str,
+                     seed: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """Median, IQR and CI per approach and metric, plus the difference from the baseline."""
+    rng = random.Random(seed)
+    summary: Dict[str, Dict[str, Any]] = {}
+    for name, metrics in samples.items():
+        summary[name] = {"num_trials": max((len(values) for values in metrics.values()), default=0)}
+        for key, values in metrics.items():
+            q1, median, q3 = quartiles(values)
+            ci_low, ci_high = bootstrap_ci(values, CONFIDENCE, rng=rng)
+            stats: Dict[str, Any] = {"median": median, "q1": q1, "q3": q3, "iqr": q3 - q1,
+                                     "ci_low": ci_low, "ci_high": ci_high}
+            baseline_values = samples[baseline].get(key)
+            if name != baseline and baseline_values:
+                diff_low, diff_high = bootstrap_difference_ci(baseline_values, values, CONFIDENCE, rng=rng)
+                baseline_median = quartiles(baseline_values)[1]
+                enough = min(len(values), len(baseline_values)) >= MIN_SIGNIFICANCE_TRIALS
+                stats.update(diff_ci_low=diff_low, diff_ci_high=diff_high,
+                             ratio=median / baseline_median if baseline_median else None,
+                             significant=enough and (diff_low > 0 or diff_high < 0))
+            summary[name][key] = stats
+    return summary
+
+
+def print_trial_summary(summary: Dict[str, Dict[str, Any]], baseline: str):
+    print("\n" + "="*70)
+    print(f"REPEATED TRIALS (median, IQR, {CONFIDENCE:.0%} bootstrap CI of the median)")
+    print("="*70)
+    num_trials = next(iter(summary.values()))["num_trials"]
+    print(f"{num_trials} trials per approach, randomized order; baseline: {baseline}")
+    for key, (label, unit, higher_is_better) in TRIAL_METRICS.items():
+        if not any(key in metrics for metrics in summary.values()):
+            continue
+        print(f"\n{label} ({unit})")
+        print(f"{'Approach':<20} {'Median':<11} {'IQR':<11} {'CI':<26} {'vs Baseline'}")
+        print("-"*70)
+        for name, metrics in summary.items():
+            if key not in metrics:
+                continue
+            stats = metrics[key]
+            ci = f"[{stats['ci_low']:.3f}, {stats['ci_high']:.3f}]"
+            verdict = "-"
+            if stats.get("ratio") is not None:
+                better = (stats["ratio"] > 1) == higher_is_better
+                verdict = (f"{stats['ratio']:.2f}x, {'better' if better else 'worse'}"
+                           if stats["significant"] else f"{stats['ratio']:.2f}x, not significant")
+            print(f"{name:<20} {stats['median']:<11.3f} {stats['iqr']:<11.3f} {ci:<26} {verdict}")
+    print("="*70)
+    if any(not stats.get("significant", True) for metrics in summary.values()
+           for stats in metrics.values() if isinstance(stats, dict)):
+        print("Not significant: the CI of the difference of medians contains 0, or fewer than "
+              f"{MIN_SIGNIFICANCE_TRIALS} trials were run; more trials are needed to tell the "
+              "approaches apart.")
+
+
+def trial_results(summary: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Summary keyed for export_from_args, next to the single-run results."""
+    return {f"trials_{name}": metrics for name, metrics in summary.items()}
+
+
+def add_trial_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--trials", type=int, default=0,
+                        help="after the single run, repeat the compared approaches N times in "
+                             "randomized order and report median, IQR and bootstrap CIs "
+                             f"(differences need at least {MIN_SIGNIFICANCE_TRIALS} trials to be significant)")
+    parser.add_argument("--warmup", type=int, default=1,
+                        help="with --trials: untimed warm-up passes over every approach (default: 1)")
+    parser.add_argument("--trial-seed", type=int, default=None,
+                        help="with --trials: seed for the run order and the bootstrap")
+
+
+def run_trials_from_args(args: argparse.Namespace, approaches: Dict[str, Callable[[], Dict[str, Any]]],
+                         baseline: str) -> Dict[str, Dict[str, Any]]:
+    """Run, print and return the trial summary for export; empty without --trials."""
+    if args.trials <= 0:
+        return {}
+    print("\n" + "="*70)
+    print(f"Running {args.trials} trials after {args.warmup} warm-up passes")
+    print("="*70)
+    if args.trials < MIN_SIGNIFICANCE_TRIALS:
+        print(f"Warning: fewer than {MIN_SIGNIFICANCE_TRIALS} trials; no difference will be "
+              "reported as significant")
+    with response_cache_disabled():
+        samples = run_trials(approaches, args.trials, args.warmup, args.trial_seed)
+    summary = summarize_trials(samples, baseline, args.trial_seed)
+    print_trial_summary(summary, baseline)
+    return trial_results(summary)
@@ -1,12 +1,30 @@
-import anthropic
-import os
+import argparse
 import time
-from typing import Dict, List, Optional, Any, cast
-
-client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
-
-with open("large_shakespearean_text_dump", "r", encoding="utf-8") as f:
-    large_context = f.read()
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Any, Union, cast
+
+from bench_stats import latency_percentiles
+from clients import get_anthropic_client, load_large_context, warm_up_connection
+from metrics_export import add_export_arguments, export_from_args
+from tracing import (add_event, add_tracing_arguments, enable_tracing_from_args, llm_attributes,
+                     record_result, request_span)
+from response_cache import cached_call, enable_response_cache, get_response_cache
+from token_accounting import get_token_counter, preflight, print_preflight
+from trials import add_trial_arguments, run_trials_from_args
+
+MODEL = "claude-sonnet-4-20250514"
+
+# Pricing for claude-sonnet-4 (USD per 1M tokens); cache writes cost 1.25x the
+# input price with the default 5-minute TTL and 2x with the 1-hour TTL, cache
+# reads 0.1x
+PRICE_INPUT = 3.00
+PRICE_OUTPUT = 15.00
+PRICE_CACHE_WRITE = {"5m": PRICE_INPUT * 1.25, "1h": PRICE_INPUT * 2.0}
+PRICE_CACHE_READ = PRICE_INPUT * 0.1
+
+# The Messages API accepts at most 4 cache_control breakpoints per request
+MAX_CACHE_BREAKPOINTS = 4
 
 user_prompts = [
     "Summarize the main events and characters introduced in Act I, Scene I.",
@@ -14,152 +32,251 @@ user_prompts = [
     "Describe the appearance and behavior of the ghost that appears to the guards, and explain what Horatio thinks it might signify."
 ]
 
+# Follow-up turns for the multi-turn conversation mode
+follow_up_prompts = [
+    "Which of the characters you just mentioned speaks first, and what does that tell us?",
+    "Quote one line from that scene that supports your answer.",
+    "How does the mood of that passage compare to the court scene that follows?",
+    "What does Claudius want the court to believe about the old king's death?",
+    "How do Laertes and Polonius differ from Hamlet in how they are treated by the king?",
+    "Summarize Hamlet's first soliloquy in three sentences.",
+    "Which images of decay or corruption have appeared so far?",
+    "What does Horatio's scepticism add to the ghost scenes?",
+    "How would you stage the ghost's first appearance for a modern audience?",
+    "List the open questions the play has raised up to this point.",
+]
+
+
+def estimate_cost(input_tokens: int, output_tokens: int, cache_read_tokens: int = 0,
+                  cache_creation_tokens: int = 0, cache_ttl: str = "5m") -> float:
+    return (input_tokens * PRICE_INPUT + output_tokens * PRICE_OUTPUT +
+            cache_read_tokens * PRICE_CACHE_READ +
+            cache_creation_tokens * PRICE_CACHE_WRITE[cache_ttl]) / 1_000_000
+
 
-def approach_1_non_streaming() -> Dict[str, Any]:
+def build_system_message(cache: bool, ttl: Optional[str] = None) -> List[Dict[str, Any]]:
     """
-    Approach 1: Non-streaming requests without cache control.
-    Sends 3 prompts one after another without streaming.
+    The two-block system prompt used by every approach; with cache=True the
+    large context block is marked for prefix caching, for `ttl` ("5m" or "1h")
+    if given, else for the API default of 5 minutes.
     """
-    print("\n" + "="*70)
-    print("APPROACH 1: Non-Streaming Requests")
-    print("="*70)
-
-    system_message_no_cache: List[Dict[str, Any]] = [
+    context_block: Dict[str, Any] = {
+        "type": "text",
+        "text": load_large_context()
+    }
+    if cache:
+        context_block["cache_control"] = {"type": "ephemeral"}
+        if ttl:
+            context_block["cache_control"]["ttl"] = ttl
+    return [
         {
             "type": "text",
             "text": "You are a helpful AI assistant."
         },
-        {
-            "type": "text",
-            "text": large_context
-        }
+        context_block
     ]
 
-    metrics: Dict[str, Any] = {
-        "ttft": None,
-        "total_tokens_processed": 0,
-        "execution_time": 0.0,
-        "cache_read_tokens": 0,
-        "cache_creation_tokens": 0,
-        "avg_token_throughput": 0.0
+
+def as_messages(prompt: Union[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Wrap a single user prompt as a messages list; pass full lists through."""
+    if isinstance(prompt, str):
+        return [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    return prompt
+
+
+def response_cache_request(system: List[Dict[str, Any]], prompt: Union[str, List[Dict[str, Any]]],
+                           max_tokens: int, stream: bool) -> Dict[str, Any]:
+    """
+    Everything that determines a response, hashed as the response cache key.
+    Streaming and non-streaming results carry different fields (TTFT), so
+    stream is part of the key.
+    """
+    return {
+        "endpoint": str(get_anthropic_client().base_url),
+        "model": MODEL,
+        "system": system,
+        "messages": as_messages(prompt),
+        "max_tokens": max_tokens,
+        "temperature": None,
+        "stream": stream
     }
 
-    start_time = time.perf_counter()
 
-    for i, prompt in enumerate(user_prompts):
-        print(f"\nSending request {i+1}/3: {prompt[:50]}...")
+def send_message(system: List[Dict[str, Any]], prompt: Union[str, List[Dict[str, Any]]],
+                 max_tokens: int = 1024) -> Dict[str, Any]:
+    """
+    Send one non-streaming request. The first token is not observable here,
+    so only the full round-trip latency is recorded and ttft stays None.
+    """
+    def send() -> Dict[str, Any]:
         request_start = time.perf_counter()
-
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1024,
-            system=cast(Any, system_message_no_cache),  # type: ignore
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
+        response = get_anthropic_client().messages.create(
+            model=MODEL,
+            max_tokens=max_tokens,
+            system=cast(Any, system),  # type: ignore
+            messages=cast(Any, as_messages(prompt))
         )
+        return {
+            "input_tokens": response.usage.input_tokens,
+            "output_tokens": response.usage.output_tokens,
+            "cache_read_tokens": response.usage.cache_read_input_tokens or 0,
+            "cache_creation_tokens": response.usage.cache_creation_input_tokens or 0,
+            "ttft": None,
+            "ttlt": None,
+            "inter_token_latencies": [],
+            "tbt": None,
+            "latency": time.perf_counter() - request_start,
+            "text": "".join(getattr(block, "text", "") for block in response.content)
+        }
 
-        request_end = time.perf_counter()
+    with request_span("anthropic.messages.create", llm_attributes("anthropic", MODEL)) as span:
+        result = cached_call(response_cache_request(system, prompt, max_tokens, stream=False), send)
+        record_result(span, result)
+    return result
 
-        if i == 0:
-            metrics["ttft"] = request_end - request_start
-            print(f"  First token received at {metrics['ttft']:.3f}s")
-
-        input_tokens = response.usage.input_tokens
-        output_tokens = response.usage.output_tokens
-        cache_read = response.usage.cache_read_input_tokens or 0
-        cache_creation = response.usage.cache_creation_input_tokens or 0
-        metrics["total_tokens_processed"] += input_tokens + \
-            cache_read + output_tokens
-        metrics["cache_read_tokens"] += cache_read
-        metrics["cache_creation_tokens"] += cache_creation
 
-        print(
-            f"  Input tokens: {input_tokens}, Output tokens: {output_tokens}")
-        print(f"  Cache read: {response.usage.cache_read_input_tokens or 0}, "
-              f"Cache creation: {response.usage.cache_creation_input_tokens or 0}")
+def stream_message(system: List[Dict[str, Any]], prompt: Union[str, List[Dict[str, Any]]],
+                   max_tokens: int = 1024) -> Dict[str, Any]:
+    """
+    Send one streaming request and collect timing and usage in the same pass.
+    Usage comes from the message_start event (input and cache tokens) and the
+    message_delta event (final output tokens), so no second request is needed.
+    """
+    def send() -> Dict[str, Any]:
+        request_start = time.perf_counter()
+        token_times: List[float] = []
+        text_parts: List[str] = []
+        usage: Dict[str, int] = {
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_tokens": 0,
+            "cache_creation_tokens": 0
+        }
 
-    metrics["execution_time"] = time.perf_counter() - start_time
-    if metrics["execution_time"] > 0:
-        metrics["avg_token_throughput"] = metrics["total_tokens_processed"] / \
-            metrics["execution_time"]
-    else:
-        metrics["avg_token_throughput"] = 0.0
+        with get_anthropic_client().messages.stream(
+            model=MODEL,
+            max_tokens=max_tokens,
+            system=cast(Any, system),  # type: ignore
+            messages=cast(Any, as_messages(prompt))
+        ) as stream:
+            for event in stream:
+                if event.type == "message_start":
+                    add_event("message_start")
+                    start_usage = event.message.usage
+                    usage["input_tokens"] = start_usage.input_tokens
+                    usage["output_tokens"] = start_usage.output_tokens
+                    usage["cache_read_tokens"] = start_usage.cache_read_input_tokens or 0
+                    usage["cache_creation_tokens"] = start_usage.cache_creation_input_tokens or 0
+                elif event.type == "content_block_delta":
+                    if not token_times:
+                        add_event("first_token")
+                    token_times.append(time.perf_counter())
+                    text_parts.append(getattr(event.delta, "text", ""))
+                elif event.type == "message_delta":
+                    usage["output_tokens"] = event.usage.output_tokens
 
-    return metrics
+        request_end = time.perf_counter()
+        gaps = [b - a for a, b in zip(token_times, token_times[1:])]
+        return {
+            **usage,
+            "ttft": (token_times[0] - request_start) if token_times else None,
+            "ttlt": (token_times[-1] - request_start) if token_times else None,
+            "inter_token_latencies": gaps,
+            "tbt": (sum(gaps) / len(gaps)) if gaps else None,
+            "latency": request_end - request_start,
+            "text": "".join(text_parts)
+        }
 
+    with request_span("anthropic.messages.stream", llm_attributes("anthropic", MODEL, streaming=True)) as span:
+        result = cached_call(response_cache_request(system, prompt, max_tokens, stream=True), send)
+        record_result(span, result)
+    return result
 
-def approach_2_non_streaming_with_cache() -> Dict[str, Any]:
-    """
-    Approach 2: Non-streaming requests with cache control.
-    Sends 3 prompts one after another without streaming, but with caching enabled.
-    """
-    print("\n" + "="*70)
-    print("APPROACH 2: Non-Streaming Requests with Cache Control")
-    print("="*70)
 
-    system_message_with_cache_control: List[Dict[str, Any]] = [
-        {
-            "type": "text",
-            "text": "You are a helpful AI assistant."
-        },
-        {
-            "type": "text",
-            "text": large_context,
-            "cache_control": {"type": "ephemeral"}
-        }
-    ]
+def conversation_prompts(num_turns: int) -> List[str]:
+    """The demo prompts followed by follow-up questions, cycled to num_turns."""
+    prompts = user_prompts + follow_up_prompts
+    return [prompts[i % len(prompts)] for i in range(num_turns)]
+
 
+def with_rolling_breakpoints(messages: List[Dict[str, Any]], max_breakpoints: int) -> List[Dict[str, Any]]:
+    """
+    Copy of messages with cache_control on the last `max_breakpoints` user turns.
+    The newest breakpoint writes the conversation so far to the cache; the older
+    ones sit where earlier turns wrote theirs, so the next request can read them.
+    """
+    marked = list(messages)
+    user_turns = [i for i, m in enumerate(marked) if m["role"] == "user"]
+    for i in user_turns[-max_breakpoints:] if max_breakpoints > 0 else []:
+        content = marked[i]["content"]
+        blocks = [{"type": "text", "text": content}] if isinstance(content, str) \
+            else [dict(block) for block in content]
+        blocks[-1] = {**blocks[-1], "cache_control": {"type": "ephemeral"}}
+        marked[i] = {**marked[i], "content": blocks}
+    return marked
+
+
+def run_prompts(system: List[Dict[str, Any]],
+                send: Callable[[List[Dict[str, Any]], str], Dict[str, Any]],
+                label: str = "") -> Dict[str, Any]:
+    """
+    Send every user prompt one after another and aggregate the per-request
+    results into the metrics dict shared by all three approaches.
+    """
     metrics: Dict[str, Any] = {
         "ttft": None,
         "total_tokens_processed": 0,
         "execution_time": 0.0,
         "cache_read_tokens": 0,
         "cache_creation_tokens": 0,
-        "avg_token_throughput": 0.0
+        "avg_token_throughput": 0.0,
+        "estimated_cost": 0.0,
+        "concurrency": 1,
+        "response_cache_hits": 0,
+        "response_cache_misses": 0,
+        "requests": []
     }
 
     start_time = time.perf_counter()
 
     for i, prompt in enumerate(user_prompts):
-        print(f"\nSending request {i+1}/3: {prompt[:50]}...")
-        request_start = time.perf_counter()
-
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1024,
-            # type: ignore
-            system=cast(Any, system_message_with_cache_control),
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-        )
-
-        request_end = time.perf_counter()
+        print(f"\nSending request {i+1}/3{label}: {prompt[:50]}...")
+        result = send(system, prompt)
+        result["estimated_cost"] = estimate_cost(
+            result["input_tokens"], result["output_tokens"],
+            result["cache_read_tokens"], result["cache_creation_tokens"])
+        metrics["requests"].append(result)
+        if result["cached"]:
+            metrics["response_cache_hits"] += 1
+            print("  Served from local response cache")
+        else:
+            metrics["response_cache_misses"] += 1
 
         if i == 0:
-            metrics["ttft"] = request_end - request_start
-            print(f"  First token received at {metrics['ttft']:.3f}s")
-
-        input_tokens = response.usage.input_tokens
-        output_tokens = response.usage.output_tokens
-        cache_read = response.usage.cache_read_input_tokens or 0
-        cache_creation = response.usage.cache_creation_input_tokens or 0
-        metrics["total_tokens_processed"] += input_tokens + \
-            cache_read + output_tokens
-        metrics["cache_read_tokens"] += cache_read
-        metrics["cache_creation_tokens"] += cache_creation
-
-        print(
-            f"  Input tokens: {input_tokens}, Output tokens: {output_tokens}")
-        print(f"  Cache read: {cache_read}, "
-              f"Cache creation: {cache_creation}")
+            metrics["ttft"] = result["ttft"]
+
+        if result["ttft"] is not None:
+            tbt_str = f"{result['tbt'] * 1000:.1f}ms" if result["tbt"] is not None else "N/A"
+            print(f"  TTFT: {result['ttft']:.3f}s, Time between tokens: {tbt_str}, "
+                  f"Total latency: {result['latency']:.3f}s")
+        else:
+            print(f"  Full response received at {result['latency']:.3f}s")
+
+        metrics["total_tokens_processed"] += result["input_tokens"] + \
+            result["cache_read_tokens"] + result["output_tokens"]
+        metrics["cache_read_tokens"] += result["cache_read_tokens"]
+        metrics["cache_creation_tokens"] += result["cache_creation_tokens"]
+        metrics["estimated_cost"] += result["estimated_cost"]
+
+        print(f"  Input tokens: {result['input_tokens']}, "
+              f"Output tokens: {result['output_tokens']}")
+        print(f"  Cache read: {result['cache_read_tokens']}, "
+              f"Cache creation: {result['cache_creation_tokens']}")
 
     metrics["execution_time"] = time.perf_counter() - start_time
     if metrics["execution_time"] > 0:
@@ -168,123 +285,248 @@ def approach_2_non_streaming_with_cache() -> Dict[str, Any]:
     else:
         metrics["avg_token_throughput"] = 0.0
 
+    requests = metrics["requests"]
+    metrics["ttft_percentiles"] = latency_percentiles(
+        [r["ttft"] for r in requests])
+    metrics["ttlt_percentiles"] = latency_percentiles(
+        [r["ttlt"] for r in requests])
+    metrics["itl_percentiles"] = latency_percentiles(
+        [gap for r in requests for gap in r["inter_token_latencies"]])
+    metrics["latency_percentiles"] = latency_percentiles(
+        [r["latency"] for r in requests])
+
     return metrics
 
 
-def get_streaming_usage(prompt: str) -> Dict[str, int]:
+def approach_1_non_streaming(measure_streaming: bool = False) -> Dict[str, Any]:
     """
-    Helper function to get usage stats for a streaming request.
-    Makes a non-streaming call with same parameters to get accurate usage.
+    Approach 1: Non-streaming requests without cache control.
+    Sends 3 prompts one after another without streaming.
+    With measure_streaming=True the same requests are streamed under the hood
+    so TTFT and inter-token latency can be measured.
     """
-    system_message_with_cache_control: List[Dict[str, Any]] = [
-        {
-            "type": "text",
-            "text": "You are a helpful AI assistant."
-        },
-        {
-            "type": "text",
-            "text": large_context,
-            "cache_control": {"type": "ephemeral"}
-        }
-    ]
-    response = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=1024,
-        system=cast(Any, system_message_with_cache_control),  # type: ignore
-        messages=[
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ]
-    )
-    return {
-        "input_tokens": response.usage.input_tokens,
-        "output_tokens": response.usage.output_tokens,
-        "cache_read_tokens": response.usage.cache_read_input_tokens or 0,
-        "cache_creation_tokens": response.usage.cache_creation_input_tokens or 0
-    }
+    print("\n" + "="*70)
+    print("APPROACH 1: Non-Streaming Requests")
+    print("="*70)
+
+    send = stream_message if measure_streaming else send_message
+    return run_prompts(build_system_message(cache=False), send)
+
+
+def approach_2_non_streaming_with_cache(measure_streaming: bool = False) -> Dict[str, Any]:
+    """
+    Approach 2: Non-streaming requests with cache control.
+    Sends 3 prompts one after another without streaming, but with caching enabled.
+    With measure_streaming=True the same requests are streamed under the hood
+    so TTFT and inter-token latency can be measured.
+    """
+    print("\n" + "="*70)
+    print("APPROACH 2: Non-Streaming Requests with Cache Control")
+    print("="*70)
+
+    send = stream_message if measure_streaming else send_message
+    return run_prompts(build_system_message(cache=True), send)
 
 
 def approach_3_streaming() -> Dict[str, Any]:
     """
     Approach 3: Streaming requests exploiting prefix caching.
-    Properly tracks metrics including usage statistics.
+    Usage statistics and per-request timings are read from the stream itself.
     """
     print("\n" + "="*70)
     print("APPROACH 3: Streaming Requests with Prefix Caching")
     print("="*70)
 
+    return run_prompts(build_system_message(cache=True), stream_message, label=" (streaming)")
+
+
+def approach_4_conversation(num_turns: int = 24, cache: bool = True, max_tokens: int = 512) -> Dict[str, Any]:
+    """
+    Approach 4: A multi-turn conversation whose prefix grows every turn.
+    With cache=True the document block carries one breakpoint and the remaining
+    breakpoints roll forward over the latest user turns, so each turn reads the
+    previous turn's prefix from cache and only prefills the new exchange.
+    """
+    print("\n" + "="*70)
+    print(f"APPROACH 4: {num_turns}-Turn Conversation "
+          f"({'rolling cache breakpoints' if cache else 'no cache control'})")
+    print("="*70)
+
+    system = build_system_message(cache=cache)
+    history: List[Dict[str, Any]] = []
     metrics: Dict[str, Any] = {
-        "ttft": None,
+        "num_turns": num_turns,
+        "cache": cache,
         "total_tokens_processed": 0,
         "execution_time": 0.0,
         "cache_read_tokens": 0,
         "cache_creation_tokens": 0,
-        "avg_token_throughput": 0.0
+        "estimated_cost": 0.0,
+        "requests": []
     }
 
-    system_message_with_cache_control: List[Dict[str, Any]] = [
-        {
-            "type": "text",
-            "text": "You are a helpful AI assistant."
-        },
-        {
-            "type": "text",
-            "text": large_context,
-            "cache_control": {"type": "ephemeral"}
-        }
-    ]
-
     start_time = time.perf_counter()
 
-    for i, prompt in enumerate(user_prompts):
-        print(f"\nSending request {i+1}/3 (streaming): {prompt[:50]}...")
-        request_start = time.perf_counter()
-        first_token_time = None
-
-        with client.messages.stream(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1024,
-            # type: ignore
-            system=cast(Any, system_message_with_cache_control),
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-        ) as stream:
-            for event in stream:
-                if i == 0 and first_token_time is None:
-                    if event.type == "content_block_start" or event.type == "content_block_delta":
-                        first_token_time = time.perf_counter()
-                        metrics["ttft"] = first_token_time - request_start
-                        print(
-                            f"  First token received at {metrics['ttft']:.3f}s")
+    for turn, prompt in enumerate(conversation_prompts(num_turns), start=1):
+        history.append({"role": "user", "content": prompt})
+        messages = with_rolling_breakpoints(history, MAX_CACHE_BREAKPOINTS - 1) if cache else history
+        result = stream_message(system, messages, max_tokens=max_tokens)
+        history.append({"role": "assistant", "content": result["text"]})
+
+        prompt_tokens = result["input_tokens"] + \
+            result["cache_read_tokens"] + result["cache_creation_tokens"]
+        record = {
+            "turn": turn,
+            "prompt_tokens": prompt_tokens,
+            "input_tokens": result["input_tokens"],
+            "output_tokens": result["output_tokens"],
+            "cache_read_tokens": result["cache_read_tokens"],
+            "cache_creation_tokens": result["cache_creation_tokens"],
+            "ttft": result["ttft"],
+            "latency": result["latency"],
+            "cached": result["cached"],
+            "estimated_cost": estimate_cost(result["input_tokens"], result["output_tokens"],
+                                            result["cache_read_tokens"], result["cache_creation_tokens"])
+        }
+        metrics["requests"].append(record)
+        metrics["total_tokens_processed"] += prompt_tokens + result["output_tokens"]
+        metrics["cache_read_tokens"] += result["cache_read_tokens"]
+        metrics["cache_creation_tokens"] += result["cache_creation_tokens"]
+        metrics["estimated_cost"] += record["estimated_cost"]
 
-        usage_stats = get_streaming_usage(prompt)
+        ttft_str = f"{result['ttft']:.3f}s" if result["ttft"] is not None else "N/A"
+        print(f"  Turn {turn}: prompt {prompt_tokens} tokens, cache read {result['cache_read_tokens']}, "
+              f"cache creation {result['cache_creation_tokens']}, TTFT {ttft_str}")
 
-        metrics["total_tokens_processed"] += usage_stats["input_tokens"] + \
-            usage_stats["cache_read_tokens"] + usage_stats["output_tokens"]
-        metrics["cache_read_tokens"] += usage_stats["cache_read_tokens"]
-        metrics["cache_creation_tokens"] += usage_stats["cache_creation_tokens"]
+    metrics["execution_time"] = time.perf_counter() - start_time
+    metrics["ttft_percentiles"] = latency_percentiles(
+        [r["ttft"] for r in metrics["requests"]])
+    prompt_total = sum(r["prompt_tokens"] for r in metrics["requests"])
+    metrics["cache_read_fraction"] = metrics["cache_read_tokens"] / \
+        prompt_total if prompt_total else 0.0
+    return metrics
 
-        print(f"  Input tokens: {usage_stats['input_tokens']}, "
-              f"Output tokens: {usage_stats['output_tokens']}")
-        print(f"  Cache read: {usage_stats['cache_read_tokens']}, "
-              f"Cache creation: {usage_stats['cache_creation_tokens']}")
 
-    metrics["execution_time"] = time.perf_counter() - start_time
-    if metrics["execution_time"] > 0:
-        metrics["avg_token_throughput"] = metrics["total_tokens_processed"] / \
-            metrics["execution_time"]
-    else:
-        metrics["avg_token_throughput"] = 0.0
+def print_conversation_comparison(uncached: Dict[str, Any], cached: Dict[str, Any]):
+    """
+    Print cache reads and TTFT turn by turn, without and with rolling breakpoints.
+    """
+    print("\n" + "="*96)
+    print("MULTI-TURN CONVERSATION: NO CACHE VS ROLLING BREAKPOINTS")
+    print("="*96)
+    print(f"{'Turn':<6} {'Prompt Tokens':<15} {'TTFT (No Cache)':<17} "
+          f"{'Cache Read':<12} {'Cache Creation':<16} {'TTFT (Cache)':<14}")
+    print("-"*96)
+    for u, c in zip(uncached["requests"], cached["requests"]):
+        ttfts = [f"{r['ttft']:.3f}s" if r["ttft"] is not None else "N/A" for r in (u, c)]
+        print(f"{c['turn']:<6} {c['prompt_tokens']:<15} {ttfts[0]:<17} "
+              f"{c['cache_read_tokens']:<12} {c['cache_creation_tokens']:<16} {ttfts[1]:<14}")
+    print("-"*96)
+    for pct in ["p50", "p90", "p99"]:
+        cells = [f"{m['ttft_percentiles'][pct]:.3f}s" if m["ttft_percentiles"] else "N/A"
+                 for m in (uncached, cached)]
+        print(f"{'TTFT ' + pct:<22} {cells[0]:<17} {'':<29} {cells[1]:<14}")
+    print(f"{'Prompt read from cache':<22} {uncached['cache_read_fraction']:<17.1%} "
+          f"{'':<29} {cached['cache_read_fraction']:.1%}")
+    print(f"{'Estimated Cost (USD)':<22} ${uncached['estimated_cost']:<16.4f} "
+          f"{'':<29} ${cached['estimated_cost']:.4f}")
+    print("="*96)
+
+
+def parse_idle_gaps(value: str) -> List[float]:
+    """Comma-separated seconds, e.g. "60,240,420"."""
+    return [float(gap) for gap in value.split(",") if gap.strip()]
+
+
+def approach_5_cache_ttl(ttl: str, idle_gaps: List[float]) -> Dict[str, Any]:
+    """
+    Approach 5: Cached requests separated by idle gaps, for one cache TTL.
+    One request is sent, then one more after each gap. A gap longer than the
+    TTL lets the cached prefix expire, and the next request pays a new cache
+    write. A session id in the instruction block gives each run its own
+    cache entry, so runs for different TTLs can share the clock.
+    """
+    system = build_system_message(cache=True, ttl=ttl)
+    system[0] = {**system[0], "text": f"{system[0]['text']} (session {uuid.uuid4().hex[:8]})"}
+    prompts = conversation_prompts(len(idle_gaps) + 1)
+    metrics: Dict[str, Any] = {
+        "ttl": ttl,
+        "num_requests": len(prompts),
+        "cache_hits": 0,
+        "cache_read_tokens": 0,
+        "cache_creation_tokens": 0,
+        "estimated_cost": 0.0,
+        "requests": []
+    }
 
+    for i, prompt in enumerate(prompts):
+        gap = idle_gaps[i - 1] if i > 0 else 0.0
+        if gap > 0:
+            time.sleep(gap)
+        result = stream_message(system, prompt, max_tokens=256)
+        hit = result["cache_read_tokens"] > 0
+        record = {
+            "index": i,
+            "idle_gap": gap,
+            "cache_hit": hit,
+            "input_tokens": result["input_tokens"],
+            "output_tokens": result["output_tokens"],
+            "cache_read_tokens": result["cache_read_tokens"],
+            "cache_creation_tokens": result["cache_creation_tokens"],
+            "ttft": result["ttft"],
+            "cached": result["cached"],
+            "estimated_cost": estimate_cost(result["input_tokens"], result["output_tokens"],
+                                            result["cache_read_tokens"], result["cache_creation_tokens"],
+                                            cache_ttl=ttl)
+        }
+        metrics["requests"].append(record)
+        metrics["cache_hits"] += hit
+        metrics["cache_read_tokens"] += result["cache_read_tokens"]
+        metrics["cache_creation_tokens"] += result["cache_creation_tokens"]
+        metrics["estimated_cost"] += record["estimated_cost"]
+
+        ttft_str = f"{result['ttft']:.3f}s" if result["ttft"] is not None else "N/A"
+        print(f"  [{ttl}] Request {i+1}/{len(prompts)} after {gap:.0f}s idle: "
+              f"{'hit' if hit else 'miss'}, TTFT {ttft_str}")
+
+    # The first request can only miss, so the hit rate counts the rest
+    metrics["cache_hit_rate"] = metrics["cache_hits"] / (len(prompts) - 1) if len(prompts) > 1 else 0.0
+    metrics["ttft_percentiles"] = latency_percentiles(
+        [r["ttft"] for r in metrics["requests"]])
     return metrics
 
 
+def print_ttl_comparison(metrics_5m: Dict[str, Any], metrics_1h: Dict[str, Any]):
+    """
+    Print hit/miss and TTFT per request for both TTLs, then hit rate, TTFT and cost.
+    """
+    print("\n" + "="*80)
+    print("CACHE TTL UNDER IDLE GAPS: 5 MINUTES VS 1 HOUR")
+    print("="*80)
+    print(f"{'Request':<9} {'Idle Gap':<11} {'5m Cache':<10} {'5m TTFT':<12} {'1h Cache':<10} {'1h TTFT':<12}")
+    print("-"*80)
+    for a, b in zip(metrics_5m["requests"], metrics_1h["requests"]):
+        cells = []
+        for r in (a, b):
+            cells.append("hit" if r["cache_hit"] else "miss")
+            cells.append(f"{r['ttft']:.3f}s" if r["ttft"] is not None else "N/A")
+        print(f"{a['index']+1:<9} {a['idle_gap']:<11.0f} {cells[0]:<10} {cells[1]:<12} {cells[2]:<10} {cells[3]:<12}")
+    print("-"*80)
+    print(f"{'Metric':<31} {'5m TTL':<24} {'1h TTL':<24}")
+    print(f"{'Cache Hit Rate':<31} {metrics_5m['cache_hit_rate']:<24.1%} {metrics_1h['cache_hit_rate']:<24.1%}")
+    for pct in ["p50", "p90", "p99"]:
+        cells = [f"{m['ttft_percentiles'][pct]:.3f}s" if m["ttft_percentiles"] else "N/A"
+                 for m in (metrics_5m, metrics_1h)]
+        print(f"{'TTFT ' + pct:<31} {cells[0]:<24} {cells[1]:<24}")
+    print(f"{'Cache Creation Tokens':<31} {metrics_5m['cache_creation_tokens']:<24} {metrics_1h['cache_creation_tokens']:<24}")
+    print(f"{'Estimated Cost (USD)':<31} ${metrics_5m['estimated_cost']:<23.4f} ${metrics_1h['estimated_cost']:<23.4f}")
+    print("="*80)
+
+    cheaper = "1h" if metrics_1h["estimated_cost"] < metrics_5m["estimated_cost"] else "5m"
+    print(f"\nCheaper TTL for this traffic pattern: {cheaper} "
+          f"(1h writes cost 2x input vs 1.25x, but survive gaps up to an hour)")
+
+
 def print_comparison(metrics1: Dict[str, Any], metrics2: Dict[str, Any], metrics3: Dict[str, Any]):
     """
     Print a formatted comparison table of metrics from all three approaches.
@@ -298,6 +540,15 @@ def print_comparison(metrics1: Dict[str, Any], metrics2: Dict[str, Any], metrics
     ttft2_str = f"{metrics2['ttft']:.3f}s" if metrics2['ttft'] is not None else "N/A"
     ttft3_str = f"{metrics3['ttft']:.3f}s" if metrics3['ttft'] is not None else "N/A"
     print(f"{'TTFT (first request)':<25} {ttft1_str:<22} {ttft2_str:<22} {ttft3_str:<22}")
+    for key, name, scale, unit in [("ttft_percentiles", "TTFT", 1, "s"),
+                                   ("ttlt_percentiles", "Time to Last Token", 1, "s"),
+                                   ("itl_percentiles", "Inter-Token Latency", 1000, "ms"),
+                                   ("latency_percentiles", "Request Latency", 1, "s")]:
+        for pct in ["p50", "p90", "p99"]:
+            values = [m.get(key) for m in (metrics1, metrics2, metrics3)]
+            cells = [f"{v[pct] * scale:.3f}{unit}" if v else "N/A" for v in values]
+            label = f"{name} {pct}"
+            print(f"{label:<25} {cells[0]:<22} {cells[1]:<22} {cells[2]:<22}")
     print(
         f"{'Total Tokens Processed':<25} {metrics1['total_tokens_processed']:<22} {metrics2['total_tokens_processed']:<22} {metrics3['total_tokens_processed']:<22}")
     print(
@@ -308,17 +559,92 @@ def print_comparison(metrics1: Dict[str, Any], metrics2: Dict[str, Any], metrics
         f"{'Cache Read Tokens':<25} {metrics1['cache_read_tokens']:<22} {metrics2['cache_read_tokens']:<22} {metrics3['cache_read_tokens']:<22}")
     print(
         f"{'Cache Creation Tokens':<25} {metrics1['cache_creation_tokens']:<22} {metrics2['cache_creation_tokens']:<22} {metrics3['cache_creation_tokens']:<22}")
+    if get_response_cache() is not None:
+        cells = [f"{m['response_cache_hits']} / {m['response_cache_misses']}"
+                 for m in (metrics1, metrics2, metrics3)]
+        print(
+            f"{'Response Cache Hit/Miss':<25} {cells[0]:<22} {cells[1]:<22} {cells[2]:<22}")
     print("="*90)
 
 
 if __name__ == "__main__":
-    print("Prefix Caching Comparison: Three Approaches")
-    print("="*70)
-    print("Approach 1: Non-streaming, no cache control")
-    print("Approach 2: Non-streaming with cache control")
-    print("Approach 3: Streaming with cache control")
-
-    metrics1 = approach_1_non_streaming()
-    metrics2 = approach_2_non_streaming_with_cache()
-    metrics3 = approach_3_streaming()
-    print_comparison(metrics1, metrics2, metrics3)
+    parser = argparse.ArgumentParser(
+        description="TTFT and prefix caching comparison")
+    parser.add_argument("--mode", choices=["compare", "conversation", "ttl"], default="compare",
+                        help="compare: the three approaches; conversation: a growing multi-turn "
+                             "conversation without and with rolling cache breakpoints (approach 4); "
+                             "ttl: cached requests with idle gaps, 5-minute vs 1-hour TTL (approach 5)")
+    parser.add_argument("--turns", type=int, default=24,
+                        help="conversation turns for --mode conversation")
+    parser.add_argument("--idle-gaps", type=parse_idle_gaps, default=[60.0, 240.0, 420.0, 900.0, 1800.0],
+                        help="comma-separated idle seconds between requests for --mode ttl "
+                             "(default: 60,240,420,900,1800)")
+    parser.add_argument("--measure-streaming", action="store_true",
+                        help="stream approaches 1 and 2 under the hood (same cache settings) "
+                             "so TTFT and inter-token latency are measured for every approach")
+    parser.add_argument("--response-cache", action="store_true",
+                        help="serve repeated requests from the local on-disk response cache")
+    parser.add_argument("--response-cache-bypass", action="store_true",
+                        help="with --response-cache: never read, only refresh the cache")
+    parser.add_argument("--preflight", action="store_true",
+                        help="count input tokens of the demo prompts and estimate cost before sending; "
+                             "abort if a request would not fit the context window")
+    add_trial_arguments(parser)
+    add_export_arguments(parser)
+    add_tracing_arguments(parser)
+    args = parser.parse_args()
+    enable_tracing_from_args(args, "ttft_prefix_caching_1")
+
+    if args.response_cache:
+        enable_response_cache(bypass=args.response_cache_bypass)
+
+    # Open the pooled connection up front so it is not billed to request 1's TTFT
+    warm_up_connection(get_anthropic_client())
+
+    if args.preflight:
+        report = preflight(get_token_counter(MODEL),
+                           [(build_system_message(cache=False), as_messages(prompt)) for prompt in user_prompts],
+                           max_tokens=1024, cost=estimate_cost)
+        print_preflight(report)
+        if report["over_context_window"]:
+            raise SystemExit("Aborting: some requests would not fit the context window")
+
+    if args.mode == "ttl":
+        print("Prefix Cache TTL Under Idle Gaps")
+        print("="*70)
+        print(f"Idle gaps: {', '.join(f'{gap:.0f}s' for gap in args.idle_gaps)} "
+              f"(both TTLs run side by side)")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            future_5m = executor.submit(approach_5_cache_ttl, "5m", args.idle_gaps)
+            future_1h = executor.submit(approach_5_cache_ttl, "1h", args.idle_gaps)
+            metrics_5m, metrics_1h = future_5m.result(), future_1h.result()
+        print_ttl_comparison(metrics_5m, metrics_1h)
+        export_from_args(args, "ttft_prefix_caching_1", {
+            "ttl_5m": metrics_5m, "ttl_1h": metrics_1h})
+    elif args.mode == "conversation":
+        print("Prefix Caching in a Growing Conversation")
+        print("="*70)
+        metrics_uncached = approach_4_conversation(num_turns=args.turns, cache=False)
+        metrics_cached = approach_4_conversation(num_turns=args.turns, cache=True)
+        print_conversation_comparison(metrics_uncached, metrics_cached)
+        export_from_args(args, "ttft_prefix_caching_1", {
+            "conversation_no_cache": metrics_uncached, "conversation_cache": metrics_cached})
+    else:
+        print("Prefix Caching Comparison: Three Approaches")
+        print("="*70)
+        print("Approach 1: Non-streaming, no cache control")
+        print("Approach 2: Non-streaming with cache control")
+        print("Approach 3: Streaming with cache control")
+
+        metrics1 = approach_1_non_streaming(measure_streaming=args.measure_streaming)
+        metrics2 = approach_2_non_streaming_with_cache(
+            measure_streaming=args.measure_streaming)
+        metrics3 = approach_3_streaming()
+        print_comparison(metrics1, metrics2, metrics3)
+        results = {"no_cache": metrics1, "cache": metrics2, "streaming": metrics3}
+        results.update(run_trials_from_args(args, {
+            "no_cache": lambda: approach_1_non_streaming(measure_streaming=args.measure_streaming),
+            "cache": lambda: approach_2_non_streaming_with_cache(measure_streaming=args.measure_streaming),
+            "streaming": approach_3_streaming,
+        }, baseline="no_cache"))
+        export_from_args(args, "ttft_prefix_caching_1", results)
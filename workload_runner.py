@@ -0,0 +1,250 @@
+"""
+Replay a JSONL workload through the same measurement code as the demos.
+
+Each input line is one request:
+    {"id": "r1", "provider": "anthropic", "system": "shakespeare",
+     "messages": [{"role": "user", "content": "..."}], "max_tokens": 1024,
+     "cache": true, "stream": true, "arrival": 0.5}
+
+  - provider: "anthropic" (default) uses the ttft_prefix_caching_1 client and
+    stream_message/send_message; "deepseek" uses run_chat from
+    context_management_with_mem0.
+  - system: a key of SYSTEM_PROMPTS or literal system prompt text.
+  - cache: mark the last system block with cache_control (Anthropic only).
+  - arrival: seconds after the start of the run at which to send the request;
+    only honoured with --honor-arrivals.
+
+The file is read line by line and at most --concurrency requests are in flight,
+so traces with many thousands of requests are never loaded into memory at once.
+Per-request results are appended to the output JSONL as they complete.
+
+Usage:
+    python workload_runner.py --write-example workload.jsonl
+    python workload_runner.py workload.jsonl --output results.jsonl --concurrency 8
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Any, Optional, Set, TextIO
+
+from bench_stats import latency_percentiles
+from clients import get_anthropic_client, get_deepseek_client, load_large_context, warm_up_connection
+
+SYSTEM_PROMPTS: Dict[str, str] = {
+    "assistant": "You are a helpful AI assistant.",
+}
+
+
+def read_workload(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield one request dict per non-empty line, numbering requests without an id."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            request = json.loads(line)
+            request.setdefault("id", f"line-{line_number}")
+            yield request
+
+
+def build_anthropic_system(system_ref: Optional[str], cache: bool) -> List[Dict[str, Any]]:
+    """
+    Resolve a system prompt reference to Messages API system blocks.
+    "shakespeare" is the same two-block prompt the TTFT demo uses.
+    """
+    blocks: List[Dict[str, Any]]
+    if system_ref == "shakespeare":
+        blocks = [
+            {"type": "text", "text": SYSTEM_PROMPTS["assistant"]},
+            {"type": "text", "text": load_large_context()}
+        ]
+    else:
+        text = SYSTEM_PROMPTS.get(system_ref or "assistant", system_ref)
+        blocks = [{"type": "text", "text": text}]
+    if cache:
+        blocks[-1] = {**blocks[-1], "cache_control": {"type": "ephemeral"}}
+    return blocks
+
+
+PROVIDER_CLIENTS = {"anthropic": get_anthropic_client, "deepseek": get_deepseek_client}
+_warmed_providers: Set[str] = set()
+_warm_up_lock = threading.Lock()
+
+
+def warm_up_provider(provider: str):
+    """Open a pooled connection to the provider the first time it is used, before any request is timed."""
+    with _warm_up_lock:
+        if provider in _warmed_providers or provider not in PROVIDER_CLIENTS:
+            return
+        _warmed_providers.add(provider)
+        warm_up_connection(PROVIDER_CLIENTS[provider]())
+
+
+def dispatch(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Send one workload request through the matching demo client."""
+    provider = request.get("provider", "anthropic")
+    messages = request["messages"]
+    warm_up_provider(provider)
+
+    if provider == "anthropic":
+        from ttft_prefix_caching_1 import send_message, stream_message
+
+        system = build_anthropic_system(
+            request.get("system"), request.get("cache", False))
+        send = stream_message if request.get("stream", True) else send_message
+        result = send(system, messages,
+                      max_tokens=request.get("max_tokens", 1024))
+        result.pop("inter_token_latencies", None)
+        result.pop("text", None)
+        return result
+
+    if provider == "deepseek":
+        from context_management_with_mem0 import run_chat
+
+        system_ref = request.get("system")
+        chat_messages = messages
+        if system_ref:
+            system_text = SYSTEM_PROMPTS.get(system_ref, system_ref)
+            chat_messages = [
+                {"role": "system", "content": system_text}] + messages
+        usage, elapsed, _ = run_chat(chat_messages, stream=request.get("stream", True),
+                                     max_tokens=request.get("max_tokens"))
+        usage.pop("inter_token_latencies", None)
+        return {**usage, "latency": elapsed}
+
+    raise ValueError(f"Unknown provider: {provider}")
+
+
+def run_workload(input_path: str, output: TextIO, concurrency: int = 4,
+                 honor_arrivals: bool = False) -> Dict[str, Any]:
+    """
+    Dispatch every request of the workload and write one result line per request.
+    Returns aggregate metrics for the whole run.
+    """
+    in_flight = threading.BoundedSemaphore(concurrency)
+    write_lock = threading.Lock()
+    ttfts: List[Optional[float]] = []
+    latencies: List[Optional[float]] = []
+    metrics: Dict[str, Any] = {
+        "num_requests": 0,
+        "num_errors": 0,
+        "total_tokens_processed": 0,
+        "execution_time": 0.0,
+        "avg_token_throughput": 0.0
+    }
+
+    start_time = time.perf_counter()
+
+    def run_one(request: Dict[str, Any], scheduled_at: float) -> None:
+        started_at = time.perf_counter() - start_time
+        record: Dict[str, Any] = {
+            "id": request["id"],
+            "scheduled_at": scheduled_at,
+            "started_at": started_at
+        }
+        try:
+            record.update(dispatch(request))
+            record["status"] = "ok"
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            in_flight.release()
+
+        with write_lock:
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            metrics["num_requests"] += 1
+            if record["status"] == "ok":
+                metrics["total_tokens_processed"] += sum(
+                    record.get(key, 0) for key in
+                    ("input_tokens", "output_tokens", "cache_read_tokens", "cache_creation_tokens"))
+                ttfts.append(record.get("ttft"))
+                latencies.append(record.get("latency"))
+            else:
+                metrics["num_errors"] += 1
+                print(f"  Request {record['id']} failed: {record['error']}")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for request in read_workload(input_path):
+            scheduled_at = float(request.get("arrival") or 0.0
+                                 ) if honor_arrivals else 0.0
+            delay = scheduled_at - (time.perf_counter() - start_time)
+            if delay > 0:
+                time.sleep(delay)
+            # Block here rather than queueing, so memory stays bounded by concurrency
+            in_flight.acquire()
+            executor.submit(run_one, request, scheduled_at)
+
+    metrics["execution_time"] = time.perf_counter() - start_time
+    if metrics["execution_time"] > 0:
+        metrics["avg_token_throughput"] = metrics["total_tokens_processed"] / \
+            metrics["execution_time"]
+    metrics["ttft_percentiles"] = latency_percentiles(ttfts)
+    metrics["latency_percentiles"] = latency_percentiles(latencies)
+    return metrics
+
+
+def write_example_workload(path: str):
+    """Write the TTFT demo prompts as a small example workload."""
+    from ttft_prefix_caching_1 import user_prompts
+
+    with open(path, "w", encoding="utf-8") as f:
+        for i, prompt in enumerate(user_prompts):
+            f.write(json.dumps({
+                "id": f"ttft-{i+1}",
+                "provider": "anthropic",
+                "system": "shakespeare",
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": 1024,
+                "cache": True,
+                "stream": True,
+                "arrival": i * 0.5
+            }) + "\n")
+
+
+def print_summary(metrics: Dict[str, Any]):
+    print("\n" + "="*70)
+    print("WORKLOAD SUMMARY")
+    print("="*70)
+    print(f"{'Requests':<35} {metrics['num_requests']}")
+    print(f"{'Errors':<35} {metrics['num_errors']}")
+    print(f"{'Total Tokens Processed':<35} {metrics['total_tokens_processed']}")
+    print(f"{'Execution Time':<35} {metrics['execution_time']:.3f}s")
+    print(
+        f"{'Avg Token Throughput':<35} {metrics['avg_token_throughput']:.2f} tok/s")
+    for key, name in [("ttft_percentiles", "TTFT"), ("latency_percentiles", "Latency")]:
+        values = metrics[key]
+        summary = (f"p50 {values['p50']:.3f}s, p90 {values['p90']:.3f}s, p99 {values['p99']:.3f}s"
+                   if values else "N/A")
+        print(f"{name:<35} {summary}")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay a JSONL workload and write per-request results as JSONL")
+    parser.add_argument("workload", nargs="?",
+                        help="input JSONL, one request per line")
+    parser.add_argument("--output", default="results.jsonl",
+                        help="per-request results JSONL")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="maximum requests in flight")
+    parser.add_argument("--honor-arrivals", action="store_true",
+                        help="send each request at its 'arrival' offset instead of as fast as possible")
+    parser.add_argument("--write-example", metavar="PATH",
+                        help="write an example workload to PATH and exit")
+    args = parser.parse_args()
+
+    if args.write_example:
+        write_example_workload(args.write_example)
+        print(f"Example workload written to {args.write_example}")
+    elif not args.workload:
+        parser.error("a workload file is required")
+    else:
+        with open(args.output, "w", encoding="utf-8") as out:
+            print_summary(run_workload(args.workload, out, concurrency=args.concurrency,
+                                       honor_arrivals=args.honor_arrivals))
+        print(f"\nPer-request results written to {args.output}")